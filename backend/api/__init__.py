@@ -1,4 +1,5 @@
 from .conversations import router as conversations_router
 from .cooking import router as cooking_router
+from .cookware import router as cookware_router
 
-__all__ = ["cooking_router", "conversations_router"]
+__all__ = ["cooking_router", "conversations_router", "cookware_router"]
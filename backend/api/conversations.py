@@ -1,18 +1,22 @@
 import logging
 import uuid
+from datetime import UTC, datetime
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
 from schemas.conversation import (
     ConversationDetailResponse,
     ConversationListResponse,
     ConversationSchema,
+    ConversationSearchResponse,
+    ConversationSearchResult,
     ConversationWithLastMessage,
     CreateConversationRequest,
     MessageSchema,
     UpdateConversationRequest,
 )
-from services import conversation_service
+from services import conversation_service, conversation_transfer
 
 logger = logging.getLogger(__name__)
 
@@ -23,14 +27,13 @@ router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 async def list_conversations(skip: int = 0, limit: int = 50):
     """List all conversations, ordered by most recent first."""
     try:
-        conversations = conversation_service.list_conversations(skip, limit)
+        conversations = await conversation_service.alist_conversations(skip, limit)
 
         # Convert to response format with last message
         conversations_with_last = []
         for conv in conversations:
-            # Get last message for this conversation
-            messages = conversation_service.get_conversation_messages(conv.thread_id)
-            last_message = messages[-1] if messages else None
+            # Get last message for this conversation (without restoring archived ones)
+            last_message = await conversation_service.aget_last_message(conv.thread_id)
 
             conv_dict = {
                 "id": conv.id,
@@ -53,15 +56,74 @@ async def list_conversations(skip: int = 0, limit: int = 50):
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@router.get("/search", response_model=ConversationSearchResponse)
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=500),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str | None = None,
+):
+    """Full-text search over past messages and conversation titles, best match first."""
+    try:
+        # Fetch one extra row to know whether another page exists
+        found = await conversation_service.asearch_conversations(q, skip, limit + 1, user_id)
+        results = found["results"]
+        return ConversationSearchResponse(
+            query=q,
+            results=[ConversationSearchResult(**result) for result in results[:limit]],
+            skip=skip,
+            limit=limit,
+            has_more=len(results) > limit,
+            truncated=found["truncated"],
+        )
+    except Exception as e:
+        logger.error(f"Error searching conversations: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.get("/export")
+async def export_conversations():
+    """
+    Stream every conversation and message as NDJSON, for backup or migration.
+
+    Conversation records come first, then message records; each line has a
+    "type" field. The export is read in constant memory however large the
+    history is.
+    """
+    return StreamingResponse(
+        conversation_transfer.export_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="conversations.ndjson"'},
+    )
+
+
+@router.post("/import")
+async def import_conversations(request: Request):
+    """
+    Load an NDJSON export (the request body) in bulk.
+
+    Conversations and messages whose ids already exist are skipped, so an
+    interrupted import can simply be sent again.
+    """
+    try:
+        totals = await conversation_transfer.import_ndjson(request.stream())
+        return {"status": "imported", **totals}
+    except conversation_transfer.InvalidImportError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except Exception as e:
+        logger.error(f"Error importing conversations: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
 @router.get("/{thread_id}", response_model=ConversationDetailResponse)
 async def get_conversation(thread_id: str):
     """Get a specific conversation with all messages."""
     try:
-        conversation = conversation_service.get_conversation_by_thread(thread_id)
+        conversation = await conversation_service.aget_conversation_by_thread(thread_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
 
-        messages = conversation_service.get_conversation_messages(thread_id)
+        messages = await conversation_service.aget_conversation_messages(thread_id)
 
         return ConversationDetailResponse(
             conversation=ConversationSchema.model_validate(conversation),
@@ -80,7 +142,7 @@ async def create_conversation(request: CreateConversationRequest = None):
     try:
         thread_id = str(uuid.uuid4())
         title = request.title if request and request.title else None
-        conversation = conversation_service.create_conversation(thread_id, title)
+        conversation = await conversation_service.acreate_conversation(thread_id, title)
         return ConversationSchema.model_validate(conversation)
     except Exception as e:
         logger.error(f"Error creating conversation: {e}")
@@ -91,7 +153,9 @@ async def create_conversation(request: CreateConversationRequest = None):
 async def update_conversation(thread_id: str, request: UpdateConversationRequest):
     """Update conversation title."""
     try:
-        conversation = conversation_service.update_conversation_title(thread_id, request.title)
+        conversation = await conversation_service.aupdate_conversation_title(
+            thread_id, request.title
+        )
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         return ConversationSchema.model_validate(conversation)
@@ -102,11 +166,27 @@ async def update_conversation(thread_id: str, request: UpdateConversationRequest
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@router.delete("")
+async def delete_old_conversations(older_than: datetime):
+    """
+    Delete every conversation (with its messages and checkpoints) last updated
+    before `older_than`, an ISO 8601 timestamp; naive timestamps are UTC.
+    """
+    try:
+        if older_than.tzinfo is not None:
+            older_than = older_than.astimezone(UTC).replace(tzinfo=None)
+        deleted = await conversation_service.adelete_conversations_older_than(older_than)
+        return {"status": "deleted", "count": deleted}
+    except Exception as e:
+        logger.error(f"Error deleting conversations: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
 @router.delete("/{thread_id}")
 async def delete_conversation(thread_id: str):
-    """Delete a conversation and all its messages."""
+    """Delete a conversation with all its messages and checkpoints."""
     try:
-        success = conversation_service.delete_conversation(thread_id)
+        success = await conversation_service.adelete_conversation(thread_id)
         if not success:
             raise HTTPException(status_code=404, detail="Conversation not found")
         return {"status": "deleted", "thread_id": thread_id}
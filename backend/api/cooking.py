@@ -1,40 +1,124 @@
+import asyncio
 import json
 import logging
+import os
+import uuid
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
-from graphs.cooking_graph import cooking_graph
-from schemas import QueryInput, QueryResponse
+from graphs import get_cooking_graph
+from schemas import BatchQueryInput, QueryInput, QueryResponse
 from services import conversation_service
+from services.admission import AdmissionRejectedError, stream_admission
+from services.idempotency import (
+    IdempotencyConflictError,
+    IdempotencyPendingError,
+    IdempotentRequest,
+    idempotency_keys,
+    request_fingerprint,
+)
+from services.metrics import metrics
+from services.single_flight import normalize_key
+from services.turn_lock import TurnBusyError, turn_locks
+from services.turn_stream import TurnStream, format_event_id, parse_event_id, turn_streams
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/cooking", tags=["cooking"])
 
+# What happens to a streamed turn when its client disconnects: "cancel" stops
+# the graph and its upstream calls; "finish" completes and persists the answer
+STREAM_DISCONNECT_POLICY = os.getenv("STREAM_DISCONNECT_POLICY", "cancel").lower()
+
+# How often an idle stream (e.g. waiting on the LLM) checks for a disconnect
+DISCONNECT_POLL_INTERVAL = float(os.getenv("STREAM_DISCONNECT_POLL_SECONDS", "0.5"))
+
+# How long a turn whose client disconnected waits for it to reconnect (with
+# Last-Event-ID) before the "cancel" policy applies
+STREAM_RESUME_GRACE = float(os.getenv("STREAM_RESUME_GRACE_SECONDS", "15"))
+
+# Most graph runs a batch request keeps in flight at once (requests may ask for fewer)
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Most queries accepted in one batch request
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "5000"))
+
 # Thinking step messages for user-friendly display
 THINKING_MESSAGES = {
     "classifier": "Analyzing your question...",
     "decide_search": "Determining information needs...",
     "search": "Searching for recipes...",
+    "context_budget": "Reviewing search results...",
     "cookware_verification": "Checking cookware requirements...",
     "response": "Generating response...",
     "refusal": "Processing query...",
 }
 
 
+async def _acquire_turn(thread_id: str):
+    """Wait for the thread's previous turn to finish; 409 if it does not in time."""
+    try:
+        return await turn_locks.acquire(thread_id)
+    except TurnBusyError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+
+async def _begin_idempotent(
+    key: str, payload: QueryInput, turn_id: str | None = None
+) -> IdempotentRequest:
+    """Claim an Idempotency-Key for this request; 422 if it was used for another request."""
+    try:
+        return await idempotency_keys.begin(key, request_fingerprint(payload), turn_id)
+    except IdempotencyConflictError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=422, detail=str(e)) from e
+
+
+async def _original_result(idempotent: IdempotentRequest) -> dict:
+    """The result of the request that first used the key; 409 if it failed or is still running."""
+    try:
+        return await idempotent.wait()
+    except IdempotencyPendingError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+
 @router.post("", response_model=QueryResponse)
-async def cooking_endpoint(payload: QueryInput):
+async def cooking_endpoint(
+    payload: QueryInput,
+    idempotency_key: Annotated[str | None, Header()] = None,
+):
     """
     Main endpoint for cooking queries with conversation memory.
     Runs the query through the LangGraph workflow.
+
+    With an Idempotency-Key header, a retry gets the first request's result
+    (waiting for it if it is still running) instead of running the query again.
     """
+    idempotent = await _begin_idempotent(idempotency_key, payload) if idempotency_key else None
+    if idempotent is not None and not idempotent.is_owner:
+        return QueryResponse(**await _original_result(idempotent))
+
+    response = None
+    try:
+        lease = await _acquire_turn(payload.thread_id)
+    except BaseException:
+        if idempotent is not None:
+            await idempotent.finish(None)
+        raise
     try:
         logger.info(f"Received query: {payload.query} (thread: {payload.thread_id})")
 
         # Save user message to database
-        conversation_service.save_message(
-            thread_id=payload.thread_id, role="user", content=payload.query
+        await conversation_service.asave_message(
+            thread_id=payload.thread_id,
+            role="user",
+            content=payload.query,
+            user_id=payload.user_id,
         )
 
         # Initialize state for this turn
@@ -50,10 +134,10 @@ async def cooking_endpoint(payload: QueryInput):
         # Run the graph with thread context
         # If thread_id exists: loads previous state from database
         # If new thread_id: starts fresh
-        result = cooking_graph.invoke(initial_state, config)
+        result = await get_cooking_graph().ainvoke(initial_state, config)
 
         # Save assistant message to database
-        conversation_service.save_message(
+        await conversation_service.asave_message(
             thread_id=payload.thread_id,
             role="assistant",
             content=result.get("final_response", "No response generated."),
@@ -66,7 +150,7 @@ async def cooking_endpoint(payload: QueryInput):
 
         logger.info(f"Graph completed. Thread: {payload.thread_id}")
 
-        return QueryResponse(
+        response = QueryResponse(
             response=result.get("final_response", "No response generated."),
             metadata={
                 "query_type": result.get("query_type"),
@@ -75,101 +159,404 @@ async def cooking_endpoint(payload: QueryInput):
             },
             thread_id=payload.thread_id,
         )
+        return response
 
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e)) from e
+    finally:
+        await lease.release()
+        if idempotent is not None:
+            await idempotent.finish(response.model_dump() if response else None)
 
 
-@router.post("/stream")
-async def cooking_stream_endpoint(payload: QueryInput):
-    """
-    Streaming endpoint for cooking queries with real-time progress updates.
-    Uses Server-Sent Events (SSE) to stream node execution progress.
+async def _stream_turn(payload: QueryInput, stream: TurnStream) -> dict | None:
     """
+    Run one streamed turn, publishing its SSE events to `stream`.
 
-    async def event_generator():
-        """Generate SSE events as graph executes."""
-        try:
-            logger.info(f"Starting stream for query: {payload.query}")
+    Returns the turn's result (the "complete" event's fields), None if it failed.
+    """
+    try:
+        logger.info(f"Starting stream for query: {payload.query}")
 
-            # Save user message
-            conversation_service.save_message(
-                thread_id=payload.thread_id, role="user", content=payload.query
-            )
+        # Save user message
+        await conversation_service.asave_message(
+            thread_id=payload.thread_id,
+            role="user",
+            content=payload.query,
+            user_id=payload.user_id,
+        )
 
-            # Initialize state
-            initial_state = {
-                "query": payload.query,
-                "search_results": [],
-            }
+        # Initialize state
+        initial_state = {
+            "query": payload.query,
+            "search_results": [],
+        }
 
-            # Thread configuration
-            config = {"configurable": {"thread_id": payload.thread_id}}
+        # Thread configuration
+        config = {"configurable": {"thread_id": payload.thread_id}}
 
-            # Track final result
-            final_result = None
+        # Track final result
+        final_result = None
 
-            # Stream graph execution
-            async for event in cooking_graph.astream(initial_state, config):
-                # event is a dict: {node_name: state_update}
-                for node_name, state_update in event.items():
-                    logger.info(f"Streaming node: {node_name}")
+        # Stream graph execution
+        cooking_graph = get_cooking_graph()
+        async for event in cooking_graph.astream(initial_state, config):
+            # event is a dict: {node_name: state_update}
+            for node_name, state_update in event.items():
+                logger.info(f"Streaming node: {node_name}")
 
-                    # Send thinking step event
-                    thinking_event = {
+                # Send thinking step event
+                stream.publish(
+                    {
                         "type": "thinking",
                         "node": node_name,
                         "message": THINKING_MESSAGES.get(node_name, f"Processing {node_name}..."),
                     }
-                    yield f"data: {json.dumps(thinking_event)}\n\n"
-
-                    # Store final result
-                    if "final_response" in state_update:
-                        final_result = state_update
-
-            # Get final state (if not captured in events)
-            if final_result is None:
-                final_result = cooking_graph.get_state(config).values
-
-            # Save assistant message
-            conversation_service.save_message(
-                thread_id=payload.thread_id,
-                role="assistant",
-                content=final_result.get("final_response", "No response generated."),
-                metadata={
-                    "query_type": final_result.get("query_type"),
-                    "is_relevant": final_result.get("is_relevant"),
-                    "dish": final_result.get("dish"),
-                },
+                )
+
+                # Store final result
+                if "final_response" in state_update:
+                    final_result = state_update
+
+        # Get final state (if not captured in events)
+        if final_result is None:
+            final_result = (await cooking_graph.aget_state(config)).values
+
+        # Save assistant message
+        await conversation_service.asave_message(
+            thread_id=payload.thread_id,
+            role="assistant",
+            content=final_result.get("final_response", "No response generated."),
+            metadata={
+                "query_type": final_result.get("query_type"),
+                "is_relevant": final_result.get("is_relevant"),
+                "dish": final_result.get("dish"),
+            },
+        )
+
+        # Send completion event
+        result = {
+            "response": final_result.get("final_response", "No response generated."),
+            "metadata": {
+                "query_type": final_result.get("query_type"),
+                "is_relevant": final_result.get("is_relevant"),
+                "dish": final_result.get("dish"),
+            },
+            "thread_id": payload.thread_id,
+        }
+        stream.publish({"type": "complete", **result})
+
+        logger.info(f"Stream completed for thread: {payload.thread_id}")
+        return result
+
+    except asyncio.CancelledError:
+        # Tell clients that reconnect later that no answer is coming
+        stream.publish({"type": "error", "message": "The turn was cancelled."})
+        raise
+    except Exception as e:
+        logger.error(f"Stream error: {str(e)}", exc_info=True)
+        stream.publish({"type": "error", "message": str(e)})
+        return None
+    finally:
+        turn_streams.finish(stream)
+
+
+def _cancel_abandoned(stream: TurnStream) -> None:
+    """Cancel a turn nobody is following (any more)."""
+    task = stream.task
+    if stream.followers or task is None or task.done() or task.cancelling():
+        return
+    logger.info(f"Client left thread {stream.thread_id}; cancelling the turn")
+    metrics.increment("turns.cancelled")
+    task.cancel()
+
+
+def _on_disconnect(stream: TurnStream) -> None:
+    """Apply STREAM_DISCONNECT_POLICY to a turn whose last client went away."""
+    metrics.increment("stream.disconnects")
+    if STREAM_DISCONNECT_POLICY == "finish":
+        logger.info(f"Client left thread {stream.thread_id}; finishing the turn in the background")
+        metrics.increment("turns.detached")
+    elif STREAM_RESUME_GRACE > 0:
+        # Give the client a chance to reconnect with Last-Event-ID first
+        asyncio.get_running_loop().call_later(STREAM_RESUME_GRACE, _cancel_abandoned, stream)
+    else:
+        _cancel_abandoned(stream)
+
+
+async def _relay(stream: TurnStream, after: int, request: Request):
+    """Relay the turn's SSE events newer than `after`, watching for the client going away."""
+    stream.followers += 1
+    try:
+        while True:
+            try:
+                events = await asyncio.wait_for(stream.wait_events(after), DISCONNECT_POLL_INTERVAL)
+            except TimeoutError:
+                if await request.is_disconnected():
+                    return
+                continue
+            if not events:
+                return
+            for seq, event in events:
+                event_id = format_event_id(stream.turn_id, seq)
+                yield f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
+                after = seq
+    finally:
+        stream.followers -= 1
+        # Left early: the client disconnected (or the server is stopping)
+        if not stream.followers and not stream.done:
+            _on_disconnect(stream)
+
+
+def _event_stream_response(events, turn_id: str | None, **kwargs) -> StreamingResponse:
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no",  # Disable nginx buffering
+    }
+    if turn_id:
+        headers["X-Turn-Id"] = turn_id
+    return StreamingResponse(events, media_type="text/event-stream", headers=headers, **kwargs)
+
+
+async def _resume_stream(thread_id: str, last_event_id: str, request: Request) -> StreamingResponse:
+    """Attach a reconnecting client to its turn and replay the events it missed."""
+    parsed = parse_event_id(last_event_id)
+    stream = turn_streams.get(parsed[0]) if parsed else None
+    if stream is None and parsed:
+        # Turns are buffered by the worker running them; say so if that is another one
+        owner = await turn_streams.aowner(parsed[0])
+        if owner is not None and owner[0] != os.getpid() and owner[1] == thread_id:
+            metrics.increment("stream.resumes_misdirected")
+            raise HTTPException(
+                status_code=421,
+                detail=(
+                    "This turn is running on another worker; resuming needs a connection "
+                    "to that worker (sticky sessions), or send the query again without "
+                    "Last-Event-ID."
+                ),
             )
+    if stream is None or stream.thread_id != thread_id:
+        raise HTTPException(
+            status_code=404,
+            detail="Unknown or expired turn; send the query again without Last-Event-ID.",
+        )
+    logger.info(f"Resuming turn {stream.turn_id} on thread {thread_id} after event {parsed[1]}")
+    metrics.increment("stream.resumes")
+    return _event_stream_response(_relay(stream, parsed[1], request), stream.turn_id)
+
 
-            # Send completion event
-            complete_event = {
-                "type": "complete",
-                "response": final_result.get("final_response", "No response generated."),
-                "metadata": {
-                    "query_type": final_result.get("query_type"),
-                    "is_relevant": final_result.get("is_relevant"),
-                    "dish": final_result.get("dish"),
-                },
-                "thread_id": payload.thread_id,
-            }
-            yield f"data: {json.dumps(complete_event)}\n\n"
-
-            logger.info(f"Stream completed for thread: {payload.thread_id}")
-
-        except Exception as e:
-            logger.error(f"Stream error: {str(e)}", exc_info=True)
-            error_event = {"type": "error", "message": str(e)}
-            yield f"data: {json.dumps(error_event)}\n\n"
+def _duplicate_stream(idempotent: IdempotentRequest, request: Request) -> StreamingResponse:
+    """Answer a repeated Idempotency-Key from the original request instead of a new turn."""
+    stream = turn_streams.get(idempotent.turn_id) if idempotent.turn_id else None
+    if stream is not None:
+        # The original turn ran here: follow it from its first event
+        return _event_stream_response(_relay(stream, 0, request), stream.turn_id)
+
+    async def original_result():
+        try:
+            result = await idempotent.wait()
+        except IdempotencyPendingError as e:
+            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            return
+        yield f"data: {json.dumps({'type': 'complete', **result})}\n\n"
+
+    return _event_stream_response(original_result(), idempotent.turn_id)
+
+
+@router.post("/stream")
+async def cooking_stream_endpoint(
+    payload: QueryInput,
+    request: Request,
+    last_event_id: Annotated[str | None, Header()] = None,
+    idempotency_key: Annotated[str | None, Header()] = None,
+):
+    """
+    Streaming endpoint for cooking queries with real-time progress updates.
+    Uses Server-Sent Events (SSE) to stream node execution progress.
+
+    Every event has an ID "<turn_id>:<seq>" (the turn_id is also sent in the
+    X-Turn-Id header). A client that lost the connection re-sends the request
+    with a Last-Event-ID header to attach to the same turn, running or
+    finished, and receive only the events after that one; the query is not
+    run again. An Idempotency-Key header does the same for a retry that has no
+    event ID yet: it gets the original turn's events (or result) instead of a
+    new turn.
+
+    Concurrent streams are capped per worker; when the wait queue is full the
+    request is answered 429 with a Retry-After header before streaming starts.
+    If the client disconnects mid-turn and does not come back within
+    STREAM_RESUME_GRACE_SECONDS, the graph run is cancelled (or, with
+    STREAM_DISCONNECT_POLICY=finish, completed and persisted in the background).
+    """
+    if last_event_id:
+        return await _resume_stream(payload.thread_id, last_event_id, request)
+
+    turn_id = uuid.uuid4().hex
+    idempotent = None
+    if idempotency_key:
+        idempotent = await _begin_idempotent(idempotency_key, payload, turn_id)
+        if not idempotent.is_owner:
+            return _duplicate_stream(idempotent, request)
+
+    try:
+        try:
+            slot = await stream_admission.acquire()
+        except AdmissionRejectedError as e:
+            logger.warning(f"Rejecting stream for thread {payload.thread_id}: {e}")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many concurrent requests, please retry shortly.",
+                headers={"Retry-After": str(e.retry_after)},
+            ) from e
+
+        # One turn at a time per thread (409 if the previous one does not finish in time)
+        try:
+            lease = await _acquire_turn(payload.thread_id)
+        except BaseException:
+            slot.release()
+            raise
+    except BaseException:
+        if idempotent is not None:
+            await idempotent.finish(None)
+        raise
+
+    async def release(result: dict | None = None):
+        await lease.release()
+        slot.release()
+        if idempotent is not None:
+            await idempotent.finish(result)
+
+    async def run_turn():
+        result = None
+        try:
+            # The handler task that took the lease is gone by now; a newer
+            # turn (TURN_CANCEL_PREVIOUS) must cancel this one
+            lease.bind(asyncio.current_task())
+            result = await _stream_turn(payload, stream)
+        finally:
+            await release(result)
+
+    stream = turn_streams.create(payload.thread_id, turn_id)
+
+    async def event_generator():
+        stream.start(run_turn())
+        async for chunk in _relay(stream, 0, request):
+            yield chunk
+
+    async def release_unstarted():
+        # The turn releases its own slot and lease; this covers clients that
+        # left before the stream (and so the turn) started
+        if stream.task is None:
+            turn_streams.discard(stream)
+            await release()
+
+    return _event_stream_response(
+        event_generator(), stream.turn_id, background=BackgroundTask(release_unstarted)
+    )
+
+
+async def _run_turn(payload: QueryInput) -> dict:
+    """
+    Run one turn to completion on the event loop (graph nodes run async).
+
+    Returns the QueryResponse fields.
+
+    Raises:
+        TurnBusyError: If another turn kept the thread busy for too long
+    """
+    lease = await turn_locks.acquire(payload.thread_id)
+    try:
+        await conversation_service.asave_message(
+            thread_id=payload.thread_id,
+            role="user",
+            content=payload.query,
+            user_id=payload.user_id,
+        )
+
+        initial_state = {"query": payload.query, "search_results": []}
+        config = {"configurable": {"thread_id": payload.thread_id}}
+        result = await get_cooking_graph().ainvoke(initial_state, config)
+
+        response = result.get("final_response", "No response generated.")
+        metadata = {
+            "query_type": result.get("query_type"),
+            "is_relevant": result.get("is_relevant"),
+            "dish": result.get("dish"),
+        }
+        await conversation_service.asave_message(
+            thread_id=payload.thread_id,
+            role="assistant",
+            content=response,
+            metadata=metadata,
+        )
+        return {"response": response, "metadata": metadata, "thread_id": payload.thread_id}
+    finally:
+        await lease.release()
+
+
+def _batch_key(payload: QueryInput) -> tuple:
+    # Queries on fresh threads are interchangeable; an explicit thread_id makes
+    # the query a turn of that conversation
+    thread_id = payload.thread_id if "thread_id" in payload.model_fields_set else None
+    return normalize_key(payload.query, payload.user_id, thread_id)
+
+
+async def _run_batch(queries: list[QueryInput], groups: list[list[int]], limit: int):
+    """Run each group of identical queries once, yielding NDJSON lines as runs finish."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(indexes: list[int]) -> tuple[list[int], dict]:
+        async with semaphore:
+            try:
+                return indexes, await _run_turn(queries[indexes[0]])
+            except Exception as e:
+                logger.warning(f"Batch query {indexes[0]} failed: {e}")
+                metrics.increment("batch.failed")
+                return indexes, {"error": str(e)}
+
+    tasks = [asyncio.create_task(run(indexes)) for indexes in groups]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            indexes, result = await finished
+            for index in indexes:
+                yield json.dumps({"index": index, **result}) + "\n"
+    finally:
+        # Client gone (or the server stopping): do not run the rest
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/batch")
+async def cooking_batch_endpoint(batch: BatchQueryInput):
+    """
+    Run many cooking queries, streaming results back as NDJSON as each finishes.
+
+    Each line is {"index": <position in the request>, "response", "metadata",
+    "thread_id"}, or {"index", "error"} for a query that failed; lines come in
+    completion order. Identical queries (ignoring case and whitespace) on
+    fresh threads, or on the same explicit thread_id, run once and share the
+    result. At most `max_concurrency` (capped at BATCH_MAX_CONCURRENCY) graph
+    runs are in flight at once.
+    """
+    if len(batch.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=413, detail=f"A batch may hold at most {BATCH_MAX_QUERIES} queries."
+        )
+
+    groups: dict[tuple, list[int]] = {}
+    for index, payload in enumerate(batch.queries):
+        groups.setdefault(_batch_key(payload), []).append(index)
+    limit = min(batch.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+
+    logger.info(
+        f"Running batch of {len(batch.queries)} queries ({len(groups)} unique, {limit} at a time)"
+    )
+    metrics.increment("batch.queries", len(batch.queries))
+    metrics.increment("batch.deduplicated", len(batch.queries) - len(groups))
 
     return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",  # Disable nginx buffering
-        },
+        _run_batch(batch.queries, list(groups.values()), limit),
+        media_type="application/x-ndjson",
     )
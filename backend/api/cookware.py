@@ -0,0 +1,66 @@
+import logging
+
+from fastapi import APIRouter, HTTPException
+
+from schemas.cookware import AddCookwareRequest, CookwareInventoryResponse, SetCookwareRequest
+from services import cookware_service
+
+logger = logging.getLogger(__name__)
+
+# Plain def routes: FastAPI runs them in its threadpool, since the service
+# reads the DB and waits on the writer synchronously
+router = APIRouter(prefix="/api/users/{user_id}/cookware", tags=["cookware"])
+
+
+def _inventory_response(user_id: str, items: list[str]) -> CookwareInventoryResponse:
+    if items:
+        return CookwareInventoryResponse(user_id=user_id, items=items, is_default=False)
+    return CookwareInventoryResponse(
+        user_id=user_id, items=cookware_service.get_effective_cookware(None), is_default=True
+    )
+
+
+@router.get("", response_model=CookwareInventoryResponse)
+def get_cookware(user_id: str):
+    """Get a user's kitchen inventory."""
+    try:
+        return _inventory_response(user_id, cookware_service.get_user_cookware(user_id))
+    except Exception as e:
+        logger.error(f"Error fetching cookware: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.put("", response_model=CookwareInventoryResponse)
+def set_cookware(user_id: str, request: SetCookwareRequest):
+    """Replace a user's kitchen inventory."""
+    try:
+        items = cookware_service.set_user_cookware(user_id, request.items)
+        return _inventory_response(user_id, items)
+    except Exception as e:
+        logger.error(f"Error updating cookware: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.post("", response_model=CookwareInventoryResponse)
+def add_cookware(user_id: str, request: AddCookwareRequest):
+    """Add an item to a user's kitchen inventory."""
+    try:
+        items = cookware_service.add_user_cookware(user_id, request.name)
+        return _inventory_response(user_id, items)
+    except Exception as e:
+        logger.error(f"Error adding cookware: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.delete("/{name}")
+def remove_cookware(user_id: str, name: str):
+    """Remove an item from a user's kitchen inventory."""
+    try:
+        if not cookware_service.remove_user_cookware(user_id, name):
+            raise HTTPException(status_code=404, detail="Cookware item not found")
+        return {"status": "deleted", "user_id": user_id, "name": name}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error removing cookware: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
@@ -0,0 +1,162 @@
+"""
+Size and CPU cost of checkpoint compression.
+
+Builds checkpoints shaped like the cooking graph's (growing message history,
+accumulated Tavily results) for many threads, trains a zstd dictionary on
+half of them and encodes the other half with each storage format:
+  - legacy: base64 inside the JSON column (the format before codecs)
+  - raw: serialized bytes in the payload column
+  - zstd: zstd without a dictionary
+  - zstd+dict: zstd with the trained dictionary
+Reports the mean stored size and encode/decode time per checkpoint, and the
+CPU added per turn (a turn writes PUTS_PER_TURN checkpoints and reads one).
+
+Usage (from backend/):
+    python -m benchmarks.bench_checkpoint_compression [--threads 1000] [--level 3]
+"""
+
+import argparse
+import base64
+import json
+import random
+import statistics
+import time
+
+import zstandard
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Checkpoints written by one turn of the cooking graph (one per superstep)
+PUTS_PER_TURN = 8
+
+DISHES = [
+    "pasta carbonara", "chicken tikka masala", "mushroom risotto", "pad thai", "shakshuka",
+    "beef stroganoff", "french onion soup", "banana bread", "clam chowder", "paella",
+    "ratatouille", "miso soup", "lasagna bolognese", "fish and chips", "butter chicken",
+]  # fmt: skip
+WORDS = [
+    "add", "the", "onions", "and", "cook", "until", "soft", "then", "stir", "in", "garlic",
+    "ginger", "spices", "simmer", "gently", "season", "with", "salt", "pepper", "toss", "pasta",
+    "water", "whisk", "eggs", "cheese", "bake", "for", "twenty", "minutes", "golden", "rest",
+    "before", "slicing", "serve", "fresh", "herbs", "lemon",
+]  # fmt: skip
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _search_result(rng: random.Random, dish: str) -> dict:
+    return {
+        "query": f"{dish} recipe",
+        "follow_up_questions": None,
+        "answer": None,
+        "images": [],
+        "results": [
+            {
+                "url": f"https://www.example-recipes.com/{dish.replace(' ', '-')}-{rng.randint(1, 999)}",
+                "title": f"{dish.title()} Recipe - Easy and Authentic",
+                "content": _text(rng, rng.randint(40, 80)),
+                "score": round(rng.random(), 4),
+                "raw_content": None,
+            }
+            for _ in range(3)
+        ],
+        "response_time": round(rng.uniform(0.5, 2.5), 2),
+    }
+
+
+def make_checkpoint(rng: random.Random) -> dict:
+    """Latest checkpoint of a thread after a random number of turns."""
+    checkpoint = empty_checkpoint()
+    messages, search_results = [], []
+    for _ in range(rng.randint(1, 8)):
+        dish = rng.choice(DISHES)
+        query = f"How do I make {dish}?"
+        answer = _text(rng, rng.randint(60, 200))
+        messages += [HumanMessage(content=query), AIMessage(content=answer)]
+        search_results.append(_search_result(rng, dish))
+    checkpoint["channel_values"] = {
+        "messages": messages,
+        "query": query,
+        "is_relevant": True,
+        "query_type": "recipe_request",
+        "dish": dish,
+        "ingredients": None,
+        "needs_search": True,
+        "search_results": search_results,
+        "search_context": _text(rng, 150),
+        "required_cookware": ["Pot", "Frying Pan"],
+        "can_cook": True,
+        "missing_cookware": [],
+        "final_response": answer,
+    }
+    return checkpoint
+
+
+def _timed(fn, items) -> tuple[list, float]:
+    """Results of fn over items, and mean microseconds per call."""
+    started = time.perf_counter()
+    results = [fn(item) for item in items]
+    return results, (time.perf_counter() - started) / len(items) * 1e6
+
+
+def run(threads: int, level: int, dict_size: int) -> None:
+    rng = random.Random(7)
+    serde = JsonPlusSerializer()
+    typed = [serde.dumps_typed(make_checkpoint(rng)) for _ in range(threads)]
+    serialized = [data for _, data in typed]
+    train, test = serialized[: threads // 2], serialized[threads // 2 :]
+
+    started = time.perf_counter()
+    dictionary = zstandard.train_dictionary(dict_size, train)
+    train_seconds = time.perf_counter() - started
+    dictionary.precompute_compress(level=level)
+
+    plain = zstandard.ZstdCompressor(level=level)
+    with_dict = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+    codecs = {
+        "legacy": (
+            lambda data: json.dumps(
+                {"checkpoint": {"type": "msgpack", "data": base64.b64encode(data).decode()}}
+            ).encode(),
+            lambda blob: base64.b64decode(json.loads(blob)["checkpoint"]["data"]),
+        ),
+        "raw": (bytes, bytes),
+        "zstd": (plain.compress, zstandard.ZstdDecompressor().decompress),
+        "zstd+dict": (
+            with_dict.compress,
+            zstandard.ZstdDecompressor(dict_data=dictionary).decompress,
+        ),
+    }
+
+    print(
+        f"{len(test)} checkpoints, mean {statistics.mean(len(d) for d in test):,.0f} bytes "
+        f"serialized; {len(dictionary.as_bytes()):,} byte dictionary trained on {len(train)} "
+        f"in {train_seconds:.2f}s (level {level})\n"
+    )
+    print(
+        f"{'codec':<10} {'bytes':>8} {'vs legacy':>10} {'encode':>10} {'decode':>10} {'per turn':>10}"
+    )
+    legacy_size = None
+    for name, (encode, decode) in codecs.items():
+        blobs, encode_us = _timed(encode, test)
+        decoded, decode_us = _timed(decode, blobs)
+        assert decoded == test
+        size = statistics.mean(len(blob) for blob in blobs)
+        legacy_size = legacy_size or size
+        per_turn_us = PUTS_PER_TURN * encode_us + decode_us
+        print(
+            f"{name:<10} {size:>8,.0f} {size / legacy_size:>10.1%} {encode_us:>8.1f}us "
+            f"{decode_us:>8.1f}us {per_turn_us / 1000:>8.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=1000)
+    parser.add_argument("--level", type=int, default=3)
+    parser.add_argument("--dict-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+    run(args.threads, args.level, args.dict_size)
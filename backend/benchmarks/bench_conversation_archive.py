@@ -0,0 +1,152 @@
+"""
+Space saved by archiving idle conversations, and the cost of bringing one back.
+
+Builds a throwaway SQLite database of N threads with a few turns each: two
+messages and eight growing checkpoints per turn, like the cooking graph
+writes. It then archives every thread and reports the hot-table bytes
+before and after, the archive size, the archiving rate, and the latency of
+opening an archived conversation (restore plus message read).
+
+Usage (from backend/):
+    python -m benchmarks.bench_conversation_archive [--threads 500] [--turns 4]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.bench_checkpoint_compression import PUTS_PER_TURN, _search_result, _text
+
+DISHES = ["cullen skink", "cranachan", "haggis", "bannocks", "scotch broth", "clapshot"]
+
+# Tables (and their indexes) that archived rows are moved out of
+HOT_TABLES = ("messages", "checkpoints", "messages_fts")
+
+
+def populate(threads: int, turns: int, seed: int = 7) -> None:
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langgraph.checkpoint.base import empty_checkpoint
+
+    from checkpointer.compression import checkpoint_codec
+    from checkpointer.sqlite_checkpointer import SQLiteCheckpointSaver
+    from database.writer import submit_write
+
+    rng = random.Random(seed)
+    saver = SQLiteCheckpointSaver()
+    for _ in range(threads):
+        thread_id = str(uuid.uuid4())
+        config = {"configurable": {"thread_id": thread_id}}
+        checkpoint = empty_checkpoint()
+        messages, search_results = [], []
+        for _ in range(turns):
+            dish = rng.choice(DISHES)
+            query, answer = f"How do I make {dish}?", _text(rng, rng.randint(60, 200))
+            for role, content in (("user", query), ("assistant", answer)):
+                submit_write(
+                    "save_message",
+                    thread_id=thread_id,
+                    role=role,
+                    content=content,
+                    metadata=None,
+                    user_id=None,
+                    title=dish.title(),
+                )
+            messages.append(HumanMessage(content=query))
+            # Each superstep checkpoints the state as it fills in
+            for step in range(PUTS_PER_TURN):
+                if step == 3:
+                    search_results.append(_search_result(rng, dish))
+                if step == PUTS_PER_TURN - 1:
+                    messages.append(AIMessage(content=answer))
+                checkpoint["channel_values"] = {
+                    "messages": list(messages),
+                    "query": query,
+                    "dish": dish,
+                    "search_results": list(search_results),
+                    "search_context": _text(rng, 150) if step >= 4 else None,
+                    "final_response": answer if step == PUTS_PER_TURN - 1 else None,
+                }
+                saver.put(config, checkpoint, {"step": step}, {})
+    checkpoint_codec.train_dictionary()
+
+
+def table_bytes(names: tuple[str, ...]) -> int:
+    """Bytes on disk of tables (and their indexes) whose names start with `names`."""
+    from sqlalchemy import text
+
+    from database.connection import engine
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT coalesce(i.tbl_name, d.name) AS owner, sum(d.pgsize) AS size "
+                "FROM dbstat d LEFT JOIN sqlite_master i ON i.name = d.name AND i.type = 'index' "
+                "GROUP BY owner"
+            )
+        ).all()
+    return sum(row.size for row in rows if row.owner.startswith(names))
+
+
+def run(threads: int, turns: int, samples: int) -> None:
+    from sqlalchemy import select
+
+    from database.connection import get_db
+    from database.models import Conversation
+    from services import conversation_archive, conversation_service
+
+    started = time.perf_counter()
+    populate(threads, turns)
+    print(
+        f"{threads:,} threads x {turns} turns ({threads * turns * PUTS_PER_TURN:,} checkpoints) "
+        f"written in {time.perf_counter() - started:.1f}s"
+    )
+    hot_before = table_bytes(HOT_TABLES)
+
+    started = time.perf_counter()
+    archived = conversation_archive.archive_idle_conversations(
+        datetime.utcnow() + timedelta(days=1)
+    )
+    elapsed = time.perf_counter() - started
+    hot_after = table_bytes(HOT_TABLES)
+    archive_bytes = table_bytes(("conversation_archives",))
+    print(f"archived {archived:,} threads at {archived / elapsed:,.0f}/s")
+    print(
+        f"hot tables  {hot_before / 1e6:>8.2f} MB -> {hot_after / 1e6:.2f} MB\n"
+        f"archive     {archive_bytes / 1e6:>8.2f} MB "
+        f"({archive_bytes / hot_before:.1%} of the hot bytes it replaced)"
+    )
+
+    with get_db() as db:
+        thread_ids = db.scalars(select(Conversation.thread_id)).all()
+    timings = []
+    for thread_id in random.Random(1).sample(thread_ids, min(samples, len(thread_ids))):
+        started = time.perf_counter()
+        messages = conversation_service.get_conversation_messages(thread_id)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert len(messages) == turns * 2
+    timings.sort()
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    print(
+        f"open archived conversation: p50 {statistics.median(timings):.2f} ms, "
+        f"p95 {p95:.2f} ms ({len(timings)} samples)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_dir}/bench.db"
+        from database.init import create_tables
+
+        create_tables()
+        run(args.threads, args.turns, args.samples)
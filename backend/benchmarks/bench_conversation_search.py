@@ -0,0 +1,111 @@
+"""
+Benchmark conversation full-text search over a large synthetic history.
+
+Builds a throwaway SQLite database with N messages, indexed through the
+normal FTS5 triggers, then times `search_conversations` for rare, common,
+multi-word and prefix queries.
+
+Usage (from backend/):
+    python -m benchmarks.bench_conversation_search [--messages 1000000] [--runs 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+COMMON = [
+    "the", "and", "with", "until", "then", "add", "heat", "stir", "cook", "minutes", "pan", "salt",
+    "pepper", "oil", "water", "bake", "oven", "serve", "mix", "bowl", "chop", "garlic", "onion",
+    "butter", "flour", "sugar", "egg",
+]  # fmt: skip
+DISHES = [
+    "carbonara", "risotto", "paella", "ramen", "lasagna", "gumbo", "goulash", "biryani", "tagine",
+    "shakshuka", "moussaka", "pierogi", "bibimbap", "ceviche", "gnocchi", "jambalaya",
+]  # fmt: skip
+MESSAGES_PER_THREAD = 20
+
+QUERIES = [
+    ("rare word", "zabaglione"),
+    ("dish", "jambalaya"),
+    ("two words", "garlic butter"),
+    ("prefix", "shaksh"),
+    ("very common", "the"),
+]
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(COMMON, k=rng.randint(12, 40))
+    words.insert(rng.randrange(len(words)), rng.choice(DISHES))
+    return " ".join(words)
+
+
+def populate(total: int, seed: int = 7) -> float:
+    """Bulk insert `total` messages; returns messages indexed per second."""
+    from database.connection import engine
+
+    rng = random.Random(seed)
+    threads = max(1, total // MESSAGES_PER_THREAD)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        raw = conn.connection.driver_connection
+        conversation_ids = [str(uuid.uuid4()) for _ in range(threads)]
+        raw.executemany(
+            "INSERT INTO conversations (id, thread_id, title, created_at, updated_at, "
+            "message_count) VALUES (?, ?, ?, datetime('now'), datetime('now'), ?)",
+            (
+                (cid, str(uuid.uuid4()), f"{rng.choice(DISHES).title()} questions", 0)
+                for cid in conversation_ids
+            ),
+        )
+        raw.executemany(
+            "INSERT INTO messages (id, conversation_id, thread_id, role, content, timestamp) "
+            "VALUES (?, ?, ?, 'assistant', ?, datetime('now'))",
+            (
+                (str(uuid.uuid4()), conversation_ids[i % threads], "bench", _sentence(rng))
+                for i in range(total)
+            ),
+        )
+        # A handful of rare-term messages
+        raw.executemany(
+            "UPDATE messages SET content = content || ' zabaglione' WHERE rowid = ?",
+            ((rowid,) for rowid in rng.sample(range(1, total + 1), min(50, total))),
+        )
+    return total / (time.perf_counter() - started)
+
+
+def measure(runs: int) -> None:
+    from services.conversation_service import search_conversations
+
+    print(f"\n{'query':<14}{'text':<14}{'results':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for label, query in QUERIES:
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            results = search_conversations(query, limit=20)["results"]
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(
+            f"{label:<14}{query:<14}{len(results):>8}{statistics.median(timings):>9.1f}{p95:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_dir}/bench.db"
+        from database.init import create_tables
+
+        create_tables()
+        rate = populate(args.messages)
+        size_mb = os.path.getsize(f"{db_dir}/bench.db") / 1e6
+        print(f"indexed {args.messages:,} messages at {rate:,.0f}/s ({size_mb:,.0f} MB)")
+        measure(args.runs)
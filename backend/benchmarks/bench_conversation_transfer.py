@@ -0,0 +1,97 @@
+"""
+Throughput of the NDJSON conversation export and import.
+
+Builds a throwaway SQLite database with N messages and streams the export
+to a file, then imports the file into a second, empty database through the
+DB writer (search index included). Peak RSS growth during the export shows
+it does not scale with the history.
+
+Usage (from backend/):
+    python -m benchmarks.bench_conversation_transfer [--messages 500000]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def _read_file(path: str, chunk_size: int = 1 << 20):
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def export(total: int, path: str) -> None:
+    from benchmarks.bench_conversation_search import populate
+    from services.conversation_transfer import export_ndjson
+
+    populate(total)
+
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    with open(path, "w") as f:
+        for chunk in export_ndjson():
+            f.write(chunk)
+    elapsed = time.perf_counter() - started
+    size_mb = os.path.getsize(path) / 1e6
+    print(
+        f"export  {total:>10,} messages  {total / elapsed:>10,.0f} msg/s  "
+        f"{size_mb:,.0f} MB  peak RSS +{_peak_rss_mb() - rss_before:,.0f} MB"
+    )
+
+
+def load(path: str) -> None:
+    from services.conversation_transfer import import_ndjson
+
+    started = time.perf_counter()
+    totals = asyncio.run(import_ndjson(_read_file(path)))
+    elapsed = time.perf_counter() - started
+    messages = totals["messages"]
+    print(f"import  {messages:>10,} messages  {messages / elapsed:>10,.0f} msg/s")
+
+
+def _with_database(path: str) -> None:
+    # database.connection binds its engine at import, so each database gets its own process
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from database.init import create_tables
+
+    create_tables()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500_000)
+    parser.add_argument("--import-file", help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.import_file:
+        _with_database(args.database)
+        load(args.import_file)
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        export_path = os.path.join(db_dir, "export.ndjson")
+        _with_database(os.path.join(db_dir, "source.db"))
+        export(args.messages, export_path)
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.bench_conversation_transfer",
+                "--import-file",
+                export_path,
+                "--database",
+                os.path.join(db_dir, "target.db"),
+            ],
+            check=True,
+        )
@@ -0,0 +1,63 @@
+"""
+Latency of matching a user's ingredients against the ingredient index.
+
+Builds synthetic recipes of 5-12 ingredients drawn from COMMON_INGREDIENTS
+(skewed so staples like salt, onion and garlic appear in most recipes, as in
+real corpora) and times IngredientIndex.match for random 3-8 ingredient
+pantries, reporting p50/p95 and how many queries found a recipe.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ingredient_index [--sizes 10000 100000]
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from constants.constants import COMMON_INGREDIENTS
+from tools.ingredient_index import IngredientIndex
+
+
+def build_index(size: int, rng: np.random.Generator) -> tuple[IngredientIndex, np.ndarray]:
+    # Zipf-like popularity: a few staples dominate, most ingredients are rare
+    weights = 1 / np.arange(1, len(COMMON_INGREDIENTS) + 1)
+    popularity = rng.permutation(len(COMMON_INGREDIENTS))
+    probabilities = weights[popularity] / weights.sum()
+    index = IngredientIndex()
+    for i in range(size):
+        count = int(rng.integers(5, 13))
+        picks = rng.choice(len(COMMON_INGREDIENTS), count, replace=False, p=probabilities)
+        index.add(str(i), [COMMON_INGREDIENTS[p] for p in picks])
+    return index, probabilities
+
+
+def latency(sizes: list[int], runs: int = 500) -> None:
+    print(f"{'recipes':>9}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}{'answered':>10}")
+    for size in sizes:
+        rng = np.random.default_rng(0)
+        started = time.perf_counter()
+        index, probabilities = build_index(size, rng)
+        build = time.perf_counter() - started
+
+        timings, answered = [], 0
+        for _ in range(runs):
+            count = int(rng.integers(3, 9))
+            picks = rng.choice(len(COMMON_INGREDIENTS), count, replace=False, p=probabilities)
+            pantry = [COMMON_INGREDIENTS[p] for p in picks]
+            started = time.perf_counter()
+            answered += bool(index.match(pantry))
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(
+            f"{size:>9,}{build:>9.1f}{statistics.median(timings):>9.2f}"
+            f"{timings[int(runs * 0.95)]:>9.2f}{answered / runs:>10.1%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    latency(args.sizes)
@@ -0,0 +1,222 @@
+"""
+Offline evaluation of the local recipe knowledge base.
+
+Builds a labelled corpus (three documents per dish) and measures, for a
+sweep of similarity thresholds:
+  - hit rate: share of queries for stored dishes answered locally
+  - precision: share of local answers whose top document is the right dish
+  - false hits: share of queries for dishes NOT stored that are answered
+    locally instead of going to the web
+  - near misses: false hits for unstored dishes that share words with a
+    stored one ("beef stew" vs beef stroganoff), with and without requiring
+    the top document's title to name the dish (knowledge_base.names_dish)
+plus recall@3 and query latency as the index grows.
+
+Usage (from backend/):
+    python -m benchmarks.bench_knowledge_base [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from tools.embeddings import EMBEDDING_DIM, VectorIndex, embed_text
+from tools.knowledge_base import names_dish
+
+STORED_DISHES = {
+    "spaghetti carbonara": "spaghetti eggs pecorino guanciale black pepper",
+    "chicken tikka masala": "chicken yogurt garam masala tomato cream ginger garlic",
+    "beef stroganoff": "beef sirloin mushrooms onion sour cream egg noodles",
+    "mushroom risotto": "arborio rice mushrooms parmesan white wine stock butter",
+    "pad thai": "rice noodles shrimp tamarind fish sauce peanuts bean sprouts egg",
+    "french onion soup": "onions beef stock gruyere baguette butter thyme",
+    "banana bread": "bananas flour sugar butter eggs baking soda",
+    "guacamole": "avocado lime cilantro onion jalapeno salt",
+    "shakshuka": "eggs tomatoes peppers onion cumin paprika feta",
+    "lasagna bolognese": "lasagna sheets beef tomato bechamel parmesan",
+    "caesar salad": "romaine croutons parmesan anchovy lemon egg yolk",
+    "chocolate chip cookies": "flour butter brown sugar chocolate chips eggs vanilla",
+    "beef tacos": "ground beef tortillas onion cilantro lime salsa",
+    "vegetable stir fry": "broccoli bell pepper carrots soy sauce garlic ginger",
+    "clam chowder": "clams potatoes bacon onion cream celery",
+    "chicken noodle soup": "chicken carrots celery egg noodles onion stock",
+    "pancakes": "flour milk eggs butter baking powder sugar",
+    "ratatouille": "eggplant zucchini peppers tomatoes onion herbs",
+    "fish and chips": "cod potatoes flour beer oil",
+    "paella": "rice saffron chicken shrimp chorizo peas",
+    "apple pie": "apples pie crust sugar cinnamon butter",
+    "hummus": "chickpeas tahini lemon garlic olive oil",
+    "pulled pork": "pork shoulder barbecue sauce brown sugar paprika",
+    "miso soup": "miso dashi tofu wakame scallions",
+    "eggplant parmesan": "eggplant breadcrumbs marinara mozzarella parmesan",
+    "tiramisu": "ladyfingers espresso mascarpone eggs cocoa sugar",
+    "butter chicken": "chicken butter tomato cream garam masala fenugreek",
+    "greek salad": "tomatoes cucumber olives feta red onion oregano",
+    "beef chili": "ground beef kidney beans tomatoes chili powder cumin onion",
+    "margherita pizza": "pizza dough tomato mozzarella basil olive oil",
+}
+
+# Dishes absent from the corpus: a local answer here is a false hit
+UNSTORED_DISHES = [
+    "beef wellington",
+    "chicken katsu curry",
+    "lemon meringue pie",
+    "pho",
+    "jambalaya",
+    "falafel",
+    "coq au vin",
+    "bibimbap",
+    "gnocchi",
+    "moussaka",
+    "key lime pie",
+    "chicken pot pie",
+    "mapo tofu",
+    "tuna casserole",
+    "pumpkin soup",
+    "fried rice",
+    "crab cakes",
+    "goulash",
+    "pierogi",
+    "ceviche",
+]
+
+# Unstored dishes sharing words with a stored one; they embed close to it
+NEAR_MISS_DISHES = [
+    "beef stew",
+    "mushroom soup",
+    "banana pancakes",
+    "chicken curry",
+    "chicken salad",
+    "pork chili",
+    "chocolate cake",
+    "egg salad",
+    "apple crumble",
+    "fish tacos",
+]
+
+TITLE_TEMPLATES = ["Classic {dish}", "Easy {dish} Recipe", "The Best {dish} You'll Ever Make"]
+BODY_TEMPLATES = [
+    "This {dish} uses {ingredients}. Prep everything first, then cook in stages.",
+    "Our easy {dish}: combine {ingredients} and cook until done. Serves four.",
+    "Make {dish} at home with {ingredients}. Tips for getting it right every time.",
+]
+QUERY_TEMPLATES = [
+    "recipe for {dish}",
+    "how do I make {dish}",
+    "{dish} recipe easy",
+    "best homemade {dish}",
+]
+
+
+def _typo(text: str, rng: random.Random) -> str:
+    """Swap two adjacent letters in the longest word."""
+    words = text.split()
+    longest = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[longest]
+    if len(word) > 3:
+        i = rng.randrange(1, len(word) - 2)
+        words[longest] = word[:i] + word[i + 1] + word[i] + word[i + 2 :]
+    return " ".join(words)
+
+
+def build_corpus() -> tuple[VectorIndex, dict[str, str], dict[str, str]]:
+    index = VectorIndex(EMBEDDING_DIM)
+    labels, titles = {}, {}
+    for dish, ingredients in STORED_DISHES.items():
+        for n, (title, body) in enumerate(zip(TITLE_TEMPLATES, BODY_TEMPLATES, strict=True)):
+            doc_id = f"{dish}#{n}"
+            title = title.format(dish=dish.title())
+            content = body.format(dish=dish, ingredients=ingredients.replace(" ", ", "))
+            # Same text layout as RecipeKnowledgeBase.ingest
+            index.add([doc_id], embed_text(f"{title} {title} {content}")[None, :])
+            labels[doc_id] = dish
+            titles[doc_id] = title
+    return index, labels, titles
+
+
+def build_queries(rng: random.Random, dishes: list[str]) -> list[tuple[str, str, str]]:
+    """(query, dish, dish as the classifier names it) triples; one query per dish has a typo."""
+    queries = []
+    for dish in dishes:
+        for template in QUERY_TEMPLATES:
+            queries.append((template.format(dish=dish), dish, dish))
+        typo = _typo(dish, rng)
+        queries.append((f"recipe for {typo}", dish, typo))
+    return queries
+
+
+def evaluate(
+    index: VectorIndex, labels: dict[str, str], titles: dict[str, str], rng: random.Random
+) -> None:
+    stored = build_queries(rng, list(STORED_DISHES))
+    unstored = build_queries(rng, UNSTORED_DISHES)
+    near = build_queries(rng, NEAR_MISS_DISHES)
+
+    def top(queries):
+        """(top document, score, whether its title names the dish) per query."""
+        tops = []
+        for query, _, named in queries:
+            doc_id, score = index.search(embed_text(query), 1)[0]
+            tops.append((doc_id, score, names_dish(titles[doc_id], named)))
+        return tops
+
+    stored_top, unstored_top, near_top = top(stored), top(unstored), top(near)
+    recall = statistics.mean(
+        sum(labels[doc_id] == dish for doc_id, _ in index.search(embed_text(query), 3)) / 3
+        for query, dish, _ in stored
+    )
+    print(
+        f"{len(stored)} stored-dish queries, {len(unstored)} unstored, {len(near)} near misses; "
+        f"recall@3 = {recall:.3f}\n"
+    )
+    print(
+        f"{'threshold':>9}{'hit rate':>10}{'precision':>11}{'false hits':>12}"
+        f"{'near misses':>13}{'(score only)':>14}"
+    )
+    for threshold in (0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.55, 0.6):
+        served = [
+            (doc_id, dish)
+            for (doc_id, score, named), (_, dish, _) in zip(stored_top, stored, strict=True)
+            if score >= threshold and named
+        ]
+        correct = sum(labels[doc_id] == dish for doc_id, dish in served)
+        false_hits = sum(score >= threshold and named for _, score, named in unstored_top)
+        near_hits = sum(score >= threshold and named for _, score, named in near_top)
+        near_scored = sum(score >= threshold for _, score, _ in near_top)
+        print(
+            f"{threshold:>9.2f}{len(served) / len(stored):>10.1%}"
+            f"{(correct / len(served) if served else 1):>11.1%}"
+            f"{false_hits / len(unstored):>12.1%}"
+            f"{near_hits / len(near):>13.1%}{near_scored / len(near):>14.1%}"
+        )
+
+
+def latency(sizes: list[int], runs: int = 200) -> None:
+    print(f"\n{'documents':>10}{'p50 ms':>9}{'p95 ms':>9}  (embed query + exact top-3)")
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        index = VectorIndex(EMBEDDING_DIM)
+        vectors = rng.standard_normal((size, EMBEDDING_DIM), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.add([str(i) for i in range(size)], vectors)
+
+        timings = []
+        for i in range(runs):
+            started = time.perf_counter()
+            index.search(embed_text(f"recipe for dish number {i}"), 3)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"{size:>10,}{statistics.median(timings):>9.2f}{timings[int(runs * 0.95)]:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    index, labels, titles = build_corpus()
+    evaluate(index, labels, titles, random.Random(7))
+    latency(args.sizes)
@@ -0,0 +1,99 @@
+"""
+Per-turn CPU cost of building the classifier and response prompts.
+
+Compares the previous per-call construction (parse the template literal,
+regenerate the classifier's format instructions, build history with +=)
+against the precompiled templates in graphs.prompts, rendering the final
+messages in both cases. No LLM is called.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prompts [--iterations 2000] [--history 6]
+"""
+
+import argparse
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from graphs.prompts import (
+    CLASSIFIER_INPUT,
+    CLASSIFIER_INSTRUCTIONS,
+    CLASSIFIER_PROMPT,
+    RESPONSE_INPUT,
+    RESPONSE_INSTRUCTIONS,
+    RESPONSE_PROMPT,
+    format_history,
+)
+from schemas.classification import ClassificationOutput
+
+
+def _history(messages, header):
+    context = ""
+    if messages:
+        context = f"{header}:\n"
+        for msg in messages[-6:]:
+            role = "User" if isinstance(msg, HumanMessage) else "Assistant"
+            context += f"{role}: {msg.content}\n"
+    return context
+
+
+def per_call_turn(messages, variables):
+    parser = PydanticOutputParser(pydantic_object=ClassificationOutput)
+    ChatPromptTemplate.from_messages(
+        [("system", CLASSIFIER_INSTRUCTIONS), ("human", CLASSIFIER_INPUT)]
+    ).format_messages(
+        query=variables["query"],
+        conversation_context=_history(messages, "Recent Conversation"),
+        format_instructions=parser.get_format_instructions(),
+    )
+    ChatPromptTemplate.from_messages(
+        [("system", RESPONSE_INSTRUCTIONS), ("human", RESPONSE_INPUT)]
+    ).format_messages(conversation_context=_history(messages, "Conversation History"), **variables)
+
+
+def precompiled_turn(messages, variables):
+    CLASSIFIER_PROMPT.format_messages(
+        query=variables["query"],
+        conversation_context=format_history(messages, "Recent Conversation"),
+    )
+    RESPONSE_PROMPT.format_messages(
+        conversation_context=format_history(messages, "Conversation History"), **variables
+    )
+
+
+def measure(build, messages, variables, iterations: int) -> float:
+    """Mean CPU microseconds per turn."""
+    build(messages, variables)  # Warm up
+    started = time.process_time()
+    for _ in range(iterations):
+        build(messages, variables)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=6, help="messages of prior history")
+    args = parser.parse_args()
+
+    messages = [
+        (HumanMessage if i % 2 == 0 else AIMessage)(content=f"Message {i} about carbonara " * 8)
+        for i in range(args.history)
+    ] + [HumanMessage(content="Can I use bacon instead of guanciale?")]
+    variables = {
+        "query": "Can I use bacon instead of guanciale?",
+        "query_type": "recipe_request",
+        "dish": "carbonara",
+        "ingredients": [],
+        "search_context": "\n\nWeb Search Results:\n" + "Whisk eggs and pecorino. " * 60,
+        "cookware_context": "\n\nRequired Cookware: Frying Pan, Little Pot",
+    }
+
+    before = measure(per_call_turn, messages, variables, args.iterations)
+    after = measure(precompiled_turn, messages, variables, args.iterations)
+    print(f"{'per-call templates':<22}{before:>9.1f} us/turn")
+    print(f"{'precompiled':<22}{after:>9.1f} us/turn")
+    saved = before - after
+    print(f"saved {saved:.1f} us/turn = {saved * 1000 / 1e6:.3f} CPU-s per second at 1,000 turns/s")
@@ -0,0 +1,231 @@
+"""
+CPU-time and query-count regression check over a fixed conversation corpus.
+
+Runs CORPUS (multi-turn cooking conversations) through /api/cooking against
+a fresh SQLite database, with OpenAI and Tavily answered from a cassette by
+the replay proxy (benchmarks.cassettes, in its own process so its CPU is
+not counted). Each repeat runs in a fresh process. Reports CPU time, SQL
+statements and upstream requests for the corpus and compares them with the
+baseline file: it exits 1 if CPU time grew by more than --cpu-tolerance or
+if the statement or upstream request counts grew at all.
+
+Usage (from backend/):
+    python -m benchmarks.bench_replay --record [--fake-upstreams]  # (re)record the cassette
+    python -m benchmarks.bench_replay --update-baseline            # accept the current numbers
+    python -m benchmarks.bench_replay [--repeats 3] [--latency-scale 0]
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CASSETTE_DIR = os.path.join(os.path.dirname(__file__), "cassettes")
+CASSETTE = os.path.join(CASSETTE_DIR, "cooking_corpus.json")
+BASELINE = os.path.join(CASSETTE_DIR, "cooking_corpus.baseline.json")
+
+# Conversations run in order, each on its own thread; turns within one share history
+CORPUS = [
+    ["How do I make pasta carbonara?", "Can I use bacon instead of guanciale?"],
+    ["What can I cook with eggs, spinach and feta?", "How long should it bake?"],
+    ["How do I make a mushroom risotto?", "Can I make it without wine?", "How do I reheat it?"],
+    ["What temperature should I roast a chicken at?"],
+    ["How do I make pasta carbonara?"],
+    ["What's the capital of France?"],
+    ["I have rice, chickpeas and tomatoes. What can I make?", "Make it spicier"],
+    ["How do I make shakshuka?", "What bread goes with it?"],
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(module: str, *args: str) -> tuple[subprocess.Popen, str]:
+    """Start a proxy or fake upstream server process and wait until it accepts connections."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", module, *args, "--port", str(port)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"{module} did not start")
+
+
+def _stop_proxy(process: subprocess.Popen) -> tuple[int, int]:
+    """Stop the proxy (saving a recording) and return its request and miss counts."""
+    process.send_signal(signal.SIGINT)
+    output, _ = process.communicate(timeout=30)
+    match = re.search(r"(\d+) requests, (\d+) unrecorded", output)
+    return (int(match[1]), int(match[2])) if match else (0, 0)
+
+
+def run_corpus() -> dict:
+    """Run the corpus in this process (environment already set) and measure it."""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from database.connection import async_engine, engine
+    from main import app
+
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", count)
+
+    turns = 0
+    with TestClient(app) as client:
+        started_cpu, started = time.process_time(), time.perf_counter()
+        for number, conversation in enumerate(CORPUS):
+            for query in conversation:
+                response = client.post(
+                    "/api/cooking", json={"query": query, "thread_id": f"corpus-{number}"}
+                )
+                response.raise_for_status()
+                turns += 1
+        cpu, wall = time.process_time() - started_cpu, time.perf_counter() - started
+    return {"turns": turns, "cpu_seconds": cpu, "wall_seconds": wall, "statements": statements}
+
+
+def _run_once(proxy_url: str) -> dict:
+    with tempfile.TemporaryDirectory() as db_dir:
+        env = dict(os.environ)
+        env.update(
+            {
+                "DATABASE_URL": f"sqlite:///{db_dir}/corpus.db",
+                "OPENAI_BASE_URL": f"{proxy_url}/v1",
+                "TAVILY_API_BASE_URL": proxy_url,
+                "WARM_UP_ON_STARTUP": "false",
+            }
+        )
+        env.setdefault("OPENAI_API_KEY", "replay-key")
+        env.setdefault("TAVILY_API_KEY", "replay-key")
+        env.pop("SHARED_STATE_ADDRESS", None)
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_replay", "--run-once"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def record(cassette: str, fake_upstreams: bool) -> None:
+    fake = None
+    upstream_args = []
+    if fake_upstreams:
+        fake, fake_url = _start("benchmarks.fake_upstreams", "--latency", "0.05")
+        upstream_args = ["--openai-upstream", fake_url, "--tavily-upstream", fake_url]
+        os.environ.update({"OPENAI_API_KEY": "fake-key", "TAVILY_API_KEY": "fake-key"})
+    proxy, proxy_url = _start("benchmarks.cassettes", "record", cassette, *upstream_args)
+    try:
+        result = _run_once(proxy_url)
+    finally:
+        requests, _ = _stop_proxy(proxy)
+        if fake is not None:
+            fake.terminate()
+    print(f"recorded {requests} upstream requests over {result['turns']} turns to {cassette}")
+
+
+def replay(cassette: str, baseline_path: str, repeats: int, latency_scale: float) -> dict:
+    proxy, proxy_url = _start(
+        "benchmarks.cassettes", "replay", cassette, "--latency-scale", str(latency_scale)
+    )
+    try:
+        runs = [_run_once(proxy_url) for _ in range(repeats)]
+    finally:
+        requests, misses = _stop_proxy(proxy)
+    if misses:
+        sys.exit(f"{misses} upstream requests were not in the cassette; re-record it (--record)")
+    return {
+        "turns": runs[0]["turns"],
+        # The least disturbed run is the best estimate of the code's own cost
+        "cpu_seconds": round(min(run["cpu_seconds"] for run in runs), 4),
+        "wall_seconds": round(statistics.median(run["wall_seconds"] for run in runs), 4),
+        "statements": max(run["statements"] for run in runs),
+        "upstream_requests": requests // repeats,
+    }
+
+
+def regressions(current: dict, baseline: dict, cpu_tolerance: float) -> list[str]:
+    """Human-readable regressions of `current` against `baseline` (empty if none)."""
+    found = []
+    if current["cpu_seconds"] > baseline["cpu_seconds"] * (1 + cpu_tolerance):
+        found.append(
+            f"CPU time {current['cpu_seconds']:.3f}s is more than {cpu_tolerance:.0%} over "
+            f"the baseline {baseline['cpu_seconds']:.3f}s"
+        )
+    for name in ("statements", "upstream_requests"):
+        if current[name] > baseline[name]:
+            found.append(f"{name} grew from {baseline[name]} to {current[name]}")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cassette", default=CASSETTE)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--record", action="store_true", help="record the cassette")
+    parser.add_argument(
+        "--fake-upstreams", action="store_true", help="record from benchmarks.fake_upstreams"
+    )
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency-scale", type=float, default=0.0)
+    parser.add_argument("--cpu-tolerance", type=float, default=0.2)
+    parser.add_argument("--run-once", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_once:
+        import logging
+
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(run_corpus()))
+        sys.exit()
+    if args.record:
+        record(args.cassette, args.fake_upstreams)
+        sys.exit()
+
+    current = replay(args.cassette, args.baseline, args.repeats, args.latency_scale)
+    turns = current["turns"]
+    print(
+        f"{turns} turns: CPU {current['cpu_seconds']:.3f}s "
+        f"({current['cpu_seconds'] / turns * 1000:.1f} ms/turn), "
+        f"wall {current['wall_seconds']:.2f}s, {current['statements']} SQL statements "
+        f"({current['statements'] / turns:.1f}/turn), "
+        f"{current['upstream_requests']} upstream requests"
+    )
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        sys.exit()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    found = regressions(current, baseline, args.cpu_tolerance)
+    for regression in found:
+        print(f"REGRESSION: {regression}")
+    sys.exit(1 if found else 0)
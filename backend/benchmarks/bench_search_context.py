@@ -0,0 +1,90 @@
+"""
+Benchmark prompt-token reduction and latency of search context budgeting.
+
+Compares the verbatim search-result concatenation the response prompt used
+to receive against the output of `build_search_context`.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search_context [--iterations 200] [--budget 600]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from tools.search_context import build_search_context, count_tokens
+
+WORDS = [
+    "whisk", "eggs", "pecorino", "pepper", "pasta", "guanciale", "simmer", "stir", "sauce", "heat",
+    "pan", "boil", "salted", "water", "serve", "garnish", "parsley", "garlic", "olive", "oil",
+    "minutes", "until", "golden", "crispy", "tender",
+]  # fmt: skip
+
+
+def synthetic_payload(rng: random.Random, n_results: int, raw_content: bool) -> list[dict]:
+    """Build a Tavily-shaped response wrapped the way `search_recipes` returns it."""
+    results = []
+    for i in range(n_results):
+        content = " ".join(rng.choices(WORDS, k=rng.randint(80, 160)))
+        result = {
+            "title": f"Classic Carbonara Recipe #{i}",
+            "url": f"https://recipes{i % 4}.example.com/carbonara-{i}",
+            "content": content,
+            "score": rng.random(),
+        }
+        if raw_content:
+            result["raw_content"] = " ".join(rng.choices(WORDS, k=rng.randint(1500, 3000)))
+        results.append(result)
+    response = {
+        "query": "recipe for carbonara",
+        "follow_up_questions": None,
+        "answer": None,
+        "images": [],
+        "results": results,
+        "response_time": 1.37,
+    }
+    return [{"results": response}]
+
+
+def verbatim_context(search_results: list[dict]) -> str:
+    """The pre-budgeting prompt block: every result stringified as-is."""
+    return "\n".join(str(result.get("results", "")) for result in search_results)
+
+
+def run(iterations: int, budget: int) -> None:
+    rng = random.Random(42)
+    scenarios = [
+        ("3 results, snippets only", 3, False),
+        ("3 results, raw content", 3, True),
+        ("accumulated 4 turns x 3", 12, False),
+    ]
+
+    print(
+        f"{'scenario':<28}{'raw tok':>10}{'budgeted':>10}{'saved':>8}{'mean ms':>10}{'p95 ms':>9}"
+    )
+    for label, n_results, raw_content in scenarios:
+        payloads = [synthetic_payload(rng, n_results, raw_content) for _ in range(iterations)]
+        raw_tokens, budget_tokens, timings = [], [], []
+        for payload in payloads:
+            started = time.perf_counter()
+            context = build_search_context(payload, dish="carbonara", token_budget=budget)
+            timings.append((time.perf_counter() - started) * 1000)
+            raw_tokens.append(count_tokens(verbatim_context(payload)))
+            budget_tokens.append(count_tokens(context))
+
+        raw_mean = statistics.mean(raw_tokens)
+        budget_mean = statistics.mean(budget_tokens)
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(
+            f"{label:<28}{raw_mean:>10.0f}{budget_mean:>10.0f}"
+            f"{1 - budget_mean / raw_mean:>8.0%}{statistics.mean(timings):>10.2f}{p95:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=600)
+    args = parser.parse_args()
+    run(args.iterations, args.budget)
@@ -0,0 +1,88 @@
+"""
+Profile backend cold start: import time of `main` and time until the first
+/ready response, each measured in a fresh interpreter.
+
+Also prints the slowest imports from `python -X importtime` so regressions
+(e.g. a heavy SDK imported at module level again) are easy to spot.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+MEASURE_STARTUP = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    client.get("/ready")
+    ready = time.perf_counter()
+print(imported - started, ready - started)
+"""
+
+
+def _env(db_dir: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench-key")
+    env.setdefault("TAVILY_API_KEY", "bench-key")
+    env["DATABASE_URL"] = f"sqlite:///{db_dir}/bench.db"
+    env["WARM_UP_ON_STARTUP"] = "false"
+    return env
+
+
+def measure(runs: int, env: dict) -> None:
+    import_times, ready_times = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE_STARTUP],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        ).stdout.split()
+        import_times.append(float(output[-2]) * 1000)
+        ready_times.append(float(output[-1]) * 1000)
+
+    print(f"import main:      median {statistics.median(import_times):7.0f} ms")
+    print(f"first /ready:     median {statistics.median(ready_times):7.0f} ms")
+
+
+def top_imports(top: int, env: dict) -> None:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    ).stderr
+
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_part, cumulative_us, name = line.split("|")
+        rows.append((int(cumulative_us), int(self_part.split(":")[-1]), name.rstrip()))
+
+    print(f"\n{'cumulative ms':>14}{'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        env = _env(db_dir)
+        measure(args.runs, env)
+        top_imports(args.top, env)
@@ -0,0 +1,119 @@
+"""
+Measure /api/cooking throughput as the number of gunicorn workers grows.
+
+Each run starts gunicorn (gunicorn.conf.py: shared cache tier + single DB
+writer) against a fresh SQLite database, with OpenAI and Tavily replaced by
+the local fake upstreams, then drives it with concurrent clients.
+
+Usage (from backend/):
+    python -m benchmarks.bench_workers [--workers 1 2 4] [--requests 200]
+        [--concurrency 32] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.fake_upstreams import FakeUpstreams
+
+PORT = 8765
+
+
+def _start_gunicorn(workers: int, db_dir: str, upstreams: FakeUpstreams) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(upstreams.env())
+    env.update(
+        {
+            "DATABASE_URL": f"sqlite:///{db_dir}/bench.db",
+            "WEB_CONCURRENCY": str(workers),
+            "BIND": f"127.0.0.1:{PORT}",
+            "WARM_UP_ON_STARTUP": "true",
+        }
+    )
+    env.pop("SHARED_STATE_ADDRESS", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PORT}/ready", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not become ready")
+
+
+async def _drive(total: int, concurrency: int) -> tuple[float, list[float], int]:
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60) as client:
+
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/cooking",
+                    # Distinct threads, so each request is a full turn with two message writes
+                    json={
+                        "query": f"How do I make carbonara? #{i}",
+                        "thread_id": str(uuid.uuid4()),
+                    },
+                )
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - started, latencies, errors
+
+
+def run(workers: int, total: int, concurrency: int, upstreams: FakeUpstreams) -> None:
+    with tempfile.TemporaryDirectory() as db_dir:
+        process = _start_gunicorn(workers, db_dir, upstreams)
+        try:
+            asyncio.run(_drive(min(total, concurrency), concurrency))  # warm every worker
+            elapsed, latencies, errors = asyncio.run(_drive(total, concurrency))
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{workers:>7}{total / elapsed:>10.1f}{statistics.median(latencies) * 1000:>10.0f}"
+        f"{p95 * 1000:>10.0f}{errors:>8}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream latency (s)")
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams(latency=args.latency)
+    print(f"{'workers':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    try:
+        for workers in args.workers:
+            run(workers, args.requests, args.concurrency, upstreams)
+    finally:
+        upstreams.close()
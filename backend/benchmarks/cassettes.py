@@ -0,0 +1,201 @@
+"""
+Record and replay OpenAI and Tavily traffic, for reproducible benchmarks.
+
+A local proxy the backend is pointed at with OPENAI_BASE_URL and
+TAVILY_API_BASE_URL (see `env()`), like the fake upstreams:
+  - record: forwards each request to the real API and saves the request,
+    the response and how long it took to a cassette file
+  - replay: answers from the cassette without any network access, after
+    the recorded latency multiplied by `latency_scale` (0 for none)
+
+Requests are matched on method, path and JSON body; identical requests are
+answered in recorded order. API keys and other request headers are never
+written to the cassette. A request with no recording is answered 599 and
+counted in `misses`.
+
+Run standalone (from backend/):
+    python -m benchmarks.cassettes record cassette.json [--port 8900]
+    python -m benchmarks.cassettes replay cassette.json [--port 8900] [--latency-scale 1]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+OPENAI_UPSTREAM = "https://api.openai.com"
+TAVILY_UPSTREAM = "https://api.tavily.com"
+
+# Request headers not forwarded upstream (httpx sets its own)
+HOP_HEADERS = {"host", "content-length", "connection", "accept-encoding", "keep-alive"}
+
+MISS_STATUS = 599
+
+
+def _key(method: str, path: str, body: bytes) -> str:
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        canonical = body.decode(errors="replace")
+    return f"{method} {path} {canonical}"
+
+
+class CassetteProxy:
+    """Threaded HTTP server that records upstream interactions or replays them."""
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "replay",
+        port: int = 0,
+        latency_scale: float = 1.0,
+        openai_upstream: str = OPENAI_UPSTREAM,
+        tavily_upstream: str = TAVILY_UPSTREAM,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.upstreams = {"/v1/": openai_upstream.rstrip("/"), "/": tavily_upstream.rstrip("/")}
+        self.interactions: list[dict] = []
+        self.requests = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._replies: dict[str, deque] = defaultdict(deque)
+        if mode == "replay":
+            with open(path) as f:
+                self.interactions = json.load(f)["interactions"]
+            for interaction in self.interactions:
+                request = interaction["request"]
+                key = _key(request["method"], request["path"], request["body"].encode())
+                self._replies[key].append(interaction)
+        self._client = httpx.Client(timeout=120) if mode == "record" else None
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with proxy._lock:
+                    proxy.requests += 1
+                if proxy.mode == "record":
+                    status, headers, data = proxy._record(
+                        self.command, self.path, self.headers, body
+                    )
+                else:
+                    status, headers, data = proxy._replay(self.command, self.path, body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _upstream(self, path: str) -> str:
+        prefix = "/v1/" if path.startswith("/v1/") else "/"
+        return self.upstreams[prefix] + path
+
+    def _record(self, method: str, path: str, headers, body: bytes) -> tuple[int, dict, bytes]:
+        forwarded = {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+        started = time.perf_counter()
+        response = self._client.request(
+            method, self._upstream(path), headers=forwarded, content=body
+        )
+        latency = time.perf_counter() - started
+        response_headers = {
+            "Content-Type": response.headers.get("content-type", "application/json")
+        }
+        with self._lock:
+            self.interactions.append(
+                {
+                    "request": {"method": method, "path": path, "body": body.decode()},
+                    "response": {
+                        "status": response.status_code,
+                        "headers": response_headers,
+                        "body": response.text,
+                    },
+                    "latency": round(latency, 4),
+                }
+            )
+        return response.status_code, response_headers, response.content
+
+    def _replay(self, method: str, path: str, body: bytes) -> tuple[int, dict, bytes]:
+        with self._lock:
+            replies = self._replies.get(_key(method, path, body))
+            if not replies:
+                self.misses += 1
+                interaction = None
+            elif len(replies) > 1:
+                interaction = replies.popleft()
+            else:
+                interaction = replies[0]  # Repeats of the last recording get the same answer
+        if interaction is None:
+            error = {"error": f"No recorded response for {method} {path}"}
+            return MISS_STATUS, {"Content-Type": "application/json"}, json.dumps(error).encode()
+        time.sleep(interaction["latency"] * self.latency_scale)
+        response = interaction["response"]
+        return response["status"], response["headers"], response["body"].encode()
+
+    def env(self) -> dict:
+        """Environment variables that route the backend through this proxy."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "TAVILY_API_BASE_URL": self.url,
+        }
+
+    def save(self) -> None:
+        """Write the recorded interactions to the cassette file."""
+        if self.mode != "record":
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock, open(self.path, "w") as f:
+            json.dump({"version": 1, "interactions": self.interactions}, f, indent=1)
+
+    def close(self) -> None:
+        """Stop serving, saving the cassette when recording."""
+        self.server.shutdown()
+        self.server.server_close()
+        if self._client is not None:
+            self._client.close()
+        self.save()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("cassette")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--openai-upstream", default=OPENAI_UPSTREAM)
+    parser.add_argument("--tavily-upstream", default=TAVILY_UPSTREAM)
+    args = parser.parse_args()
+
+    proxy = CassetteProxy(
+        args.cassette,
+        args.mode,
+        args.port,
+        args.latency_scale,
+        args.openai_upstream,
+        args.tavily_upstream,
+    )
+    for key, value in proxy.env().items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        proxy.close()
+        print(f"{proxy.requests} requests, {proxy.misses} unrecorded", flush=True)
@@ -0,0 +1,142 @@
+"""
+Local stand-ins for the OpenAI and Tavily APIs, for load tests and benchmarks.
+
+Point the backend at them with OPENAI_BASE_URL and TAVILY_API_BASE_URL (see
+`env()`). Each response is delayed by a fixed latency so benchmarks measure
+the backend's own overhead and concurrency rather than network variance.
+
+Run standalone (from backend/):
+    python -m benchmarks.fake_upstreams [--port 8900] [--latency 0.05]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CLASSIFICATION = {
+    "relevant": True,
+    "query_type": "recipe_request",
+    "dish": "pasta carbonara",
+    "ingredients": ["spaghetti", "eggs", "pecorino", "guanciale"],
+    "required_cookware": ["Pot", "Frying Pan"],
+    "reason": "Asks how to cook a dish",
+}
+
+SEARCH_RESULTS = [
+    {
+        "title": "Classic Spaghetti Carbonara",
+        "url": "https://example.com/carbonara",
+        "content": "Boil spaghetti, crisp guanciale, toss with eggs and pecorino off the heat.",
+        "score": 0.92,
+    },
+    {
+        "title": "Carbonara Without Cream",
+        "url": "https://example.com/carbonara-no-cream",
+        "content": "The sauce is just eggs, cheese, pepper and pasta water emulsified together.",
+        "score": 0.81,
+    },
+]
+
+
+def _completion_text(body: dict) -> str:
+    prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+    if "JSON" in prompt or "schema" in prompt:
+        return json.dumps(CLASSIFICATION)
+    if "title" in prompt.lower() and body.get("max_tokens", 100) <= 20:
+        return "Pasta Carbonara"
+    return "Boil the pasta, crisp the guanciale, then toss both with eggs and pecorino."
+
+
+class FakeUpstreams:
+    """Threaded HTTP server answering chat completions and Tavily searches."""
+
+    def __init__(self, port: int = 0, latency: float = 0.05):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with upstreams._lock:
+                    upstreams.requests += 1
+                time.sleep(upstreams.latency)
+
+                if self.path.endswith("/chat/completions"):
+                    text = _completion_text(body)
+                    payload = {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": body.get("model", "gpt-4o-mini"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": text},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": 100,
+                            "completion_tokens": 20,
+                            "total_tokens": 120,
+                        },
+                    }
+                elif self.path.endswith("/search"):
+                    payload = {
+                        "query": body.get("query", ""),
+                        "results": SEARCH_RESULTS,
+                        "response_time": upstreams.latency,
+                    }
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def env(self) -> dict:
+        """Environment variables that route the backend to this server."""
+        return {
+            "OPENAI_API_KEY": "fake-key",
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "TAVILY_API_KEY": "fake-key",
+            "TAVILY_API_BASE_URL": self.url,
+        }
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    upstreams = FakeUpstreams(args.port, args.latency)
+    for key, value in upstreams.env().items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        upstreams.close()
@@ -0,0 +1,220 @@
+import argparse
+import base64
+import logging
+import os
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.connection import get_db
+from database.models import Checkpoint, CompressionDictionary
+from database.writer import submit_write
+from services.cache import LRUCache
+
+try:
+    import zstandard
+except ImportError:  # Optional; checkpoints are then stored uncompressed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Codec for new checkpoints: "zstd", or "none" to store them uncompressed
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "zstd").lower()
+CHECKPOINT_COMPRESSION_LEVEL = int(os.getenv("CHECKPOINT_COMPRESSION_LEVEL", "3"))
+
+# Size (bytes) of a trained dictionary, and how many recent checkpoints it is trained on
+CHECKPOINT_DICT_SIZE = int(os.getenv("CHECKPOINT_DICT_SIZE", str(64 * 1024)))
+CHECKPOINT_DICT_SAMPLES = int(os.getenv("CHECKPOINT_DICT_SAMPLES", "2000"))
+
+# Below this many checkpoints there is too little to train a useful dictionary on
+CHECKPOINT_DICT_MIN_SAMPLES = int(os.getenv("CHECKPOINT_DICT_MIN_SAMPLES", "200"))
+
+# How often a worker looks for a newer dictionary (e.g. trained by another worker)
+CHECKPOINT_DICT_REFRESH = float(os.getenv("CHECKPOINT_DICT_REFRESH_SECONDS", "300"))
+
+RAW = "raw"
+ZSTD = "zstd"
+DICTIONARY_KIND = "checkpoints"
+
+_NONE = object()
+
+
+def write_compression_dictionary(db: Session, kind: str, data: bytes, sample_count: int) -> int:
+    """Writer operation: store a newly trained dictionary and return its version."""
+    dictionary = CompressionDictionary(kind=kind, data=data, sample_count=sample_count)
+    db.add(dictionary)
+    db.flush()
+    return dictionary.id
+
+
+class CheckpointCodec:
+    """
+    Encodes serialized checkpoints for storage, with zstd and a trained dictionary.
+
+    Checkpoints of different threads share most of their bytes (state keys,
+    message types, search result boilerplate), which a dictionary trained on
+    past checkpoints captures even in a single small payload. Every row keeps
+    its codec and dictionary version, so changing the codec or training a new
+    dictionary never makes older rows unreadable.
+    """
+
+    def __init__(
+        self, codec: str = CHECKPOINT_COMPRESSION, level: int = CHECKPOINT_COMPRESSION_LEVEL
+    ):
+        if codec == ZSTD and zstandard is None:
+            logger.warning("zstandard is not installed; storing checkpoints uncompressed")
+            codec = RAW
+        self.codec = ZSTD if codec == ZSTD else RAW
+        self.level = level
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._latest = LRUCache("checkpoint_dictionary", maxsize=1, ttl=CHECKPOINT_DICT_REFRESH)
+        self._lock = threading.Lock()
+        # zstd (de)compressor objects must not be shared between threads
+        self._local = threading.local()
+
+    def encode(self, data: bytes) -> tuple[str, int | None, bytes]:
+        """Return (codec, dictionary version or None, payload) for a serialized checkpoint."""
+        if self.codec == RAW:
+            return RAW, None, data
+        dictionary_id = self.latest_dictionary_id()
+        return ZSTD, dictionary_id, self._compressor(dictionary_id).compress(data)
+
+    def decode(self, codec: str, dictionary_id: int | None, payload: bytes) -> bytes:
+        """Invert encode() for a stored row, whatever this codec's own settings."""
+        if codec == RAW:
+            return payload
+        if codec != ZSTD:
+            raise ValueError(f"Unknown checkpoint codec {codec!r}")
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read compressed checkpoints")
+        return self._decompressor(dictionary_id).decompress(payload)
+
+    def read(self, record: Checkpoint) -> tuple[str, bytes]:
+        """The serializer type and serialized bytes of a checkpoint row."""
+        checkpoint = record.checkpoint_data["checkpoint"]
+        if record.codec is None:
+            data = checkpoint["data"]
+            # Rows written before payload columns keep the bytes base64-encoded
+            return checkpoint["type"], base64.b64decode(data) if isinstance(data, str) else data
+        return checkpoint["type"], self.decode(record.codec, record.dictionary_id, record.payload)
+
+    def latest_dictionary_id(self) -> int | None:
+        """Version of the newest checkpoint dictionary, None if none was trained."""
+        latest = self._latest.get(DICTIONARY_KIND, _NONE)
+        if latest is _NONE:
+            with get_db() as db:
+                latest = (
+                    db.query(func.max(CompressionDictionary.id))
+                    .filter_by(kind=DICTIONARY_KIND)
+                    .scalar()
+                )
+            self._latest.set(DICTIONARY_KIND, latest)
+        return latest
+
+    def train_dictionary(self) -> int | None:
+        """
+        Train a new dictionary version on the most recent checkpoints.
+
+        New checkpoints are compressed with it from then on (other workers
+        pick it up within CHECKPOINT_DICT_REFRESH seconds).
+
+        Returns:
+            The new version, or None if there are too few checkpoints
+        """
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to train a dictionary")
+        with get_db() as db:
+            records = (
+                db.query(Checkpoint)
+                .order_by(Checkpoint.created_at.desc())
+                .limit(CHECKPOINT_DICT_SAMPLES)
+                .all()
+            )
+            samples = []
+            for record in records:
+                try:
+                    samples.append(self.read(record)[1])
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.debug(f"Skipping checkpoint {record.id} for training: {e}")
+        if len(samples) < CHECKPOINT_DICT_MIN_SAMPLES:
+            logger.info(f"Only {len(samples)} checkpoints; not training a dictionary")
+            return None
+
+        data = zstandard.train_dictionary(CHECKPOINT_DICT_SIZE, samples).as_bytes()
+        dictionary_id = submit_write(
+            "store_compression_dictionary",
+            kind=DICTIONARY_KIND,
+            data=data,
+            sample_count=len(samples),
+        )
+        self._latest.set(DICTIONARY_KIND, dictionary_id)
+        logger.info(
+            f"Trained checkpoint dictionary v{dictionary_id} "
+            f"({len(data)} bytes) on {len(samples)} checkpoints"
+        )
+        return dictionary_id
+
+    def ensure_dictionary(self) -> None:
+        """Train the first dictionary once there are enough checkpoints for it."""
+        if self.codec != ZSTD or self.latest_dictionary_id() is not None:
+            return
+        with get_db() as db:
+            count = db.query(func.count(Checkpoint.id)).scalar()
+        if count >= CHECKPOINT_DICT_MIN_SAMPLES:
+            self.train_dictionary()
+
+    def _dictionary(self, dictionary_id: int | None) -> "zstandard.ZstdCompressionDict | None":
+        if dictionary_id is None:
+            return None
+        with self._lock:
+            dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            with get_db() as db:
+                record = db.get(CompressionDictionary, dictionary_id)
+                if record is None:
+                    raise LookupError(f"Compression dictionary v{dictionary_id} is missing")
+                dictionary = zstandard.ZstdCompressionDict(record.data)
+            # Dictionaries never change, so they are cached for good
+            dictionary.precompute_compress(level=self.level)
+            with self._lock:
+                dictionary = self._dictionaries.setdefault(dictionary_id, dictionary)
+        return dictionary
+
+    def _thread_cache(self, name: str) -> dict:
+        cache = getattr(self._local, name, None)
+        if cache is None:
+            cache = {}
+            setattr(self._local, name, cache)
+        return cache
+
+    def _compressor(self, dictionary_id: int | None) -> "zstandard.ZstdCompressor":
+        compressors = self._thread_cache("compressors")
+        if dictionary_id not in compressors:
+            compressors[dictionary_id] = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._dictionary(dictionary_id)
+            )
+        return compressors[dictionary_id]
+
+    def _decompressor(self, dictionary_id: int | None) -> "zstandard.ZstdDecompressor":
+        decompressors = self._thread_cache("decompressors")
+        if dictionary_id not in decompressors:
+            decompressors[dictionary_id] = zstandard.ZstdDecompressor(
+                dict_data=self._dictionary(dictionary_id)
+            )
+        return decompressors[dictionary_id]
+
+
+checkpoint_codec = CheckpointCodec()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage checkpoint compression")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("train", help="train a new dictionary version on recent checkpoints")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "train":
+        version = checkpoint_codec.train_dictionary()
+        print(f"Trained dictionary v{version}" if version else "Not enough checkpoints to train on")
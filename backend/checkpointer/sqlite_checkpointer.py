@@ -1,5 +1,4 @@
 import asyncio
-import base64
 import builtins
 import logging
 from collections.abc import AsyncIterator, Iterator
@@ -12,16 +11,64 @@ from langgraph.checkpoint.base import (
     CheckpointMetadata,
     CheckpointTuple,
 )
+from sqlalchemy.orm import Session
 
+from checkpointer.compression import checkpoint_codec
 from database.connection import get_db
 from database.models import Checkpoint as CheckpointModel
+from database.writer import submit_write
+from services import conversation_archive
+from services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
 
+def write_checkpoint(
+    db: Session,
+    thread_id: str,
+    checkpoint_data: dict,
+    payload: bytes | None = None,
+    codec: str | None = None,
+    dictionary_id: int | None = None,
+) -> None:
+    """Writer operation for SQLiteCheckpointSaver.put."""
+    db.add(
+        CheckpointModel(
+            thread_id=thread_id,
+            checkpoint_data=checkpoint_data,
+            payload=payload,
+            codec=codec,
+            dictionary_id=dictionary_id,
+        )
+    )
+
+
 class SQLiteCheckpointSaver(BaseCheckpointSaver):
     """SQLite-backed checkpoint saver for LangGraph."""
 
+    def _to_tuple(self, record: CheckpointModel, config: RunnableConfig) -> CheckpointTuple:
+        # Decompress (if needed) and deserialize checkpoint
+        checkpoint = self.serde.loads_typed(checkpoint_codec.read(record))
+        return CheckpointTuple(
+            config=config,
+            checkpoint=checkpoint,
+            metadata=record.checkpoint_data.get("metadata", {}),
+            parent_config=None,
+        )
+
+    def _latest(self, thread_id: str) -> CheckpointModel | None:
+        with get_db() as db:
+            return (
+                db.query(CheckpointModel)
+                .filter_by(thread_id=thread_id)
+                .order_by(CheckpointModel.created_at.desc())
+                .first()
+            )
+
+    def _has_checkpoints(self, thread_id: str) -> bool:
+        with get_db() as db:
+            return db.query(CheckpointModel.id).filter_by(thread_id=thread_id).first() is not None
+
     def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
         """Fetch a checkpoint tuple using the given configuration."""
         thread_id = config.get("configurable", {}).get("thread_id")
@@ -29,34 +76,11 @@ class SQLiteCheckpointSaver(BaseCheckpointSaver):
             return None
 
         try:
-            with get_db() as db:
-                record = (
-                    db.query(CheckpointModel)
-                    .filter_by(thread_id=thread_id)
-                    .order_by(CheckpointModel.created_at.desc())
-                    .first()
-                )
-
-                if record:
-                    checkpoint_data = record.checkpoint_data
-                    # Deserialize checkpoint
-                    type_str = checkpoint_data["checkpoint"]["type"]
-                    data = checkpoint_data["checkpoint"]["data"]
-
-                    # Decode base64 string back to bytes if needed
-                    if isinstance(data, str):
-                        data = base64.b64decode(data)
-
-                    checkpoint = self.serde.loads_typed((type_str, data))
-                    metadata = checkpoint_data.get("metadata", {})
-
-                    return CheckpointTuple(
-                        config=config,
-                        checkpoint=checkpoint,
-                        metadata=metadata,
-                        parent_config=None,
-                    )
-                return None
+            record = self._latest(thread_id)
+            # A thread without checkpoints is new, or archived and restored here
+            if record is None and conversation_archive.rehydrate(thread_id):
+                record = self._latest(thread_id)
+            return self._to_tuple(record, config) if record else None
         except Exception as e:
             logger.error(f"Error getting checkpoint for thread {thread_id}: {e}")
             return None
@@ -73,6 +97,8 @@ class SQLiteCheckpointSaver(BaseCheckpointSaver):
         thread_id = config.get("configurable", {}).get("thread_id") if config else None
 
         try:
+            if thread_id and not self._has_checkpoints(thread_id):
+                conversation_archive.rehydrate(thread_id)
             with get_db() as db:
                 query = db.query(CheckpointModel)
 
@@ -87,24 +113,7 @@ class SQLiteCheckpointSaver(BaseCheckpointSaver):
                 records = query.all()
 
                 for record in records:
-                    checkpoint_data = record.checkpoint_data
-                    # Deserialize checkpoint
-                    type_str = checkpoint_data["checkpoint"]["type"]
-                    data = checkpoint_data["checkpoint"]["data"]
-
-                    # Decode base64 string back to bytes if needed
-                    if isinstance(data, str):
-                        data = base64.b64decode(data)
-
-                    checkpoint = self.serde.loads_typed((type_str, data))
-                    metadata = checkpoint_data.get("metadata", {})
-
-                    yield CheckpointTuple(
-                        config={"configurable": {"thread_id": record.thread_id}},
-                        checkpoint=checkpoint,
-                        metadata=metadata,
-                        parent_config=None,
-                    )
+                    yield self._to_tuple(record, {"configurable": {"thread_id": record.thread_id}})
         except Exception as e:
             logger.error(f"Error listing checkpoints: {e}")
             return
@@ -122,24 +131,26 @@ class SQLiteCheckpointSaver(BaseCheckpointSaver):
             raise ValueError("thread_id required in config['configurable']")
 
         try:
-            # Serialize checkpoint
+            # Serialize and compress checkpoint
             type_str, serialized_data = self.serde.dumps_typed(checkpoint)
-
-            # Convert bytes to base64 string for JSON storage
-            if isinstance(serialized_data, bytes):
-                serialized_data = base64.b64encode(serialized_data).decode("utf-8")
+            codec, dictionary_id, payload = checkpoint_codec.encode(serialized_data)
+            metrics.increment("checkpoints.serialized_bytes", len(serialized_data))
+            metrics.increment("checkpoints.stored_bytes", len(payload))
 
             checkpoint_data = {
-                "checkpoint": {"type": type_str, "data": serialized_data},
+                "checkpoint": {"type": type_str},
                 "metadata": dict(metadata) if metadata else {},
             }
 
-            with get_db() as db:
-                checkpoint_record = CheckpointModel(
-                    thread_id=thread_id, checkpoint_data=checkpoint_data
-                )
-                db.add(checkpoint_record)
-                db.commit()
+            # Serialization happens here; the insert goes through the single DB writer
+            submit_write(
+                "put_checkpoint",
+                thread_id=thread_id,
+                checkpoint_data=checkpoint_data,
+                payload=payload,
+                codec=codec,
+                dictionary_id=dictionary_id,
+            )
 
             logger.debug(f"Saved checkpoint for thread {thread_id}")
             return config
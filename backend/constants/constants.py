@@ -8,3 +8,228 @@ AVAILABLE_COOKWARE = [
     "Ladle",
     "Spoon",
 ]
+
+# Canonical cookware name -> alternative names that mean the same item.
+# Canonical names that match AVAILABLE_COOKWARE entries make those aliases
+# count as available; the rest collapse synonyms of items users lack.
+COOKWARE_SYNONYMS = {
+    "Frying Pan": ["pan", "fry pan", "frypan", "skillet", "saute pan", "sauté pan", "nonstick pan"],
+    "Little Pot": ["pot", "small pot", "saucepan", "sauce pan", "cooking pot"],
+    "Stovetop": ["stove", "stove top", "cooktop", "hob", "burner", "range", "gas stove"],
+    "Spatula": ["turner", "flipper", "fish slice", "rubber spatula", "silicone spatula"],
+    "Whisk": ["wire whisk", "balloon whisk"],
+    "Knife": ["chef's knife", "chef knife", "kitchen knife", "paring knife", "cutting knife"],
+    "Ladle": ["soup ladle"],
+    "Spoon": ["wooden spoon", "mixing spoon", "stirring spoon", "serving spoon"],
+    "Oven": ["conventional oven", "convection oven"],
+    "Baking Sheet": ["baking tray", "sheet pan", "cookie sheet"],
+    "Stock Pot": ["stockpot", "large pot", "soup pot", "dutch oven"],
+    "Cutting Board": ["chopping board"],
+    "Mixing Bowl": ["bowl"],
+    "Colander": ["strainer", "sieve"],
+    # Distinct tools whose head noun is an available item ("roasting pan" is no frying pan)
+    "Roasting Pan": ["roasting tin", "roaster"],
+    "Cake Pan": ["cake tin", "baking pan", "loaf pan", "springform pan"],
+    "Measuring Spoon": ["measuring spoons"],
+}
+
+# Ingredient names recognized in free-text recipe documents. Multi-word names
+# are matched before their parts ("olive oil" before "oil").
+COMMON_INGREDIENTS = [
+    # Proteins
+    "chicken",
+    "chicken breast",
+    "chicken thigh",
+    "beef",
+    "ground beef",
+    "steak",
+    "pork",
+    "pork chop",
+    "bacon",
+    "ham",
+    "sausage",
+    "chorizo",
+    "guanciale",
+    "pancetta",
+    "lamb",
+    "turkey",
+    "duck",
+    "shrimp",
+    "prawn",
+    "salmon",
+    "tuna",
+    "cod",
+    "haddock",
+    "clam",
+    "mussel",
+    "crab",
+    "anchovy",
+    "tofu",
+    "tempeh",
+    "egg",
+    "chickpea",
+    "lentil",
+    "black bean",
+    "kidney bean",
+    "bean",
+    # Dairy
+    "milk",
+    "butter",
+    "cream",
+    "heavy cream",
+    "sour cream",
+    "yogurt",
+    "cheese",
+    "cheddar",
+    "mozzarella",
+    "parmesan",
+    "pecorino",
+    "feta",
+    "ricotta",
+    "mascarpone",
+    "gruyere",
+    "goat cheese",
+    "cream cheese",
+    # Vegetables
+    "onion",
+    "red onion",
+    "shallot",
+    "garlic",
+    "scallion",
+    "leek",
+    "tomato",
+    "cherry tomato",
+    "potato",
+    "sweet potato",
+    "carrot",
+    "celery",
+    "bell pepper",
+    "pepper",
+    "jalapeno",
+    "chili",
+    "mushroom",
+    "spinach",
+    "kale",
+    "lettuce",
+    "romaine",
+    "cabbage",
+    "broccoli",
+    "cauliflower",
+    "zucchini",
+    "eggplant",
+    "cucumber",
+    "corn",
+    "pea",
+    "green bean",
+    "asparagus",
+    "avocado",
+    "pumpkin",
+    "squash",
+    "beet",
+    "radish",
+    "bean sprout",
+    "ginger",
+    "olive",
+    # Fruit
+    "lemon",
+    "lime",
+    "orange",
+    "apple",
+    "banana",
+    "strawberry",
+    "blueberry",
+    "raspberry",
+    "mango",
+    "pineapple",
+    "coconut",
+    "raisin",
+    # Grains, pasta, bread
+    "rice",
+    "arborio rice",
+    "basmati rice",
+    "pasta",
+    "spaghetti",
+    "penne",
+    "noodle",
+    "rice noodle",
+    "egg noodle",
+    "lasagna sheet",
+    "flour",
+    "bread",
+    "breadcrumb",
+    "baguette",
+    "tortilla",
+    "pizza dough",
+    "oat",
+    "quinoa",
+    "couscous",
+    "polenta",
+    # Herbs and spices
+    "basil",
+    "parsley",
+    "cilantro",
+    "mint",
+    "thyme",
+    "rosemary",
+    "oregano",
+    "dill",
+    "chives",
+    "bay leaf",
+    "cumin",
+    "paprika",
+    "turmeric",
+    "cinnamon",
+    "nutmeg",
+    "chili powder",
+    "curry powder",
+    "garam masala",
+    "saffron",
+    "black pepper",
+    "salt",
+    "vanilla",
+    # Pantry
+    "olive oil",
+    "vegetable oil",
+    "sesame oil",
+    "oil",
+    "vinegar",
+    "soy sauce",
+    "fish sauce",
+    "tomato paste",
+    "tomato sauce",
+    "stock",
+    "chicken stock",
+    "beef stock",
+    "sugar",
+    "brown sugar",
+    "honey",
+    "maple syrup",
+    "baking powder",
+    "baking soda",
+    "yeast",
+    "chocolate",
+    "cocoa",
+    "peanut",
+    "peanut butter",
+    "almond",
+    "walnut",
+    "sesame seed",
+    "tahini",
+    "mustard",
+    "mayonnaise",
+    "ketchup",
+    "wine",
+    "white wine",
+    "red wine",
+    "beer",
+    "coconut milk",
+    "tamarind",
+    "miso",
+]
+
+# Ingredients every kitchen is assumed to have. They are neither matched on
+# nor counted as missing, so "eggs, salt" does not match every salted recipe.
+PANTRY_STAPLES = [
+    "salt", "kosher salt", "sea salt", "pepper", "black pepper", "water", "ice",
+    "oil", "olive oil", "vegetable oil", "canola oil", "cooking spray",
+]  # fmt: skip
@@ -1,7 +1,9 @@
 import os
-from contextlib import contextmanager
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, contextmanager
 
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./conversations.db")
@@ -9,16 +11,31 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./conversations.db")
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
-    echo=False,  #True for SQL query logging during development
+    echo=False,  # True for SQL query logging during development
 )
 
+# Async driver for each sync URL scheme, used by request handlers
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+
 if "sqlite" in DATABASE_URL:
 
     @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
     def set_sqlite_pragma(dbapi_conn, connection_record):
         cursor = dbapi_conn.cursor()
         cursor.execute("PRAGMA journal_mode=WAL")
         cursor.execute("PRAGMA busy_timeout=10000")  # 10 second timeout
+        cursor.execute("PRAGMA foreign_keys=ON")  # Off by default; needed for ON DELETE CASCADE
         cursor.close()
 
 
@@ -33,3 +50,18 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Async context manager for database sessions.
+
+    Queries run in the async driver's own thread, so awaiting them leaves the
+    event loop free for other requests.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,7 +1,10 @@
 import logging
 
-from database.connection import engine
-from database.models import Base
+from sqlalchemy import inspect, text
+
+from database.connection import DATABASE_URL, engine
+from database.models import Base, Message
+from database.search_index import create_search_index
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +13,88 @@ def create_tables():
     """Create all database tables if they don't exist."""
     try:
         Base.metadata.create_all(bind=engine)
+        add_missing_columns()
+        add_delete_cascade()
+        create_search_index()
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
         raise
+
+
+def add_missing_columns():
+    """
+    Add nullable columns introduced after a table was first created.
+
+    create_all() never alters existing tables, so databases created by an
+    older version would otherwise lack new columns.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(
+                    text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+                )
+                if column.index:
+                    conn.execute(
+                        text(
+                            f"CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} "
+                            f'ON {table.name} ("{column.name}")'
+                        )
+                    )
+                logger.info(f"Added column {table.name}.{column.name}")
+
+
+def add_delete_cascade():
+    """
+    Rebuild the messages table of an older SQLite database with ON DELETE CASCADE.
+
+    SQLite cannot alter a foreign key in place. Rows are copied with their
+    rowids, so the search index stays valid; its triggers are recreated by
+    create_search_index().
+    """
+    if "sqlite" not in DATABASE_URL:
+        return
+    with engine.begin() as conn:
+        foreign_keys = conn.execute(text("PRAGMA foreign_key_list(messages)")).mappings().all()
+        if all(fk["on_delete"] == "CASCADE" for fk in foreign_keys):
+            return
+
+        # Messages of conversations deleted before foreign keys were enforced
+        # are unreachable and would violate the constraint (the search index
+        # trigger unindexes them)
+        orphaned = conn.execute(
+            text(
+                "DELETE FROM messages WHERE conversation_id IS NOT NULL "
+                "AND conversation_id NOT IN (SELECT id FROM conversations)"
+            )
+        ).rowcount
+
+        conn.execute(text("ALTER TABLE messages RENAME TO messages_old"))
+        old_indexes = conn.execute(
+            text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' "
+                "AND tbl_name = 'messages_old' AND sql IS NOT NULL"
+            )
+        ).scalars()
+        for name in list(old_indexes):
+            conn.execute(text(f'DROP INDEX "{name}"'))
+        Message.__table__.create(conn)
+
+        columns = ", ".join(f'"{column.name}"' for column in Message.__table__.columns)
+        conn.execute(
+            text(
+                f"INSERT INTO messages (rowid, {columns}) SELECT rowid, {columns} FROM messages_old"
+            )
+        )
+        conn.execute(text("DROP TABLE messages_old"))
+        logger.info(
+            f"Rebuilt messages with ON DELETE CASCADE ({orphaned} orphaned messages deleted)"
+        )
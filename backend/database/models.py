@@ -1,7 +1,18 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -19,9 +30,15 @@ class Conversation(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     message_count = Column(Integer, default=0)
+    user_id = Column(String, nullable=True, index=True)  # Owner; None for anonymous threads
+    # Set while the messages and checkpoints are in conversation_archives
+    archived_at = Column(DateTime, nullable=True)
 
-    # Relationship to messages
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    # Relationship to messages; the database deletes them (ON DELETE CASCADE),
+    # so deleting a conversation never loads them
+    messages = relationship(
+        "Message", back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class Message(Base):
@@ -30,7 +47,7 @@ class Message(Base):
     __tablename__ = "messages"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    conversation_id = Column(String, ForeignKey("conversations.id"), index=True)
+    conversation_id = Column(String, ForeignKey("conversations.id", ondelete="CASCADE"), index=True)
     thread_id = Column(String, nullable=False, index=True)
     role = Column(String, nullable=False)  # 'user' or 'assistant' or 'error'
     content = Column(Text, nullable=False)
@@ -50,5 +67,95 @@ class Checkpoint(Base):
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     thread_id = Column(String, nullable=False, index=True)
-    checkpoint_data = Column(JSON, nullable=False)
+    checkpoint_data = Column(JSON, nullable=False)  # Serializer type and metadata
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Serialized checkpoint, encoded with `codec` ('raw' or 'zstd', the latter
+    # with compression dictionary `dictionary_id` if set). Rows without a codec
+    # keep the checkpoint base64-encoded in checkpoint_data.
+    payload = Column(LargeBinary, nullable=True)
+    codec = Column(String, nullable=True)
+    dictionary_id = Column(Integer, nullable=True)
+
+
+class ConversationArchive(Base):
+    """Messages and checkpoints of an idle conversation, compressed into one blob."""
+
+    __tablename__ = "conversation_archives"
+
+    thread_id = Column(String, primary_key=True)
+    conversation_id = Column(
+        String, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    payload = Column(LargeBinary, nullable=False)  # Encoded like checkpoint payloads
+    codec = Column(String, nullable=False)
+    dictionary_id = Column(Integer, nullable=True)
+    message_count = Column(Integer, nullable=False)
+    checkpoint_count = Column(Integer, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)  # Size before compression
+    last_message = Column(JSON, nullable=True)  # Newest message row, for list previews
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class CompressionDictionary(Base):
+    """A trained zstd dictionary; each new one is a new version (id)."""
+
+    __tablename__ = "compression_dictionaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False, index=True)  # What it was trained on: 'checkpoints'
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UserCookware(Base):
+    """A cookware item in a user's kitchen inventory."""
+
+    __tablename__ = "user_cookware"
+    __table_args__ = (UniqueConstraint("user_id", "name", name="uq_user_cookware_item"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RecipeDocument(Base):
+    """A recipe document in the local knowledge base, with its embedding."""
+
+    __tablename__ = "recipe_documents"
+
+    id = Column(String, primary_key=True)  # Hash of the URL (or text), so re-ingesting is a no-op
+    title = Column(String, nullable=True)
+    url = Column(String, nullable=True)
+    content = Column(Text, nullable=False)
+    source = Column(String, nullable=False)  # 'tavily', 'checkpoint', 'import'
+    query = Column(String, nullable=True)  # Search query that found it, if any
+    embedding = Column(LargeBinary, nullable=False)  # float32 vector
+    ingredients = Column(JSON, nullable=True)  # Normalized ingredient names
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ThreadLease(Base):
+    """The turn currently running on a thread, so workers never run two at once."""
+
+    __tablename__ = "thread_leases"
+
+    thread_id = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)  # Token of the turn holding the lease
+    expires_at = Column(DateTime, nullable=False)  # Renewed while the turn runs
+    cancel_requested = Column(Boolean, nullable=False, default=False)  # A newer turn wants it
+
+
+class IdempotencyKey(Base):
+    """A client's Idempotency-Key and the result of the request first sent with it."""
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)  # Hash of the request body
+    owner = Column(String, nullable=False)  # Token of the run executing the request
+    status = Column(String, nullable=False)  # 'running' or 'completed'
+    turn_id = Column(String, nullable=True)  # Streamed turn, so duplicates can attach to it
+    response = Column(JSON, nullable=True)  # Result once completed
+    expires_at = Column(DateTime, nullable=False, index=True)
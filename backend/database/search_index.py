@@ -0,0 +1,122 @@
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from database.connection import DATABASE_URL, engine
+
+logger = logging.getLogger(__name__)
+
+# Porter stemming so "eggs" finds "egg"; prefix indexes keep type-ahead ("sou*")
+# queries from materializing the full doclist of every matching term
+_FTS_OPTIONS = "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3 4 5 6'"
+
+# External-content FTS5 tables: the index stores only terms and reads the text
+# back from messages/conversations by rowid, so nothing is stored twice.
+SEARCH_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, content = 'messages', content_rowid = 'rowid', {_FTS_OPTIONS})""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+        title, content = 'conversations', content_rowid = 'rowid', {_FTS_OPTIONS})""",
+    # Triggers keep the index in step with every write path (service, DB writer, imports)
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.rowid, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages
+    BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content)
+        VALUES ('delete', old.rowid, old.content);
+        INSERT INTO messages_fts (rowid, content) VALUES (new.rowid, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_insert AFTER INSERT ON conversations
+    BEGIN
+        INSERT INTO conversations_fts (rowid, title) VALUES (new.rowid, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_delete AFTER DELETE ON conversations
+    BEGIN
+        INSERT INTO conversations_fts (conversations_fts, rowid, title)
+        VALUES ('delete', old.rowid, old.title);
+    END""",
+    # Only title changes touch the index, not the per-message count/timestamp updates
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_update
+    AFTER UPDATE OF title ON conversations BEGIN
+        INSERT INTO conversations_fts (conversations_fts, rowid, title)
+        VALUES ('delete', old.rowid, old.title);
+        INSERT INTO conversations_fts (rowid, title) VALUES (new.rowid, new.title);
+    END""",
+]
+
+
+def create_search_index():
+    """
+    Create the FTS5 search index and its sync triggers (SQLite only).
+
+    Existing rows are indexed the first time the index is created.
+    """
+    if "sqlite" not in DATABASE_URL:
+        logger.warning("Full-text search requires SQLite; skipping search index")
+        return
+
+    with engine.begin() as conn:
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'")
+        ).first()
+        for statement in SEARCH_INDEX_DDL:
+            conn.execute(text(statement))
+    if not existed:
+        rebuild_search_index()
+
+
+def rebuild_search_index():
+    """
+    Re-index all messages and titles from scratch.
+
+    Needed after VACUUM, which may renumber the rowids the index refers to.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')"))
+        conn.execute(text("INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')"))
+    logger.info("Rebuilt full-text search index")
+
+
+# Insert trigger and indexed column of each table with a search index
+_INDEXED_TABLES = {
+    "messages": ("messages_fts_insert", "content"),
+    "conversations": ("conversations_fts_insert", "title"),
+}
+
+
+@contextmanager
+def deferred_indexing(raw_conn):
+    """
+    Index rows inserted inside the block with one statement per table at the end.
+
+    The per-row insert triggers make FTS5 index each row separately, which
+    caps bulk loads at a few thousand rows per second; indexing the new
+    rowid range set-wise is over ten times faster. `raw_conn` is a DB-API
+    connection inside a transaction: the triggers are dropped and recreated
+    within it, so other writers never see them missing, and a rollback
+    restores them.
+    """
+    deferred = []
+    for table, (trigger, column) in _INDEXED_TABLES.items():
+        row = raw_conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (trigger,)
+        ).fetchone()
+        if row is None:  # No search index (not SQLite, or not created yet)
+            continue
+        last_rowid = raw_conn.execute(f"SELECT coalesce(max(rowid), 0) FROM {table}").fetchone()[0]
+        raw_conn.execute(f"DROP TRIGGER {trigger}")
+        deferred.append((table, column, row[0], last_rowid))
+    yield
+    for table, column, trigger_sql, last_rowid in deferred:
+        raw_conn.execute(trigger_sql)
+        raw_conn.execute(
+            f"INSERT INTO {table}_fts (rowid, {column}) "
+            f"SELECT rowid, {column} FROM {table} WHERE rowid > ?",
+            (last_rowid,),
+        )
@@ -0,0 +1,140 @@
+import logging
+import os
+import queue
+import threading
+from collections.abc import Callable
+from concurrent import futures
+from typing import Any
+
+from database.connection import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Most writes queued while a commit is in progress are committed together
+WRITER_MAX_BATCH = int(os.getenv("DB_WRITER_MAX_BATCH", "256"))
+
+
+def _write_operations() -> dict[str, Callable]:
+    """
+    Write operations the writer may run, by name.
+
+    Each takes an open session plus keyword arguments, must not commit, and
+    returns a picklable result. Imported lazily to avoid import cycles.
+    """
+    from checkpointer.compression import write_compression_dictionary
+    from checkpointer.sqlite_checkpointer import write_checkpoint
+    from services.conversation_archive import (
+        write_conversation_archives,
+        write_conversation_restore,
+    )
+    from services.conversation_service import (
+        write_conversation,
+        write_conversation_deletes,
+        write_conversation_title,
+        write_message,
+    )
+    from services.conversation_transfer import write_imported_rows
+    from services.cookware_service import (
+        write_cookware_addition,
+        write_cookware_removal,
+        write_user_cookware,
+    )
+    from services.idempotency import (
+        claim_idempotency_key,
+        complete_idempotency_key,
+        release_idempotency_key,
+    )
+    from services.turn_lock import claim_thread_lease, release_thread_lease, renew_thread_lease
+    from tools.knowledge_base import write_recipe_documents
+
+    return {
+        "save_message": write_message,
+        "create_conversation": write_conversation,
+        "update_conversation_title": write_conversation_title,
+        "delete_conversations": write_conversation_deletes,
+        "import_conversations": write_imported_rows,
+        "archive_conversations": write_conversation_archives,
+        "restore_conversation": write_conversation_restore,
+        "put_checkpoint": write_checkpoint,
+        "store_compression_dictionary": write_compression_dictionary,
+        "ingest_recipe_documents": write_recipe_documents,
+        "set_user_cookware": write_user_cookware,
+        "add_user_cookware": write_cookware_addition,
+        "remove_user_cookware": write_cookware_removal,
+        "claim_thread_lease": claim_thread_lease,
+        "renew_thread_lease": renew_thread_lease,
+        "release_thread_lease": release_thread_lease,
+        "claim_idempotency_key": claim_idempotency_key,
+        "complete_idempotency_key": complete_idempotency_key,
+        "release_idempotency_key": release_idempotency_key,
+    }
+
+
+class DbWriter:
+    """
+    Single database writer that serializes and group-commits writes.
+
+    Callers block in `execute` until their write is committed. A background
+    thread drains the queue and commits everything waiting in one
+    transaction, so concurrent writers share one fsync instead of queueing
+    on SQLite's write lock. In multi-worker mode one DbWriter runs in the
+    shared state server and every worker submits to it.
+    """
+
+    def __init__(self, max_batch: int = WRITER_MAX_BATCH):
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._operations: dict[str, Callable] | None = None
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def execute(self, op: str, kwargs: dict) -> Any:
+        """Run write operation `op` and return its result once committed."""
+        future: futures.Future = futures.Future()
+        self._queue.put((op, kwargs, future))
+        return future.result()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit_batch(batch)
+
+    def _resolve(self, op: str) -> Callable:
+        if self._operations is None:
+            self._operations = _write_operations()
+        return self._operations[op]
+
+    def _commit_batch(self, batch: list) -> None:
+        results = []
+        db = SessionLocal()
+        try:
+            for op, kwargs, _ in batch:
+                results.append(self._resolve(op)(db, **kwargs))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+                return
+            # Isolate the failing write so the rest of the batch still commits
+            logger.warning(f"Batched write failed ({e}); retrying {len(batch)} writes one by one")
+            for item in batch:
+                self._commit_batch([item])
+            return
+        finally:
+            db.close()
+
+        for (_, _, future), result in zip(batch, results, strict=True):
+            future.set_result(result)
+
+
+def submit_write(op: str, **kwargs: Any) -> Any:
+    """Run a named write operation through this deployment's single writer."""
+    from services.shared_state import get_db_writer
+
+    return get_db_writer().execute(op, kwargs)
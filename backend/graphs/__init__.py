@@ -0,0 +1,32 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_cooking_graph = None
+_lock = threading.Lock()
+
+
+def get_cooking_graph():
+    """
+    Return the compiled cooking graph, building it on first use.
+
+    Building imports LangGraph, the nodes and the checkpointer, so it is
+    deferred until a request (or the startup warm-up) needs it.
+    """
+    global _cooking_graph
+    if _cooking_graph is None:
+        with _lock:
+            if _cooking_graph is None:
+                from .cooking_graph import build_cooking_graph
+
+                _cooking_graph = build_cooking_graph()
+                logger.info("Cooking graph built")
+    return _cooking_graph
+
+
+def is_graph_built() -> bool:
+    return _cooking_graph is not None
+
+
+__all__ = ["get_cooking_graph", "is_graph_built"]
@@ -1,19 +1,35 @@
 import logging
 
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import END, StateGraph
 
 from checkpointer.sqlite_checkpointer import SQLiteCheckpointSaver
-
-from .nodes import classifier_node, cookware_verification_node, decide_search_node, search_node
+from services.llm import get_chat_model, record_usage
+from services.resilience import llm_caller
+from services.response_cache import (
+    acache_response,
+    aget_cached_response,
+    cache_response,
+    get_cached_response,
+    response_cache_key,
+)
+
+from .nodes import (
+    aclassifier_node,
+    asearch_node,
+    classifier_node,
+    context_budget_node,
+    cookware_verification_node,
+    decide_search_node,
+    search_node,
+)
+from .prompts import RESPONSE_PROMPT, format_history
 from .state import CookingGraphState
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create SQLite checkpointer for persistent conversation memory
-checkpointer = SQLiteCheckpointSaver()
-
 
 def build_cooking_graph():
     """
@@ -23,9 +39,12 @@ def build_cooking_graph():
     workflow = StateGraph(CookingGraphState)
 
     # Add all nodes
-    workflow.add_node("classifier", classifier_node)
+    # Nodes that call upstreams have async variants, used by astream, so
+    # cancelling a streamed run also cancels its in-flight HTTP requests
+    workflow.add_node("classifier", RunnableLambda(classifier_node, aclassifier_node))
     workflow.add_node("decide_search", decide_search_node)
-    workflow.add_node("search", search_node)
+    workflow.add_node("search", RunnableLambda(search_node, asearch_node))
+    workflow.add_node("context_budget", context_budget_node)
     workflow.add_node("cookware_verification", cookware_verification_node)
 
     # Refusal node
@@ -38,30 +57,14 @@ def build_cooking_graph():
     workflow.add_node("refusal", refusal_node)
 
     # Enhanced response node
-    def response_node(state: CookingGraphState) -> dict:
-        """Generate final response using LLM."""
-        logger.info("RESPONSE NODE: Generating final response")
-
-        from langchain_core.prompts import ChatPromptTemplate
-        from langchain_openai import ChatOpenAI
+    def response_inputs(state: CookingGraphState) -> dict:
+        """Prompt variables for the response LLM call."""
+        conversation_context = format_history(state.get("messages"), "Conversation History")
 
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5, max_tokens=300)
-
-        # Build conversation context from message history
-        conversation_context = ""
-        if state.get("messages"):
-            recent_messages = state["messages"][-6:]  # Last 3 exchanges
-            conversation_context = "\n\nConversation History:\n"
-            for msg in recent_messages:
-                role = "User" if isinstance(msg, HumanMessage) else "Assistant"
-                conversation_context += f"{role}: {msg.content}\n"
-
-        # Build context from search results
+        # Search results were already ranked and trimmed by context_budget_node
         search_context = ""
-        if state.get("search_results"):
-            search_context = "\n\nWeb Search Results:\n"
-            for result in state["search_results"]:
-                search_context += f"{result.get('results', '')}\n"
+        if state.get("search_context"):
+            search_context = f"\n\nWeb Search Results:\n{state['search_context']}\n"
 
         # Build cookware context
         cookware_context = ""
@@ -77,48 +80,62 @@ def build_cooking_graph():
             elif can_cook:
                 cookware_context += "\nYou have all the required cookware to make this recipe!"
 
-        prompt = ChatPromptTemplate.from_template("""
-            You are a helpful cooking assistant. Keep your response concise and to the point.
+        return {
+            "conversation_context": conversation_context,
+            "query": state["query"],
+            "query_type": state.get("query_type", "unknown"),
+            "dish": state.get("dish", "not specified"),
+            "ingredients": state.get("ingredients", []),
+            "search_context": search_context,
+            "cookware_context": cookware_context,
+        }
 
-            {conversation_context}
+    def cached_update(cached: str | None) -> dict | None:
+        # First-turn answers with the same classification, search context and
+        # cookware outcome are reused instead of calling the LLM again
+        if cached is None:
+            return None
+        logger.info("RESPONSE NODE: Serving cached response")
+        return {"final_response": cached, "messages": [AIMessage(content=cached)]}
 
-            Current User Query: {query}
-            Query Type: {query_type}
-            Dish: {dish}
-            Ingredients: {ingredients}
+    def response_update(response) -> dict:
+        record_usage("response", response)
 
-            {search_context}
-            {cookware_context}
+        # Add assistant response to message history
+        messages_update = [AIMessage(content=response.content)]
 
-            Provide a brief, helpful response. Reference previous conversation when relevant.
-            For example, if the user asked about a recipe and now asks a follow-up question,
-            acknowledge the connection ("For the carbonara we discussed...").
+        return {"final_response": response.content, "messages": messages_update}
 
-            If it's a recipe, give the key steps only.
-            If the user is missing cookware, acknowledge this and suggest alternatives if possible.
-            Keep it under 250 words.
-        """)
+    def response_node(state: CookingGraphState) -> dict:
+        """Generate final response using LLM."""
+        logger.info("RESPONSE NODE: Generating final response")
 
-        chain = prompt | llm
+        cache_key = response_cache_key(state)
+        cached = cached_update(get_cached_response(cache_key))
+        if cached is not None:
+            return cached
 
-        response = chain.invoke(
-            {
-                "conversation_context": conversation_context,
-                "query": state["query"],
-                "query_type": state.get("query_type", "unknown"),
-                "dish": state.get("dish", "not specified"),
-                "ingredients": state.get("ingredients", []),
-                "search_context": search_context,
-                "cookware_context": cookware_context,
-            }
-        )
+        chain = RESPONSE_PROMPT | get_chat_model("response")
+        response = llm_caller.call(chain.invoke, response_inputs(state))
+        cache_response(cache_key, response.content)
+        return response_update(response)
 
-        # Add assistant response to message history
-        messages_update = [AIMessage(content=response.content)]
+    async def aresponse_node(state: CookingGraphState) -> dict:
+        """Async response_node: cancelling the graph run also cancels the LLM request."""
+        logger.info("RESPONSE NODE: Generating final response")
 
-        return {"final_response": response.content, "messages": messages_update}
+        # Shared cache calls block on IPC in multi-worker mode: keep them off the loop
+        cache_key = response_cache_key(state)
+        cached = cached_update(await aget_cached_response(cache_key))
+        if cached is not None:
+            return cached
+
+        chain = RESPONSE_PROMPT | get_chat_model("response")
+        response = await llm_caller.acall(chain.ainvoke, response_inputs(state))
+        await acache_response(cache_key, response.content)
+        return response_update(response)
 
-    workflow.add_node("response", response_node)
+    workflow.add_node("response", RunnableLambda(response_node, aresponse_node))
 
     # Set entry point
     workflow.set_entry_point("classifier")
@@ -160,8 +177,9 @@ def build_cooking_graph():
         },
     )
 
-    # After search, go to cookware verification
-    workflow.add_edge("search", "cookware_verification")
+    # After search, trim results to the prompt budget, then verify cookware
+    workflow.add_edge("search", "context_budget")
+    workflow.add_edge("context_budget", "cookware_verification")
 
     # After cookware verification, go to response
     workflow.add_edge("cookware_verification", "response")
@@ -170,10 +188,7 @@ def build_cooking_graph():
     workflow.add_edge("refusal", END)
     workflow.add_edge("response", END)
 
-    # Compile with checkpointer for conversation memory
-    app = workflow.compile(checkpointer=checkpointer)
+    # Compile with SQLite checkpointer for persistent conversation memory
+    app = workflow.compile(checkpointer=SQLiteCheckpointSaver())
 
     return app
-
-
-cooking_graph = build_cooking_graph()
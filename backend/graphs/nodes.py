@@ -1,81 +1,39 @@
+import asyncio
 import logging
+import time
 
 from langchain_core.messages import HumanMessage
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-
-from constants.constants import AVAILABLE_COOKWARE
-from schemas.classification import ClassificationOutput
-from tools import tavily_search_tool
-
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from services import cookware_service
+from services.llm import get_chat_model, record_usage
+from services.metrics import metrics
+from services.resilience import llm_caller, search_caller
+from services.single_flight import classifier_flight, normalize_key, search_flight
+from tools import get_tavily_search_tool
+from tools.knowledge_base import KNOWLEDGE_BASE_ENABLED, knowledge_base
+from tools.search_context import build_search_context, count_tokens
+
+from .prompts import CLASSIFIER_PROMPT, classifier_parser, format_history
 from .state import CookingGraphState
 
 logger = logging.getLogger(__name__)
 
 
-def classifier_node(state: CookingGraphState) -> dict:
-    """
-    This node classifies the user query using conversation context.
+def _record_classifier_usage(message):
+    return record_usage("classifier", message)
 
-    INPUT: Reads state["query"] and state["messages"]
-    OUTPUT: Returns dict with classification fields and updated messages
-    """
-    logger.info(f"CLASSIFIER NODE: Processing query: {state['query']}")
 
-    # Your existing classifier logic
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    parser = PydanticOutputParser(pydantic_object=ClassificationOutput)
-
-    # Build context from message history (last 6 messages)
-    conversation_context = ""
-    if state.get("messages"):
-        recent_messages = state["messages"][-6:]
-        conversation_context = "\n\nRecent Conversation:\n"
-        for msg in recent_messages:
-            role = "User" if isinstance(msg, HumanMessage) else "Assistant"
-            conversation_context += f"{role}: {msg.content}\n"
-
-    prompt = ChatPromptTemplate.from_template("""
-        You are a cooking-domain classifier.
-
-        {conversation_context}
-
-        Current User Query: {query}
-
-        Use the conversation history to understand context. Examples:
-        - If user asked "How do I make pasta?" and now asks "What about gluten-free?",
-          recognize they're asking about gluten-free pasta.
-        - If they asked about a dish and now ask "What cookware?", know they mean that dish.
-
-        Your tasks:
-        1. Determine if the query is cooking / recipe related (considering context).
-        2. If not relevant: return relevant=false and query_type="irrelevant".
-        3. If relevant: classify it into EXACTLY ONE of:
-           - "general_cooking": asking about methods, cooking techniques, food science.
-           - "recipe_request": asking for a recipe for a specific dish.
-           - "ingredient_query": user provides ingredients and asks what they can make.
-
-        4. Extract required fields:
-           - For recipe_request: identify the dish name and required cookware/tools.
-           - For ingredient_query: list ingredients only as nouns and required cookware/tools.
-           - For required_cookware: list common cookware items like "Frying Pan", "Knife", "Whisk", "Pot", "Stovetop", "Spatula", "Spoon", "Ladle", etc.
-
-        Respond ONLY in JSON matching the schema.
-
-        {format_instructions}
-    """)
-
-    chain = prompt | llm | parser
-
-    result = chain.invoke(
-        {
-            "query": state["query"],
-            "conversation_context": conversation_context,
-            "format_instructions": parser.get_format_instructions(),
-        }
-    )
+def _classifier_call(state: CookingGraphState) -> tuple[tuple, Runnable, dict]:
+    """Coalescing key, chain and inputs for classifying this turn's query."""
+    llm = get_chat_model("classifier")
+    conversation_context = format_history(state.get("messages"), "Recent Conversation")
+    chain = CLASSIFIER_PROMPT | llm | _record_classifier_usage | classifier_parser
+    inputs = {"query": state["query"], "conversation_context": conversation_context}
+    return normalize_key(state["query"], conversation_context), chain, inputs
 
+
+def _classification_update(state: CookingGraphState, result) -> dict:
     # Add current query to message history
     messages_update = [HumanMessage(content=state["query"])]
 
@@ -90,12 +48,41 @@ def classifier_node(state: CookingGraphState) -> dict:
     }
 
 
+def classifier_node(state: CookingGraphState) -> dict:
+    """
+    This node classifies the user query using conversation context.
+
+    INPUT: Reads state["query"] and state["messages"]
+    OUTPUT: Returns dict with classification fields and updated messages
+    """
+    logger.info(f"CLASSIFIER NODE: Processing query: {state['query']}")
+
+    key, chain, inputs = _classifier_call(state)
+
+    # Identical concurrent queries with the same context share one LLM call
+    result = classifier_flight.do(key, llm_caller.call, chain.invoke, inputs)
+
+    return _classification_update(state, result)
+
+
+async def aclassifier_node(state: CookingGraphState) -> dict:
+    """Async classifier_node: cancelling the graph run also cancels the LLM request."""
+    logger.info(f"CLASSIFIER NODE: Processing query: {state['query']}")
+
+    key, chain, inputs = _classifier_call(state)
+    result = await classifier_flight.ado(key, llm_caller.acall, chain.ainvoke, inputs)
+
+    return _classification_update(state, result)
+
+
 def decide_search_node(state: CookingGraphState) -> dict:
     """
     This node decides whether a web search is needed.
 
     INPUT: Reads state["query_type"], state["dish"], state["ingredients"]
-    OUTPUT: Returns dict with needs_search boolean
+    OUTPUT: Returns dict with needs_search boolean and this turn's
+    search_offset, and clears the previous turn's search_context (the
+    checkpointed state carries it over)
     """
     logger.info(f"DECIDE SEARCH NODE: Query type: {state.get('query_type')}")
 
@@ -106,44 +93,151 @@ def decide_search_node(state: CookingGraphState) -> dict:
 
     logger.debug(f"Search decision result: needs_search={needs_search}")
 
-    return {"needs_search": needs_search}
+    # search_results accumulates across turns; this turn's start where it ends now
+    search_offset = len(state.get("search_results") or [])
 
+    return {"needs_search": needs_search, "search_context": None, "search_offset": search_offset}
 
-def search_node(state: CookingGraphState) -> dict:
-    """
-    This node performs web search using Tavily.
 
-    INPUT: Reads state["query"], state["dish"], state["ingredients"]
-    OUTPUT: Returns dict with search_results
-    """
-    logger.info("SEARCH NODE: Performing web search")
+def _web_search(search_query: str) -> list:
+    """Search the web and keep the results in the knowledge base for next time."""
+    search_results = search_caller.call(get_tavily_search_tool().search_recipes, search_query)
+    _remember_results(search_results, search_query)
+    return search_results
 
+
+async def _aweb_search(search_query: str) -> list:
+    search_results = await search_caller.acall(
+        get_tavily_search_tool().asearch_recipes, search_query
+    )
+    await asyncio.to_thread(_remember_results, search_results, search_query)
+    return search_results
+
+
+def _remember_results(search_results: list, search_query: str) -> None:
+    if KNOWLEDGE_BASE_ENABLED and search_results:
+        try:
+            knowledge_base.ingest_search_results(search_results, query=search_query)
+        except Exception as e:
+            logger.warning(f"Could not store search results in the knowledge base: {e}")
+
+
+def _search_query(state: CookingGraphState) -> str:
     # Build search query based on query type
     query_type = state.get("query_type", "")
 
     if query_type == "recipe_request" and state.get("dish"):
-        search_query = f"recipe for {state['dish']}"
-    elif query_type == "ingredient_query" and state.get("ingredients"):
+        return f"recipe for {state['dish']}"
+    if query_type == "ingredient_query" and state.get("ingredients"):
         ingredients_str = ", ".join(state["ingredients"])
-        search_query = f"recipes with {ingredients_str}"
-    else:
-        search_query = state["query"]
+        return f"recipes with {ingredients_str}"
+    return state["query"]
+
+
+def _local_search(state: CookingGraphState, search_query: str) -> list | None:
+    """
+    Answer from the local knowledge base when it holds a close match: for
+    ingredient queries, recipes the user can make missing at most two items.
+    """
+    if not KNOWLEDGE_BASE_ENABLED:
+        return None
+    try:
+        search_results = None
+        if state.get("query_type") == "ingredient_query" and state.get("ingredients"):
+            search_results = knowledge_base.match_ingredients(state["ingredients"])
+        if search_results is None:
+            search_results = knowledge_base.lookup(search_query, dish=state.get("dish"))
+        return search_results
+    except Exception as e:
+        logger.warning(f"Knowledge base lookup failed: {e}")
+        return None
+
 
+def search_node(state: CookingGraphState) -> dict:
+    """
+    This node finds recipe context: local knowledge base first, Tavily on a miss.
+
+    INPUT: Reads state["query"], state["dish"], state["ingredients"]
+    OUTPUT: Returns dict with search_results
+    """
+    logger.info("SEARCH NODE: Performing web search")
+
+    search_query = _search_query(state)
     logger.debug(f"Search query: {search_query}")
 
-    # Perform search using the tool
-    search_results = tavily_search_tool.search_recipes(search_query)
+    search_results = _local_search(state, search_query)
+
+    # Otherwise search the web. Search is optional context, so on failure
+    # (or while the Tavily circuit is open) degrade to answering without it.
+    if search_results is None:
+        try:
+            search_results = search_flight.do(
+                normalize_key(search_query), _web_search, search_query
+            )
+        except Exception as e:
+            logger.warning(f"Search unavailable, continuing without results: {e}")
+            search_results = []
 
     logger.debug(f"Found {len(search_results)} results")
 
-    return {"search_results": search_results}
+    # Copy: the list may be shared with other coalesced callers
+    return {"search_results": list(search_results)}
 
 
-def cookware_verification_node(state: CookingGraphState) -> dict:
+async def asearch_node(state: CookingGraphState) -> dict:
+    """Async search_node: cancelling the graph run also cancels the Tavily request."""
+    logger.info("SEARCH NODE: Performing web search")
+
+    search_query = _search_query(state)
+    search_results = await asyncio.to_thread(_local_search, state, search_query)
+
+    if search_results is None:
+        try:
+            search_results = await search_flight.ado(
+                normalize_key(search_query), _aweb_search, search_query
+            )
+        except Exception as e:
+            logger.warning(f"Search unavailable, continuing without results: {e}")
+            search_results = []
+
+    return {"search_results": list(search_results)}
+
+
+def context_budget_node(state: CookingGraphState) -> dict:
+    """
+    This node condenses raw search results into a ranked, token-budgeted context.
+
+    INPUT: Reads this turn's state["search_results"] (from state["search_offset"]),
+    state["dish"], state["ingredients"]
+    OUTPUT: Returns dict with search_context
+    """
+    logger.info("CONTEXT BUDGET NODE: Trimming search results")
+
+    search_results = (state.get("search_results") or [])[state.get("search_offset") or 0 :]
+
+    started = time.perf_counter()
+    search_context = build_search_context(
+        search_results, dish=state.get("dish"), ingredients=state.get("ingredients")
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    # Compare against the verbatim concatenation the prompt used to receive
+    raw_tokens = count_tokens("\n".join(str(r.get("results", r)) for r in search_results))
+    budgeted_tokens = count_tokens(search_context)
+    metrics.observe("search_context.raw_tokens", raw_tokens)
+    metrics.observe("search_context.budgeted_tokens", budgeted_tokens)
+    metrics.observe("search_context.build_ms", elapsed_ms)
+
+    logger.debug(f"Search context: {raw_tokens} -> {budgeted_tokens} tokens in {elapsed_ms:.1f}ms")
+
+    return {"search_context": search_context}
+
+
+def cookware_verification_node(state: CookingGraphState, config: RunnableConfig = None) -> dict:
     """
-    This node verifies if the user has the required cookware.
+    This node verifies if the thread owner has the required cookware.
 
-    INPUT: Reads state["required_cookware"]
+    INPUT: Reads state["required_cookware"] and the thread_id from config
     OUTPUT: Returns dict with can_cook and missing_cookware
     """
     logger.info("COOKWARE VERIFICATION NODE: Checking cookware requirements")
@@ -155,17 +249,17 @@ def cookware_verification_node(state: CookingGraphState) -> dict:
         logger.debug("No cookware requirements specified")
         return {"can_cook": True, "missing_cookware": []}
 
-    # Convert to lowercase for case-insensitive comparison
-    available_lower = [item.lower() for item in AVAILABLE_COOKWARE]
+    # Owner's inventory comes from an in-memory cache on repeat turns
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    cookware_index = cookware_service.get_thread_cookware_index(thread_id)
 
-    # Check which required items are missing
-    missing = []
-    for item in required_cookware:
-        if item.lower() not in available_lower:
-            missing.append(item)
+    # Resolves synonyms, plurals and typos ("skillet", "pots") against the inventory
+    missing = cookware_index.find_missing(required_cookware)
 
     can_cook = len(missing) == 0
 
-    logger.debug(f"Cookware check - Required: {required_cookware}, Missing: {missing}, Can cook: {can_cook}")
+    logger.debug(
+        f"Cookware check - Required: {required_cookware}, Missing: {missing}, Can cook: {can_cook}"
+    )
 
     return {"can_cook": can_cook, "missing_cookware": missing}
@@ -0,0 +1,91 @@
+from collections.abc import Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from schemas.classification import ClassificationOutput
+
+# Messages of history included in prompts (the last three exchanges)
+HISTORY_MESSAGES = 6
+
+# Templates are parsed once at import; nodes only fill in the variables.
+#
+# Each prompt is a static system message followed by the per-turn human
+# message, with every dynamic value (history, query, search results) after
+# the instructions. OpenAI only caches prefixes of 1024 tokens or more; the
+# classifier's static prefix is about 930 tokens and the response prompt's
+# about 140, so neither is cached today. The ordering keeps them cacheable if
+# the instructions grow past the threshold.
+classifier_parser = PydanticOutputParser(pydantic_object=ClassificationOutput)
+
+CLASSIFIER_INSTRUCTIONS = """You are a cooking-domain classifier.
+
+Use the conversation history to understand context. Examples:
+- If user asked "How do I make pasta?" and now asks "What about gluten-free?",
+  recognize they're asking about gluten-free pasta.
+- If they asked about a dish and now ask "What cookware?", know they mean that dish.
+
+Your tasks:
+1. Determine if the query is cooking / recipe related (considering context).
+2. If not relevant: return relevant=false and query_type="irrelevant".
+3. If relevant: classify it into EXACTLY ONE of:
+   - "general_cooking": asking about methods, cooking techniques, food science.
+   - "recipe_request": asking for a recipe for a specific dish.
+   - "ingredient_query": user provides ingredients and asks what they can make.
+
+4. Extract required fields:
+   - For recipe_request: identify the dish name and required cookware/tools.
+   - For ingredient_query: list ingredients only as nouns and required cookware/tools.
+   - For required_cookware: list common cookware items like "Frying Pan", "Knife", \
+"Whisk", "Pot", "Stovetop", "Spatula", "Spoon", "Ladle", etc.
+
+Respond ONLY in JSON matching the schema.
+
+{format_instructions}"""
+
+CLASSIFIER_INPUT = """{conversation_context}
+
+Current User Query: {query}"""
+
+RESPONSE_INSTRUCTIONS = """You are a helpful cooking assistant. \
+Keep your response concise and to the point.
+
+Provide a brief, helpful response. Reference previous conversation when relevant.
+For example, if the user asked about a recipe and now asks a follow-up question,
+acknowledge the connection ("For the carbonara we discussed...").
+
+If it's a recipe, give the key steps only.
+If the user is missing cookware, acknowledge this and suggest alternatives if possible.
+Keep it under 250 words."""
+
+RESPONSE_INPUT = """{conversation_context}
+
+Current User Query: {query}
+Query Type: {query_type}
+Dish: {dish}
+Ingredients: {ingredients}
+{search_context}{cookware_context}"""
+
+CLASSIFIER_PROMPT = ChatPromptTemplate.from_messages(
+    [("system", CLASSIFIER_INSTRUCTIONS), ("human", CLASSIFIER_INPUT)]
+).partial(format_instructions=classifier_parser.get_format_instructions())
+
+RESPONSE_PROMPT = ChatPromptTemplate.from_messages(
+    [("system", RESPONSE_INSTRUCTIONS), ("human", RESPONSE_INPUT)]
+)
+
+
+def format_history(messages: Sequence[BaseMessage] | None, header: str) -> str:
+    """
+    Render the recent message history as "Role: content" lines under a header.
+
+    Returns an empty string when there is no history.
+    """
+    if not messages:
+        return ""
+    lines = [
+        f"{'User' if isinstance(msg, HumanMessage) else 'Assistant'}: {msg.content}\n"
+        for msg in messages[-HISTORY_MESSAGES:]
+    ]
+    return f"{header}:\n" + "".join(lines)
@@ -19,7 +19,9 @@ class CookingGraphState(TypedDict):
 
     # Search decision and results
     needs_search: bool | None
-    search_results: Annotated[list, operator.add]
+    search_results: Annotated[list, operator.add]  # Accumulates across turns
+    search_offset: int | None  # Where this turn's search_results start
+    search_context: str | None
 
     # Cookware
     required_cookware: list[str] | None
@@ -0,0 +1,18 @@
+import os
+
+from services.shared_state import start_server, stop_server
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+# SSE turns can outlive gunicorn's default 30s worker timeout
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+
+
+def on_starting(server):
+    # One shared cache + DB writer process for all workers (see services/shared_state.py)
+    start_server()
+
+
+def on_exit(server):
+    stop_server()
@@ -1,12 +1,21 @@
+import asyncio
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
-from api import conversations_router, cooking_router
+from api import conversations_router, cooking_router, cookware_router
+from checkpointer.compression import checkpoint_codec
 from database.init import create_tables
+from graphs import get_cooking_graph, is_graph_built
+from services import llm
+from services.conversation_archive import ARCHIVE_INTERVAL_SECONDS, archive_periodically
+from services.metrics import metrics
+from tools import tavily_search
 
 load_dotenv()
 
@@ -14,13 +23,40 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Build the graph and upstream clients in the background after startup so the
+# replica can take traffic immediately; requests that arrive first build lazily.
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+
+
+def warm_up():
+    """Initialize the cooking graph, chat models and search tool (and the checkpoint dictionary)."""
+    try:
+        get_cooking_graph()
+        for name in llm.CHAT_MODEL_CONFIGS:
+            llm.get_chat_model(name)
+        if os.getenv("TAVILY_API_KEY"):
+            tavily_search.get_tavily_search_tool()
+        checkpoint_codec.ensure_dictionary()
+        logger.info("Warm-up complete")
+    except Exception as e:
+        logger.error(f"Warm-up failed; components will initialize on first use: {e}")
+
+
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     """Handle application lifespan events."""
     # Startup
     create_tables()
+    warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up)) if WARM_UP_ON_STARTUP else None
+    archive_task = (
+        asyncio.create_task(archive_periodically()) if ARCHIVE_INTERVAL_SECONDS > 0 else None
+    )
     logger.info("Application startup complete")
     yield
+    if warm_up_task and not warm_up_task.done():
+        warm_up_task.cancel()
+    if archive_task:
+        archive_task.cancel()
     # Shutdown (if needed in the future)
     logger.info("Application shutdown")
 
@@ -50,6 +86,7 @@ app.add_middleware(
 # Include API routes
 app.include_router(cooking_router)
 app.include_router(conversations_router)
+app.include_router(cookware_router)
 
 
 @app.get("/")
@@ -72,3 +109,39 @@ async def health():
         dict: Health status indicator
     """
     return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def ready(require_warm: bool = False):
+    """
+    Readiness probe that reports whether lazy components are initialized.
+
+    A cold replica can still serve requests (components build on first use);
+    pass require_warm=true to get a 503 until warm-up has finished.
+
+    Returns:
+        dict: "warm" or "cold" status and per-component state
+    """
+    components = {
+        "graph": is_graph_built(),
+        "llm": llm.is_initialized(),
+        "search_tool": tavily_search.is_initialized(),
+    }
+    # Search is optional: without an API key the graph answers without it
+    search_ready = components["search_tool"] or not os.getenv("TAVILY_API_KEY")
+    status = "warm" if components["graph"] and components["llm"] and search_ready else "cold"
+    body = {"status": status, "components": components}
+    if require_warm and status != "warm":
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    In-process metrics for this worker (coalescing, circuit breakers, etc.).
+
+    Returns:
+        dict: Counters, gauges and observation summaries
+    """
+    return metrics.snapshot()
@@ -1,4 +1,4 @@
-from .api import QueryInput, QueryResponse
+from .api import BatchQueryInput, QueryInput, QueryResponse
 from .classification import ClassificationOutput
 
-__all__ = ["QueryInput", "QueryResponse", "ClassificationOutput"]
+__all__ = ["BatchQueryInput", "QueryInput", "QueryResponse", "ClassificationOutput"]
@@ -8,6 +8,7 @@ class QueryInput(BaseModel):
 
     query: str
     thread_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str | None = None  # Owner whose kitchen inventory is used for cookware checks
 
 
 class QueryResponse(BaseModel):
@@ -16,3 +17,10 @@ class QueryResponse(BaseModel):
     response: str
     metadata: dict = {}
     thread_id: str
+
+
+class BatchQueryInput(BaseModel):
+    """Input schema for running many cooking queries in one request."""
+
+    queries: list[QueryInput] = Field(min_length=1)
+    max_concurrency: int | None = Field(default=None, ge=1)  # Capped at BATCH_MAX_CONCURRENCY
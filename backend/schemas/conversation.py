@@ -30,6 +30,7 @@ class ConversationSchema(BaseModel):
     created_at: datetime
     updated_at: datetime
     message_count: int
+    user_id: str | None = None
 
 
 class ConversationWithLastMessage(ConversationSchema):
@@ -62,3 +63,27 @@ class UpdateConversationRequest(BaseModel):
     """Request to update conversation metadata."""
 
     title: str
+
+
+class ConversationSearchResult(BaseModel):
+    """A message or conversation title matching a search query."""
+
+    thread_id: str
+    conversation_id: str
+    title: str | None = None
+    message_id: str | None = None  # None when the title matched
+    role: str | None = None
+    snippet: str  # Matched terms wrapped in <mark></mark>
+    timestamp: datetime
+    score: float
+
+
+class ConversationSearchResponse(BaseModel):
+    """Response for searching conversations."""
+
+    query: str
+    results: list[ConversationSearchResult]
+    skip: int
+    limit: int
+    has_more: bool
+    truncated: bool = False  # Older matches beyond SEARCH_RANK_WINDOW were not ranked
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+
+
+class CookwareInventoryResponse(BaseModel):
+    """A user's kitchen inventory."""
+
+    user_id: str
+    items: list[str]
+    is_default: bool = Field(
+        description="True when the user has no stored inventory and the default is used"
+    )
+
+
+class SetCookwareRequest(BaseModel):
+    """Request to replace a user's inventory (an empty list reverts to the default)."""
+
+    items: list[str]
+
+
+class AddCookwareRequest(BaseModel):
+    """Request to add a single cookware item."""
+
+    name: str = Field(min_length=1)
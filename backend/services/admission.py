@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejectedError(RuntimeError):
+    """Raised when a request is turned away because the queue is full or the wait expired."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionSlot:
+    """A granted slot; release it exactly once when the work is done (extra calls are no-ops)."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._controller._release()
+
+
+class AdmissionController:
+    """
+    Bounds concurrent work with a FIFO wait queue in front of it.
+
+    Up to `max_active` holders run at once; up to `max_queued` more wait at
+    most `queue_timeout` seconds for a slot. Anything beyond that is rejected
+    immediately with AdmissionRejectedError so the caller can answer 429
+    instead of letting every request slow down together.
+
+    Waiters are plain futures on the caller's event loop and slots are handed
+    over directly on release, so a freed slot cannot be taken by a newcomer
+    ahead of the queue.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_active: int,
+        max_queued: int,
+        queue_timeout: float,
+        retry_after: int,
+    ):
+        self.name = name
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _update_gauges(self) -> None:
+        metrics.set_gauge(f"admission.{self.name}.active", self._active)
+        metrics.set_gauge(f"admission.{self.name}.queued", len(self._waiters))
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        metrics.increment(f"admission.{self.name}.rejected.{reason}")
+        return AdmissionRejectedError(f"{self.name} is at capacity ({reason})", self.retry_after)
+
+    async def acquire(self) -> AdmissionSlot:
+        """
+        Wait for a slot.
+
+        Raises:
+            AdmissionRejectedError: If the wait queue is full or the wait timed out
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self._active < self.max_active:
+                self._active += 1
+                self._update_gauges()
+                metrics.increment(f"admission.{self.name}.admitted")
+                return AdmissionSlot(self)
+            if len(self._waiters) >= self.max_queued:
+                raise self._reject("queue_full")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._update_gauges()
+
+        try:
+            await asyncio.wait([waiter], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Gone before getting a slot; give back one that was just handed over
+            if not self._abandon(waiter):
+                self._release()
+            raise
+        if not waiter.done() and self._abandon(waiter):
+            raise self._reject("timeout")
+        # Granted (possibly while the timeout fired): the hand-off is already scheduled
+        await waiter
+
+        metrics.increment(f"admission.{self.name}.admitted")
+        metrics.observe(f"admission.{self.name}.wait_ms", (time.perf_counter() - started) * 1000)
+        return AdmissionSlot(self)
+
+    def _abandon(self, waiter: asyncio.Future) -> bool:
+        """Remove a waiter from the queue; False if it was already granted a slot."""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            self._update_gauges()
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                try:
+                    waiter.get_loop().call_soon_threadsafe(_grant, waiter)
+                except RuntimeError:
+                    continue  # Its event loop has closed
+                self._update_gauges()
+                return
+            self._active -= 1
+            self._update_gauges()
+
+
+def _grant(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+# Per worker: with WEB_CONCURRENCY workers the deployment admits that many times more
+stream_admission = AdmissionController(
+    "stream",
+    max_active=int(os.getenv("STREAM_MAX_CONCURRENCY", "32")),
+    max_queued=int(os.getenv("STREAM_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("STREAM_QUEUE_TIMEOUT_SECONDS", "10")),
+    retry_after=int(os.getenv("STREAM_RETRY_AFTER_SECONDS", "5")),
+)
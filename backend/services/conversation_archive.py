@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from checkpointer.compression import CheckpointCodec, checkpoint_codec
+from database.connection import get_db
+from database.models import Checkpoint, Conversation, ConversationArchive, Message
+from database.writer import submit_write
+from services.cache import LRUCache
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Conversations not updated for this many days are moved to the archive
+ARCHIVE_IDLE_DAYS = float(os.getenv("ARCHIVE_IDLE_DAYS", "7"))
+
+# Conversations archived per writer transaction
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "100"))
+
+# Run the archiver in this process every N seconds; 0 leaves it to
+# `python -m services.conversation_archive run` (e.g. from cron)
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "0"))
+
+# Archives are written once and rarely read, so they get a slower, denser level
+ARCHIVE_COMPRESSION_LEVEL = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", "9"))
+
+# How long the archived/hot counts reported in /metrics are reused
+ARCHIVE_STATS_TTL = float(os.getenv("ARCHIVE_STATS_TTL_SECONDS", "60"))
+
+MESSAGE_COLUMNS = tuple(column.name for column in Message.__table__.columns)
+
+# Archives share the checkpoint dictionary: most of a thread's bytes are checkpoints
+archive_codec = CheckpointCodec(level=ARCHIVE_COMPRESSION_LEVEL)
+_serde = JsonPlusSerializer()
+_stats = LRUCache("archive_stats", maxsize=1, ttl=ARCHIVE_STATS_TTL)
+
+
+def _pack(contents: dict) -> tuple[bytes, int, str, int | None]:
+    _, data = _serde.dumps_typed(contents)
+    codec, dictionary_id, payload = archive_codec.encode(data)
+    return payload, len(data), codec, dictionary_id
+
+
+def _unpack(archive: ConversationArchive) -> dict:
+    data = archive_codec.decode(archive.codec, archive.dictionary_id, archive.payload)
+    return _serde.loads_typed(("msgpack", data))
+
+
+def _read_thread(db: Session, conversation: Conversation) -> dict:
+    """An archive row for a conversation, built from a consistent read of its rows."""
+    messages = [
+        dict(row)
+        for row in db.execute(
+            text(
+                f"SELECT {', '.join(MESSAGE_COLUMNS)} FROM messages "
+                "WHERE thread_id = :thread_id ORDER BY rowid"
+            ),
+            {"thread_id": conversation.thread_id},
+        ).mappings()
+    ]
+    checkpoints = []
+    for record in (
+        db.query(Checkpoint)
+        .filter_by(thread_id=conversation.thread_id)
+        .order_by(Checkpoint.created_at)
+    ):
+        type_str, data = checkpoint_codec.read(record)
+        checkpoints.append(
+            {
+                "id": record.id,
+                "created_at": record.created_at,
+                "type": type_str,
+                "metadata": record.checkpoint_data.get("metadata", {}),
+                "data": data,
+            }
+        )
+    payload, raw_bytes, codec, dictionary_id = _pack(
+        {"messages": messages, "checkpoints": checkpoints}
+    )
+    return {
+        "thread_id": conversation.thread_id,
+        "conversation_id": conversation.id,
+        "payload": payload,
+        "codec": codec,
+        "dictionary_id": dictionary_id,
+        "message_count": len(messages),
+        "checkpoint_count": len(checkpoints),
+        "raw_bytes": raw_bytes,
+        "last_message": messages[-1] if messages else None,
+    }
+
+
+def write_conversation_archives(
+    db: Session, archives: list[dict], idle_before: datetime
+) -> list[str]:
+    """
+    Writer operation: replace conversations' messages and checkpoints with their archives.
+
+    A conversation updated since `idle_before` (or checkpointed since its
+    archive was built) is left hot. Returns the thread_ids archived.
+    """
+    archived = []
+    for archive in archives:
+        thread_id = archive["thread_id"]
+        idle = db.scalar(
+            select(Conversation.id).where(
+                Conversation.thread_id == thread_id,
+                Conversation.updated_at < idle_before,
+                Conversation.archived_at.is_(None),
+            )
+        )
+        checkpoints = db.scalar(
+            select(func.count()).select_from(Checkpoint).where(Checkpoint.thread_id == thread_id)
+        )
+        if idle is None or checkpoints != archive["checkpoint_count"]:
+            continue
+        db.execute(insert(ConversationArchive).values(archive))
+        # Deleting the messages also removes them from the search index (by trigger)
+        for model in (Message, Checkpoint):
+            db.execute(
+                delete(model).where(model.thread_id == thread_id),
+                execution_options={"synchronize_session": False},
+            )
+        db.execute(
+            update(Conversation)
+            .where(Conversation.thread_id == thread_id)
+            # Listed by recency like before; archiving is not an update
+            .values(archived_at=datetime.utcnow(), updated_at=Conversation.updated_at)
+        )
+        archived.append(thread_id)
+    return archived
+
+
+def write_conversation_restore(db: Session, thread_id: str) -> dict | None:
+    """
+    Writer operation: move an archived conversation's rows back into the hot tables.
+
+    Returns the number of messages and checkpoints restored, or None if the
+    conversation is not archived (e.g. another request restored it first).
+    """
+    archive = db.get(ConversationArchive, thread_id)
+    if archive is None:
+        return None
+    contents = _unpack(archive)
+
+    if contents["messages"]:
+        # Values are restored as stored, like an import
+        db.execute(
+            text(
+                f"INSERT OR IGNORE INTO messages ({', '.join(MESSAGE_COLUMNS)}) "
+                f"VALUES ({', '.join(f':{column}' for column in MESSAGE_COLUMNS)})"
+            ),
+            contents["messages"],
+        )
+    rows = []
+    for checkpoint in contents["checkpoints"]:
+        codec, dictionary_id, payload = checkpoint_codec.encode(checkpoint["data"])
+        rows.append(
+            {
+                "id": checkpoint["id"],
+                "thread_id": thread_id,
+                "created_at": checkpoint["created_at"],
+                "checkpoint_data": {
+                    "checkpoint": {"type": checkpoint["type"]},
+                    "metadata": checkpoint["metadata"],
+                },
+                "payload": payload,
+                "codec": codec,
+                "dictionary_id": dictionary_id,
+            }
+        )
+    if rows:
+        db.execute(insert(Checkpoint), rows)
+
+    db.execute(
+        delete(ConversationArchive).where(ConversationArchive.thread_id == thread_id),
+        execution_options={"synchronize_session": False},
+    )
+    db.execute(
+        update(Conversation)
+        .where(Conversation.thread_id == thread_id)
+        .values(archived_at=None, updated_at=Conversation.updated_at)
+    )
+    return {"messages": len(contents["messages"]), "checkpoints": len(rows)}
+
+
+def rehydrate(thread_id: str) -> bool:
+    """
+    Restore an archived conversation so it can be read and continued.
+
+    Returns:
+        True if it was archived (now restored), False if it was not
+    """
+    started = time.perf_counter()
+    with get_db() as db:
+        if db.scalar(select(ConversationArchive.thread_id).filter_by(thread_id=thread_id)) is None:
+            return False
+    restored = submit_write("restore_conversation", thread_id=thread_id)
+    if restored is None:
+        return False
+    elapsed = time.perf_counter() - started
+    _stats.delete("counts")
+    metrics.increment("archive.rehydrated")
+    metrics.observe("archive.rehydration_seconds", elapsed)
+    logger.info(
+        f"Rehydrated conversation {thread_id} ({restored['messages']} messages, "
+        f"{restored['checkpoints']} checkpoints) in {elapsed * 1000:.1f}ms"
+    )
+    return True
+
+
+async def arehydrate(thread_id: str) -> bool:
+    """Async version of rehydrate."""
+    return await asyncio.to_thread(rehydrate, thread_id)
+
+
+def archived_messages(thread_id: str) -> list[Message]:
+    """
+    Messages of an archived conversation, read without restoring it.
+
+    Returns an empty list if the conversation is not archived.
+    """
+    with get_db() as db:
+        archive = db.get(ConversationArchive, thread_id)
+        if archive is None:
+            return []
+        rows = _unpack(archive)["messages"]
+    return [_message(row) for row in rows]
+
+
+def archived_last_message(thread_id: str) -> Message | None:
+    """
+    Newest message of an archived conversation, from the preview stored with
+    its archive; the blob is only decompressed for archives made without one.
+    """
+    with get_db() as db:
+        archive = db.execute(
+            select(ConversationArchive.last_message, ConversationArchive.message_count).where(
+                ConversationArchive.thread_id == thread_id
+            )
+        ).first()
+    if archive is None or not archive.message_count:
+        return None
+    if archive.last_message is None:
+        messages = archived_messages(thread_id)
+        return messages[-1] if messages else None
+    return _message(archive.last_message)
+
+
+def _message(row: dict) -> Message:
+    """A Message from a stored message row."""
+    return Message(
+        **row
+        | {
+            "timestamp": datetime.fromisoformat(row["timestamp"]),
+            "message_metadata": json.loads(row["message_metadata"] or "null"),
+        }
+    )
+
+
+def archived_message_rows() -> Iterator[dict]:
+    """Stored message rows (column name to value) of every archived conversation."""
+    with get_db() as db:
+        thread_ids = db.scalars(select(ConversationArchive.thread_id)).all()
+    for thread_id in thread_ids:
+        with get_db() as db:
+            archive = db.get(ConversationArchive, thread_id)
+            if archive is None:  # Restored or deleted meanwhile; its rows are hot now
+                continue
+            contents = _unpack(archive)
+        yield from contents["messages"]
+
+
+def archive_idle_conversations(idle_before: datetime) -> int:
+    """
+    Archive every conversation last updated before `idle_before` (naive UTC).
+
+    Archives are built and compressed outside the writer, then swapped in
+    ARCHIVE_BATCH conversations per writer transaction.
+
+    Returns:
+        Number of conversations archived
+    """
+    total, raw_bytes, stored_bytes = 0, 0, 0
+    after = ""
+    while True:
+        with get_db() as db:
+            conversations = (
+                db.query(Conversation)
+                .filter(
+                    Conversation.thread_id > after,
+                    Conversation.updated_at < idle_before,
+                    Conversation.archived_at.is_(None),
+                )
+                .order_by(Conversation.thread_id)
+                .limit(ARCHIVE_BATCH)
+                .all()
+            )
+            archives = []
+            for conversation in conversations:
+                try:
+                    archives.append(_read_thread(db, conversation))
+                except Exception as e:
+                    logger.error(f"Could not archive conversation {conversation.thread_id}: {e}")
+        if not conversations:
+            break
+        after = conversations[-1].thread_id
+        sizes = {archive["thread_id"]: archive for archive in archives}
+        archived = (
+            submit_write("archive_conversations", archives=archives, idle_before=idle_before)
+            if archives
+            else []
+        )
+        for thread_id in archived:
+            raw_bytes += sizes[thread_id]["raw_bytes"]
+            stored_bytes += len(sizes[thread_id]["payload"])
+        total += len(archived)
+
+    _stats.delete("counts")
+    metrics.increment("archive.archived", total)
+    metrics.increment("archive.raw_bytes", raw_bytes)
+    metrics.increment("archive.stored_bytes", stored_bytes)
+    logger.info(
+        f"Archived {total} conversations idle since {idle_before} "
+        f"({raw_bytes} bytes compressed to {stored_bytes})"
+    )
+    return total
+
+
+async def archive_periodically(interval: float = ARCHIVE_INTERVAL_SECONDS) -> None:
+    """Archive idle conversations every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            idle_before = datetime.utcnow() - timedelta(days=ARCHIVE_IDLE_DAYS)
+            await asyncio.to_thread(archive_idle_conversations, idle_before)
+        except Exception as e:
+            logger.error(f"Archiving idle conversations failed: {e}")
+
+
+def _archive_gauges() -> dict:
+    counts = _stats.get("counts")
+    if counts is None:
+        with get_db() as db:
+            total = db.scalar(select(func.count()).select_from(Conversation))
+            archived = db.scalar(select(func.count()).select_from(ConversationArchive))
+        counts = (total, archived)
+        _stats.set("counts", counts)
+    total, archived = counts
+    return {
+        "conversations.hot": total - archived,
+        "conversations.archived": archived,
+        "conversations.archived_ratio": archived / total if total else 0.0,
+    }
+
+
+metrics.register_collector(_archive_gauges)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive idle conversations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="archive conversations idle for --idle-days")
+    run_parser.add_argument("--idle-days", type=float, default=ARCHIVE_IDLE_DAYS)
+    commands.add_parser("stats", help="print the archived and hot conversation counts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from database.init import create_tables
+
+    create_tables()
+    if args.command == "run":
+        count = archive_idle_conversations(datetime.utcnow() - timedelta(days=args.idle_days))
+        print(f"Archived {count} conversations")
+    else:
+        print(_archive_gauges())
@@ -1,27 +1,62 @@
+import asyncio
 import logging
+import os
+import re
 import uuid
 from datetime import datetime
 
-from langchain_openai import ChatOpenAI
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
 
-from database.connection import get_db
-from database.models import Conversation, Message
+from database.connection import get_async_db, get_db
+from database.models import Checkpoint, Conversation, Message
+from database.writer import submit_write
+from services import conversation_archive, cookware_service
+from services.llm import get_chat_model, record_usage
+from services.resilience import title_caller
 
 logger = logging.getLogger(__name__)
 
+# Title matches outrank body matches of the same bm25 score
+TITLE_MATCH_WEIGHT = 2.0
+SNIPPET_TOKENS = 12
+SNIPPET_MARKERS = ("<mark>", "</mark>")
 
-def generate_conversation_title(first_message: str) -> str:
-    """Generate a concise title from the first user message using LLM."""
-    try:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5, max_tokens=20)
-        prompt = f"""Generate a concise, descriptive 2-5 word title for this cooking question.
+# Only the newest matches of a query are ranked; older ones are not returned
+# (search results say "truncated" when a query had more matches than this)
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "5000"))
+
+# Conversations deleted per writer transaction by bulk deletes
+BULK_DELETE_BATCH = int(os.getenv("BULK_DELETE_BATCH", "500"))
+
+_SEARCH_TERM = re.compile(r"\w+")
+
+# Joins needed to filter FTS rows by conversation owner
+_OWNER_JOINS = {
+    "messages_fts": (
+        "JOIN messages m ON m.rowid = messages_fts.rowid "
+        "JOIN conversations c ON c.id = m.conversation_id"
+    ),
+    "conversations_fts": "JOIN conversations c ON c.rowid = conversations_fts.rowid",
+}
+
+
+def _title_prompt(first_message: str) -> str:
+    return f"""Generate a concise, descriptive 2-5 word title for this cooking question.
 Focus on the main topic (dish, ingredient, or technique).
 Be specific and clear. Do not use quotes or punctuation.
 
 Question: {first_message}
 
 Title:"""
-        response = llm.invoke(prompt)
+
+
+def generate_conversation_title(first_message: str) -> str:
+    """Generate a concise title from the first user message using LLM."""
+    try:
+        llm = get_chat_model("title")
+        response = title_caller.call(llm.invoke, _title_prompt(first_message))
+        record_usage("title", response)
         title = response.content.strip("\"'.,!?").strip()
         return title if title else "New Conversation"
     except Exception as e:
@@ -29,16 +64,50 @@ Title:"""
         return "New Conversation"
 
 
+async def agenerate_conversation_title(first_message: str) -> str:
+    """Async version of generate_conversation_title."""
+    try:
+        llm = get_chat_model("title")
+        response = await title_caller.acall(llm.ainvoke, _title_prompt(first_message))
+        record_usage("title", response)
+        title = response.content.strip("\"'.,!?").strip()
+        return title if title else "New Conversation"
+    except Exception as e:
+        logger.error(f"Error generating title: {e}")
+        return "New Conversation"
+
+
+def _conversation_row(conv: Conversation) -> dict:
+    """A conversation's column values, picklable for the writer to return."""
+    return {column.key: getattr(conv, column.key) for column in Conversation.__table__.columns}
+
+
 def create_conversation(thread_id: str, first_message: str | None = None) -> Conversation:
     """Create a new conversation with optional title generation."""
-    with get_db() as db:
-        title = generate_conversation_title(first_message) if first_message else "New Conversation"
-        conv = Conversation(id=str(uuid.uuid4()), thread_id=thread_id, title=title)
-        db.add(conv)
-        db.commit()
-        db.refresh(conv)
-        logger.info(f"Created conversation: {conv.thread_id} with title '{title}'")
-        return conv
+    title = generate_conversation_title(first_message) if first_message else "New Conversation"
+    row = submit_write("create_conversation", thread_id=thread_id, title=title)
+    logger.info(f"Created conversation: {thread_id} with title '{title}'")
+    return Conversation(**row)
+
+
+async def acreate_conversation(thread_id: str, first_message: str | None = None) -> Conversation:
+    """Async version of create_conversation."""
+    title = (
+        await agenerate_conversation_title(first_message) if first_message else "New Conversation"
+    )
+    row = await asyncio.to_thread(
+        submit_write, "create_conversation", thread_id=thread_id, title=title
+    )
+    logger.info(f"Created conversation: {thread_id} with title '{title}'")
+    return Conversation(**row)
+
+
+def write_conversation(db: Session, thread_id: str, title: str) -> dict:
+    """Writer operation for create_conversation."""
+    conv = Conversation(id=str(uuid.uuid4()), thread_id=thread_id, title=title)
+    db.add(conv)
+    db.flush()  # Fill in the column defaults
+    return _conversation_row(conv)
 
 
 def get_conversation_by_thread(thread_id: str) -> Conversation | None:
@@ -47,43 +116,126 @@ def get_conversation_by_thread(thread_id: str) -> Conversation | None:
         return db.query(Conversation).filter_by(thread_id=thread_id).first()
 
 
-def save_message(thread_id: str, role: str, content: str, metadata: dict = None) -> Message:
-    """Save a message to the database and update conversation metadata."""
-    with get_db() as db:
-        # Get or create conversation
-        conv = db.query(Conversation).filter_by(thread_id=thread_id).first()
-        if not conv:
-            # Create conversation without title generation (will be done on first user message)
-            first_user_message = content if role == "user" else None
-            conv = Conversation(
-                id=str(uuid.uuid4()),
-                thread_id=thread_id,
-                title=generate_conversation_title(first_user_message)
-                if first_user_message
-                else "New Conversation",
-            )
-            db.add(conv)
-            db.flush()  # Get the ID without committing
+async def aget_conversation_by_thread(thread_id: str) -> Conversation | None:
+    """Async version of get_conversation_by_thread."""
+    async with get_async_db() as db:
+        return await db.scalar(select(Conversation).filter_by(thread_id=thread_id).limit(1))
+
+
+def save_message(
+    thread_id: str,
+    role: str,
+    content: str,
+    metadata: dict = None,
+    user_id: str | None = None,
+) -> Message:
+    """Save a message to the database and update conversation metadata.
+
+    If `user_id` is given and the thread has no owner yet, the user becomes its owner.
+    The write goes through the deployment's single DB writer.
+    """
+    # Generate the title before queueing the write so the writer never waits on the LLM
+    title = None
+    if role == "user" and get_conversation_by_thread(thread_id) is None:
+        title = generate_conversation_title(content)
+
+    result = submit_write(
+        "save_message",
+        thread_id=thread_id,
+        role=role,
+        content=content,
+        metadata=metadata,
+        user_id=user_id,
+        title=title,
+    )
+    cookware_service.remember_thread_owner(thread_id, result["owner"])
+    logger.debug(f"Saved {role} message to conversation {thread_id}")
+    return Message(**result["message"])
+
+
+async def asave_message(
+    thread_id: str,
+    role: str,
+    content: str,
+    metadata: dict = None,
+    user_id: str | None = None,
+) -> Message:
+    """Async version of save_message; waits for the DB writer off the event loop."""
+    title = None
+    if role == "user" and await aget_conversation_by_thread(thread_id) is None:
+        title = await agenerate_conversation_title(content)
+
+    result = await asyncio.to_thread(
+        submit_write,
+        "save_message",
+        thread_id=thread_id,
+        role=role,
+        content=content,
+        metadata=metadata,
+        user_id=user_id,
+        title=title,
+    )
+    cookware_service.remember_thread_owner(thread_id, result["owner"])
+    logger.debug(f"Saved {role} message to conversation {thread_id}")
+    return Message(**result["message"])
+
 
-        # Create message
-        message = Message(
+def write_message(
+    db: Session,
+    thread_id: str,
+    role: str,
+    content: str,
+    metadata: dict | None,
+    user_id: str | None,
+    title: str | None,
+) -> dict:
+    """Writer operation for save_message; runs inside the writer's transaction."""
+    # Get or create conversation
+    conv = db.query(Conversation).filter_by(thread_id=thread_id).first()
+    if not conv:
+        conv = Conversation(
             id=str(uuid.uuid4()),
-            conversation_id=conv.id,
             thread_id=thread_id,
-            role=role,
-            content=content,
-            message_metadata=metadata or {},
+            title=title or "New Conversation",
+            user_id=user_id,
         )
-        db.add(message)
+        db.add(conv)
+        db.flush()  # Get the ID and defaults without committing
+    else:
+        if conv.archived_at is not None:
+            # Continuing an archived conversation brings its history back first
+            conversation_archive.write_conversation_restore(db, thread_id)
+        if user_id and not conv.user_id:
+            conv.user_id = user_id
 
-        # Update conversation metadata
-        conv.message_count += 1
-        conv.updated_at = datetime.utcnow()
+    # Create message
+    message = Message(
+        id=str(uuid.uuid4()),
+        conversation_id=conv.id,
+        thread_id=thread_id,
+        role=role,
+        content=content,
+        message_metadata=metadata or {},
+        timestamp=datetime.utcnow(),
+    )
+    db.add(message)
 
-        db.commit()
-        db.refresh(message)
-        logger.debug(f"Saved {role} message to conversation {thread_id}")
-        return message
+    # Update conversation metadata
+    conv.message_count += 1
+    conv.updated_at = datetime.utcnow()
+
+    return {
+        "message": {
+            "id": message.id,
+            "conversation_id": message.conversation_id,
+            "thread_id": message.thread_id,
+            "role": message.role,
+            "content": message.content,
+            "timestamp": message.timestamp,
+            "message_metadata": message.message_metadata,
+        },
+        "owner": conv.user_id,
+    }
 
 
 def list_conversations(skip: int = 0, limit: int = 50) -> list[Conversation]:
@@ -98,35 +250,330 @@ def list_conversations(skip: int = 0, limit: int = 50) -> list[Conversation]:
         )
 
 
-def get_conversation_messages(thread_id: str) -> list[Message]:
-    """Fetch all messages for a conversation."""
-    with get_db() as db:
-        return (
-            db.query(Message).filter_by(thread_id=thread_id).order_by(Message.timestamp.asc()).all()
+async def alist_conversations(skip: int = 0, limit: int = 50) -> list[Conversation]:
+    """Async version of list_conversations."""
+    async with get_async_db() as db:
+        result = await db.scalars(
+            select(Conversation).order_by(Conversation.updated_at.desc()).offset(skip).limit(limit)
         )
+        return list(result)
 
 
-def delete_conversation(thread_id: str) -> bool:
-    """Delete a conversation and all its messages."""
+def get_conversation_messages(thread_id: str, rehydrate: bool = True) -> list[Message]:
+    """
+    Fetch all messages for a conversation.
+
+    An archived conversation is restored first, or with `rehydrate=False`
+    its messages are read from the archive and it stays archived.
+    """
+    query = select(Message).filter_by(thread_id=thread_id).order_by(Message.timestamp.asc())
+    with get_db() as db:
+        messages = list(db.scalars(query))
+    # Only a conversation without hot messages can be archived
+    if messages:
+        return messages
+    if not rehydrate:
+        return conversation_archive.archived_messages(thread_id)
+    if conversation_archive.rehydrate(thread_id):
+        with get_db() as db:
+            return list(db.scalars(query))
+    return []
+
+
+async def aget_conversation_messages(thread_id: str, rehydrate: bool = True) -> list[Message]:
+    """Async version of get_conversation_messages."""
+    query = select(Message).filter_by(thread_id=thread_id).order_by(Message.timestamp.asc())
+    async with get_async_db() as db:
+        messages = list(await db.scalars(query))
+    if messages:
+        return messages
+    if not rehydrate:
+        return await asyncio.to_thread(conversation_archive.archived_messages, thread_id)
+    if await conversation_archive.arehydrate(thread_id):
+        async with get_async_db() as db:
+            return list(await db.scalars(query))
+    return []
+
+
+def get_last_message(thread_id: str) -> Message | None:
+    """Newest message of a conversation; an archived one's is read without restoring it."""
+    query = select(Message).filter_by(thread_id=thread_id).order_by(Message.timestamp.desc())
     with get_db() as db:
-        conv = db.query(Conversation).filter_by(thread_id=thread_id).first()
-        if conv:
-            db.delete(conv)  # Cascade will delete messages
-            db.commit()
-            logger.info(f"Deleted conversation: {thread_id}")
-            return True
-        return False
+        message = db.scalars(query.limit(1)).first()
+    if message is not None:
+        return message
+    return conversation_archive.archived_last_message(thread_id)
+
+
+async def aget_last_message(thread_id: str) -> Message | None:
+    """Async version of get_last_message."""
+    query = select(Message).filter_by(thread_id=thread_id).order_by(Message.timestamp.desc())
+    async with get_async_db() as db:
+        message = (await db.scalars(query.limit(1))).first()
+    if message is not None:
+        return message
+    return await asyncio.to_thread(conversation_archive.archived_last_message, thread_id)
+
+
+def delete_conversation(thread_id: str) -> bool:
+    """Delete a conversation, its messages and its checkpoints."""
+    deleted = submit_write("delete_conversations", thread_ids=[thread_id])
+    _forget_threads(deleted)
+    if deleted:
+        logger.info(f"Deleted conversation: {thread_id}")
+    return bool(deleted)
+
+
+async def adelete_conversation(thread_id: str) -> bool:
+    """Async version of delete_conversation."""
+    deleted = await asyncio.to_thread(submit_write, "delete_conversations", thread_ids=[thread_id])
+    _forget_threads(deleted)
+    if deleted:
+        logger.info(f"Deleted conversation: {thread_id}")
+    return bool(deleted)
+
+
+async def adelete_conversations_older_than(cutoff: datetime) -> int:
+    """
+    Delete every conversation last updated before `cutoff` (naive UTC).
+
+    Conversations are deleted BULK_DELETE_BATCH at a time, one writer
+    transaction each, so other writes are never held up for the whole purge.
+
+    Returns:
+        Number of conversations deleted
+    """
+    total = 0
+    while True:
+        async with get_async_db() as db:
+            thread_ids = list(
+                await db.scalars(
+                    select(Conversation.thread_id)
+                    .where(Conversation.updated_at < cutoff)
+                    .limit(BULK_DELETE_BATCH)
+                )
+            )
+        if not thread_ids:
+            logger.info(f"Deleted {total} conversations last updated before {cutoff}")
+            return total
+        deleted = await asyncio.to_thread(
+            submit_write, "delete_conversations", thread_ids=thread_ids, updated_before=cutoff
+        )
+        _forget_threads(deleted)
+        total += len(deleted)
+
+
+def write_conversation_deletes(
+    db: Session, thread_ids: list[str], updated_before: datetime | None = None
+) -> list[str]:
+    """
+    Writer operation: delete conversations and their checkpoints, one statement each.
+
+    Messages are deleted by the database (ON DELETE CASCADE) without being
+    loaded. With `updated_before`, conversations updated since then are
+    kept. Returns the thread_ids deleted.
+    """
+    statement = delete(Conversation).where(Conversation.thread_id.in_(thread_ids))
+    if updated_before is not None:
+        statement = statement.where(Conversation.updated_at < updated_before)
+    deleted = list(
+        db.scalars(
+            statement.returning(Conversation.thread_id),
+            execution_options={"synchronize_session": False},
+        )
+    )
+    if deleted:
+        db.execute(
+            delete(Checkpoint).where(Checkpoint.thread_id.in_(deleted)),
+            execution_options={"synchronize_session": False},
+        )
+    return deleted
+
+
+def _forget_threads(thread_ids: list[str]) -> None:
+    for thread_id in thread_ids:
+        cookware_service.invalidate_thread(thread_id)
 
 
 def update_conversation_title(thread_id: str, title: str) -> Conversation | None:
     """Update a conversation's title."""
-    with get_db() as db:
-        conv = db.query(Conversation).filter_by(thread_id=thread_id).first()
-        if conv:
-            conv.title = title
-            conv.updated_at = datetime.utcnow()
-            db.commit()
-            db.refresh(conv)
-            logger.info(f"Updated conversation {thread_id} title to '{title}'")
-            return conv
+    row = submit_write("update_conversation_title", thread_id=thread_id, title=title)
+    if row is None:
+        return None
+    logger.info(f"Updated conversation {thread_id} title to '{title}'")
+    return Conversation(**row)
+
+
+def write_conversation_title(db: Session, thread_id: str, title: str) -> dict | None:
+    """Writer operation for update_conversation_title; None if there is no such conversation."""
+    conv = db.query(Conversation).filter_by(thread_id=thread_id).first()
+    if conv is None:
         return None
+    conv.title = title
+    conv.updated_at = datetime.utcnow()
+    db.flush()
+    return _conversation_row(conv)
+
+
+async def aupdate_conversation_title(thread_id: str, title: str) -> Conversation | None:
+    """Async version of update_conversation_title."""
+    row = await asyncio.to_thread(
+        submit_write, "update_conversation_title", thread_id=thread_id, title=title
+    )
+    if row is None:
+        return None
+    logger.info(f"Updated conversation {thread_id} title to '{title}'")
+    return Conversation(**row)
+
+
+def build_match_query(query: str) -> str | None:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word must match; the last one also matches as a prefix so results
+    update while the user is typing. Returns None if there are no words.
+    """
+    words = _SEARCH_TERM.findall(query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    # Single-character prefixes would expand to most of the vocabulary
+    if len(words[-1]) >= 2:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _rank_candidates(db: Session, table: str, match: str, user_id: str | None, count: int):
+    """
+    Top `count` (rowid, bm25 score, snippet) rows of an FTS table within the ranking window.
+
+    Also returns whether older matches fell outside the window.
+    """
+    joins, owner_filter = (_OWNER_JOINS[table], "AND c.user_id = :user_id") if user_id else ("", "")
+    params = {"match": match, "user_id": user_id, "window": SEARCH_RANK_WINDOW, "count": count}
+    # FTS5 walks matches in rowid (insertion) order without scoring them, so
+    # finding the oldest rowid in the window is cheap even for huge match sets.
+    # A second row means there are matches older than the window
+    edge = db.scalars(
+        text(f"""
+            SELECT {table}.rowid FROM {table} {joins}
+            WHERE {table} MATCH :match {owner_filter}
+            ORDER BY {table}.rowid DESC LIMIT 2 OFFSET :window - 1
+        """),
+        params,
+    ).all()
+    # Snippets are built here because FTS5 only computes them for emitted rows;
+    # re-matching by rowid later would re-read the whole match set
+    rows = db.execute(
+        text(f"""
+            SELECT {table}.rowid AS rowid, {table}.rank AS score,
+                snippet({table}, 0, '{SNIPPET_MARKERS[0]}', '{SNIPPET_MARKERS[1]}', '...',
+                    {SNIPPET_TOKENS}) AS snippet
+            FROM {table} {joins}
+            WHERE {table} MATCH :match AND {table}.rowid >= :floor {owner_filter}
+            ORDER BY {table}.rank LIMIT :count
+        """),
+        {**params, "floor": edge[0] if edge else 0},
+    ).all()
+    return rows, len(edge) > 1
+
+
+def search_conversations(
+    query: str, skip: int = 0, limit: int = 20, user_id: str | None = None
+) -> dict:
+    """
+    Full-text search over message contents and conversation titles.
+
+    Ranked by bm25 (best first) among the newest SEARCH_RANK_WINDOW matches
+    per table, so very common terms cost about as much as rare ones. Older
+    matches are not returned; "truncated" says whether there were any.
+
+    Args:
+        query: Free-text search query
+        skip: Number of results to skip
+        limit: Maximum number of results to return
+        user_id: Only search conversations owned by this user
+
+    Returns:
+        Dict with "results" (dicts with thread_id, conversation_id, title,
+        message_id, role, snippet, timestamp and score; message fields are
+        None for title matches) and "truncated".
+    """
+    match = build_match_query(query)
+    if match is None:
+        return {"results": [], "truncated": False}
+
+    with get_db() as db:
+        return _search(db, match, skip, limit, user_id)
+
+
+async def asearch_conversations(
+    query: str, skip: int = 0, limit: int = 20, user_id: str | None = None
+) -> dict:
+    """Async version of search_conversations."""
+    match = build_match_query(query)
+    if match is None:
+        return {"results": [], "truncated": False}
+
+    async with get_async_db() as db:
+        # The ranking queries are shared with the sync API
+        return await db.run_sync(_search, match, skip, limit, user_id)
+
+
+def _search(db: Session, match: str, skip: int, limit: int, user_id: str | None) -> dict:
+    """Run a search for an FTS5 `match` expression on an open session."""
+    messages, messages_truncated = _rank_candidates(
+        db, "messages_fts", match, user_id, skip + limit
+    )
+    titles, titles_truncated = _rank_candidates(
+        db, "conversations_fts", match, user_id, skip + limit
+    )
+    candidates = [("message", row.rowid, row.score, row.snippet) for row in messages]
+    candidates += [
+        ("title", row.rowid, row.score * TITLE_MATCH_WEIGHT, row.snippet) for row in titles
+    ]
+    page = sorted(candidates, key=lambda candidate: candidate[2])[skip : skip + limit]
+    message_rowids = ", ".join(str(rowid) for kind, rowid, *_ in page if kind == "message")
+    title_rowids = ", ".join(str(rowid) for kind, rowid, *_ in page if kind == "title")
+
+    details = {}
+    if message_rowids:
+        rows = db.execute(
+            text(f"""
+                SELECT m.rowid, m.id AS message_id, m.role, m.timestamp,
+                    c.id AS conversation_id, c.thread_id, c.title
+                FROM messages m JOIN conversations c ON c.id = m.conversation_id
+                WHERE m.rowid IN ({message_rowids})
+            """)
+        ).all()
+        details.update((("message", row.rowid), row) for row in rows)
+    if title_rowids:
+        rows = db.execute(
+            text(f"""
+                SELECT c.rowid, NULL AS message_id, NULL AS role, c.updated_at AS timestamp,
+                    c.id AS conversation_id, c.thread_id, c.title
+                FROM conversations c
+                WHERE c.rowid IN ({title_rowids})
+            """)
+        ).all()
+        details.update((("title", row.rowid), row) for row in rows)
+
+    results = []
+    for kind, rowid, score, snippet in page:
+        detail = details.get((kind, rowid))
+        if detail is None:  # Deleted between the two queries
+            continue
+        results.append(
+            {
+                "thread_id": detail.thread_id,
+                "conversation_id": detail.conversation_id,
+                "title": detail.title,
+                "message_id": detail.message_id,
+                "role": detail.role,
+                "snippet": snippet,
+                "timestamp": detail.timestamp,
+                # bm25 ranks are negative; expose a positive relevance score
+                "score": -score,
+            }
+        )
+    return {"results": results, "truncated": messages_truncated or titles_truncated}
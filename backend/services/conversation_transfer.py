@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import os
+from collections.abc import AsyncIterable, Iterator
+from datetime import UTC, datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.connection import engine
+from database.search_index import deferred_indexing
+from database.writer import submit_write
+from services.conversation_archive import archived_message_rows
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor (and sent as one chunk) at a time
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "2000"))
+
+# Rows inserted per import transaction
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "20000"))
+
+# SQLite page cache (KiB) while inserting an import batch; the random-UUID
+# primary key and thread indexes thrash the default 2 MB cache
+IMPORT_CACHE_KB = int(os.getenv("IMPORT_CACHE_KB", "65536"))
+
+CONVERSATION_COLUMNS = (
+    "id",
+    "thread_id",
+    "title",
+    "created_at",
+    "updated_at",
+    "message_count",
+    "user_id",
+)
+MESSAGE_COLUMNS = (
+    "id",
+    "conversation_id",
+    "thread_id",
+    "role",
+    "content",
+    "timestamp",
+    "message_metadata",
+)
+
+
+class InvalidImportError(ValueError):
+    """Raised when an import line is not a valid conversation or message record."""
+
+
+def _conversation_line(row) -> str:
+    return json.dumps({"type": "conversation", **dict(zip(CONVERSATION_COLUMNS, row, strict=True))})
+
+
+def _message_line(row) -> str:
+    record = dict(zip(MESSAGE_COLUMNS, row, strict=True))
+    metadata = record.pop("message_metadata")
+    # Exposed as 'metadata', like the conversations API
+    record["metadata"] = json.loads(metadata) if metadata else None
+    return json.dumps({"type": "message", **record})
+
+
+def export_ndjson() -> Iterator[str]:
+    """
+    Yield every conversation, then every message, as NDJSON chunks.
+
+    Rows are read through a server-side cursor EXPORT_BATCH_ROWS at a time
+    in rowid order, so memory use does not grow with the history and no
+    sort is needed. Messages of archived conversations follow, one archive
+    at a time. Timestamps are exported as stored (UTC).
+    """
+    with engine.connect() as conn:
+        streaming = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_ROWS)
+        for table, columns, to_line in (
+            ("conversations", CONVERSATION_COLUMNS, _conversation_line),
+            ("messages", MESSAGE_COLUMNS, _message_line),
+        ):
+            result = streaming.execute(
+                text(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid")
+            )
+            for rows in result.partitions():
+                yield "".join([to_line(row) + "\n" for row in rows])
+
+    lines = []
+    for row in archived_message_rows():
+        lines.append(_message_line(tuple(row[column] for column in MESSAGE_COLUMNS)) + "\n")
+        if len(lines) >= EXPORT_BATCH_ROWS:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def _timestamp(value: str | None) -> str | None:
+    """Normalize an ISO-8601 timestamp to the naive UTC format SQLAlchemy stores."""
+    if value is None or (len(value) == 26 and value[10] == " "):
+        return value  # Already in the stored format (as exported)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(UTC).replace(tzinfo=None)
+    return parsed.isoformat(sep=" ", timespec="microseconds")
+
+
+def _parse_rows(lines: list[bytes], first_line: int) -> tuple[list[tuple], list[tuple]]:
+    conversations, messages = [], []
+    for number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            kind = record.get("type")
+            if kind == "conversation":
+                conversations.append(
+                    (
+                        record["id"],
+                        record["thread_id"],
+                        record.get("title"),
+                        _timestamp(record.get("created_at")),
+                        _timestamp(record.get("updated_at")),
+                        record.get("message_count", 0),
+                        record.get("user_id"),
+                    )
+                )
+            elif kind == "message":
+                metadata = record.get("metadata")
+                messages.append(
+                    (
+                        record["id"],
+                        record["conversation_id"],
+                        record["thread_id"],
+                        record["role"],
+                        record["content"],
+                        _timestamp(record.get("timestamp")),
+                        json.dumps(metadata) if metadata is not None else None,
+                    )
+                )
+            else:
+                raise ValueError(f"unknown record type {kind!r}")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise InvalidImportError(f"Line {number}: {e!r}") from e
+    return conversations, messages
+
+
+def write_imported_rows(db: Session, conversations: list[tuple], messages: list[tuple]) -> dict:
+    """
+    Writer operation: bulk insert exported rows, skipping ids (and threads) that exist.
+
+    Returns the number of conversations and messages inserted.
+    """
+    # executemany on the DB-API connection, inside the writer's transaction
+    raw = db.connection().connection.driver_connection
+    cache_size = raw.execute("PRAGMA cache_size").fetchone()[0]
+    raw.execute(f"PRAGMA cache_size = -{IMPORT_CACHE_KB}")
+    try:
+        return _insert_rows(raw, conversations, messages)
+    finally:
+        raw.execute(f"PRAGMA cache_size = {cache_size}")
+
+
+def _insert_rows(raw, conversations: list[tuple], messages: list[tuple]) -> dict:
+    with deferred_indexing(raw):
+        inserted_conversations = raw.executemany(
+            f"INSERT OR IGNORE INTO conversations ({', '.join(CONVERSATION_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(CONVERSATION_COLUMNS))})",
+            conversations,
+        ).rowcount
+        # Messages of a skipped conversation (its thread exists under another
+        # id) are skipped too; they would violate the foreign key. So are an
+        # archived thread's: its messages live in the archive until restored.
+        inserted_messages = raw.executemany(
+            f"INSERT OR IGNORE INTO messages ({', '.join(MESSAGE_COLUMNS)}) "
+            f"SELECT {', '.join(f'?{i}' for i in range(1, len(MESSAGE_COLUMNS) + 1))} "
+            "WHERE EXISTS (SELECT 1 FROM conversations WHERE id = ?2) "
+            "AND NOT EXISTS (SELECT 1 FROM conversation_archives WHERE thread_id = ?3)",
+            messages,
+        ).rowcount
+    return {"conversations": inserted_conversations, "messages": inserted_messages}
+
+
+def import_lines(lines: list[bytes], first_line: int = 1) -> tuple[dict, int]:
+    """
+    Parse NDJSON lines and insert them in one transaction.
+
+    Returns the inserted counts and the number of records in `lines`.
+    """
+    return _write_rows(*_parse_rows(lines, first_line))
+
+
+def _write_rows(conversations: list[tuple], messages: list[tuple]) -> tuple[dict, int]:
+    inserted = submit_write("import_conversations", conversations=conversations, messages=messages)
+    return inserted, len(conversations) + len(messages)
+
+
+async def import_ndjson(chunks: AsyncIterable[bytes]) -> dict:
+    """
+    Import an NDJSON export streamed in arbitrary byte chunks.
+
+    Lines are committed IMPORT_BATCH_ROWS at a time. Each batch is parsed in
+    a worker thread while the previous one is being written, off the event
+    loop, and written only once the previous write has committed. Re-importing
+    is safe: existing rows, and messages of archived conversations, are skipped.
+
+    Returns:
+        Counts of conversations and messages inserted, and rows skipped
+
+    Raises:
+        InvalidImportError: On a malformed line; earlier batches stay imported
+    """
+    totals = {"conversations": 0, "messages": 0, "skipped": 0}
+    pending: list[bytes] = []
+    first_line = 1
+    buffer = b""
+    writing: asyncio.Task | None = None
+
+    async def finish_write():
+        nonlocal writing
+        if writing is None:
+            return
+        inserted, rows = await writing
+        writing = None
+        totals["conversations"] += inserted["conversations"]
+        totals["messages"] += inserted["messages"]
+        totals["skipped"] += rows - inserted["conversations"] - inserted["messages"]
+
+    async def flush():
+        nonlocal writing, pending, first_line
+        batch, batch_first_line = pending, first_line
+        first_line += len(pending)
+        pending = []
+        # Parse this batch while the previous one is still being written, but
+        # submit its write only after that one committed
+        parsing = asyncio.create_task(asyncio.to_thread(_parse_rows, batch, batch_first_line))
+        try:
+            await finish_write()
+        except BaseException:
+            await asyncio.gather(parsing, return_exceptions=True)
+            raise
+        conversations, messages = await parsing
+        writing = asyncio.create_task(asyncio.to_thread(_write_rows, conversations, messages))
+
+    try:
+        async for chunk in chunks:
+            lines = (buffer + chunk).split(b"\n")
+            buffer = lines.pop()
+            pending.extend(lines)
+            if len(pending) >= IMPORT_BATCH_ROWS:
+                await flush()
+        if buffer:
+            pending.append(buffer)
+        if pending:
+            await flush()
+        await finish_write()
+    finally:
+        if writing is not None:
+            # Let a failed import's last batch settle before reporting
+            await asyncio.gather(writing, return_exceptions=True)
+
+    logger.info(
+        f"Imported {totals['conversations']} conversations and {totals['messages']} messages "
+        f"({totals['skipped']} existing rows skipped)"
+    )
+    return totals
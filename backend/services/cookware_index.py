@@ -0,0 +1,182 @@
+import logging
+import re
+from collections import defaultdict
+from collections.abc import Iterable
+
+from constants.constants import AVAILABLE_COOKWARE, COOKWARE_SYNONYMS
+
+logger = logging.getLogger(__name__)
+
+# Minimum Dice similarity of character trigrams for a fuzzy match; the
+# edit distance must also be small for the name's length (see _max_edits)
+FUZZY_THRESHOLD = 0.5
+
+# Names shorter than this are too ambiguous to match fuzzily ("pan" vs "pot")
+FUZZY_MIN_LENGTH = 4
+
+# Upper bound on memoized fuzzy lookups (LLM output varies without limit)
+FUZZY_CACHE_SIZE = 10_000
+
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]+")
+_ACCENTS = str.maketrans("àáâäèéêëìíîïòóôöùúûü", "aaaaeeeeiiiioooouuuu")
+
+# Plurals that the suffix rules below would get wrong
+_IRREGULAR_PLURALS = {"knives": "knife", "dishes": "dish", "glasses": "glass"}
+
+
+def singularize(word: str) -> str:
+    """Best-effort English singular of a lowercase word."""
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes", "oes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")) and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def normalize(name: str) -> str:
+    """Lowercase, strip punctuation/accents and singularize the head noun."""
+    text = name.lower().translate(_ACCENTS).replace("'", "").replace("-", " ")
+    words = _NON_ALNUM.sub(" ", text).split()
+    if not words:
+        return ""
+    words[-1] = singularize(words[-1])
+    return " ".join(words)
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps cost 1), capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _max_edits(key: str) -> int:
+    return 2 if len(key) >= 8 else 1
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class CookwareVocabulary:
+    """
+    Alias -> canonical name map with a trigram/edit-distance fallback for typos.
+
+    Built once from COOKWARE_SYNONYMS; exact and alias lookups are a single
+    dict probe, and fuzzy results are memoized so repeated names stay O(1).
+    Names that match neither way fall back to their head noun, so modifiers
+    are ignored ("cast iron skillet" is a skillet).
+    """
+
+    def __init__(self, synonyms: dict[str, list[str]]):
+        self._aliases: dict[str, str] = {}
+        self._trigram_index: dict[str, set[str]] = defaultdict(set)
+        self._fuzzy_cache: dict[str, str] = {}
+
+        for canonical, aliases in synonyms.items():
+            canonical_key = normalize(canonical)
+            for alias in [canonical, *aliases]:
+                self._add(normalize(alias), canonical_key)
+
+    def _add(self, key: str, canonical_key: str) -> None:
+        if not key:
+            return
+        existing = self._aliases.get(key)
+        if existing and existing != canonical_key:
+            logger.warning(
+                f"Cookware alias '{key}' maps to both '{existing}' and '{canonical_key}'"
+            )
+            return
+        self._aliases[key] = canonical_key
+        for gram in _trigrams(key):
+            self._trigram_index[gram].add(key)
+
+    def canonical(self, name: str) -> str:
+        """Return the canonical key for a cookware name (itself if unknown)."""
+        key = normalize(name)
+        if key in self._aliases:
+            return self._aliases[key]
+        if key in self._fuzzy_cache:
+            return self._fuzzy_cache[key]
+
+        match = self._fuzzy_match(key)
+        canonical = self._aliases[match] if match else self._head_noun(key) or key
+        if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[key] = canonical
+        return canonical
+
+    def _fuzzy_match(self, key: str) -> str | None:
+        if len(key) < FUZZY_MIN_LENGTH:
+            return None
+
+        grams = _trigrams(key)
+        shared: dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                shared[candidate] += 1
+
+        # Trigram overlap finds candidates; a match also needs a small edit
+        # distance over the whole name, so typos ("wisk", "spatual") match but
+        # a shared word does not ("range hood" is not a "range")
+        best, best_score = None, 0.0
+        limit = _max_edits(key)
+        for candidate, overlap in shared.items():
+            if len(candidate) < FUZZY_MIN_LENGTH:
+                continue
+            score = 2 * overlap / (len(grams) + len(_trigrams(candidate)))
+            if score <= best_score or score < FUZZY_THRESHOLD:
+                continue
+            if _edit_distance(key, candidate, limit) <= limit:
+                best, best_score = candidate, score
+
+        if best:
+            logger.debug(f"Fuzzy cookware match: '{key}' -> '{best}' ({best_score:.2f})")
+        return best
+
+    def _head_noun(self, key: str) -> str | None:
+        """Canonical key of the longest known trailing phrase ("cast iron skillet" -> skillet)."""
+        words = key.split()
+        for start in range(1, len(words)):
+            canonical = self._aliases.get(" ".join(words[start:]))
+            if canonical:
+                return canonical
+        return None
+
+
+class CookwareIndex:
+    """A kitchen inventory resolved to canonical names for O(1) membership checks."""
+
+    def __init__(self, inventory: Iterable[str], vocabulary: "CookwareVocabulary | None" = None):
+        self.vocabulary = vocabulary or cookware_vocabulary
+        self.items = list(inventory)
+        self._available = frozenset(self.vocabulary.canonical(item) for item in self.items)
+
+    def has(self, name: str) -> bool:
+        return self.vocabulary.canonical(name) in self._available
+
+    def find_missing(self, required: Iterable[str]) -> list[str]:
+        """Return the required items (as given) that the inventory lacks."""
+        return [item for item in required if not self.has(item)]
+
+
+# Built once at import; shared by every inventory
+cookware_vocabulary = CookwareVocabulary(COOKWARE_SYNONYMS)
+default_cookware_index = CookwareIndex(AVAILABLE_COOKWARE)
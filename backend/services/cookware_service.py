@@ -0,0 +1,167 @@
+import logging
+import os
+from functools import lru_cache
+
+from sqlalchemy.orm import Session
+
+from constants.constants import AVAILABLE_COOKWARE
+from database.connection import get_db
+from database.models import Conversation, UserCookware
+from database.writer import submit_write
+from services.cookware_index import CookwareIndex, default_cookware_index
+from services.shared_state import SharedCache
+
+logger = logging.getLogger(__name__)
+
+# thread_id -> owner user_id ("" if anonymous) and user_id -> inventory items,
+# kept in the shared cache tier so an update on one worker is seen by all.
+# Repeat turns on a thread resolve the inventory without touching the DB.
+_owner_cache = SharedCache("thread_owner")
+_inventory_cache = SharedCache("cookware_inventory")
+
+# Updates through this service invalidate the cache right away; the TTL bounds
+# how long a change made any other way (e.g. directly in the DB) goes unseen
+COOKWARE_CACHE_TTL = float(os.getenv("COOKWARE_CACHE_TTL_SECONDS", "300"))
+
+
+@lru_cache(maxsize=1024)
+def _build_index(items: tuple[str, ...]) -> CookwareIndex:
+    """Per-process memo: an index depends only on the item list."""
+    return CookwareIndex(items) if items else default_cookware_index
+
+
+def get_user_cookware(user_id: str) -> list[str]:
+    """Fetch a user's stored cookware names (empty if none configured)."""
+    with get_db() as db:
+        return _stored_cookware(db, user_id)
+
+
+def _unique_names(items: list[str]) -> list[str]:
+    """Drop blanks and case-insensitive duplicates, keeping the first spelling."""
+    unique, seen = [], set()
+    for item in items:
+        name = item.strip()
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            unique.append(name)
+    return unique
+
+
+def _stored_cookware(db: Session, user_id: str) -> list[str]:
+    rows = (
+        db.query(UserCookware.name)
+        .filter_by(user_id=user_id)
+        .order_by(UserCookware.created_at.asc())
+        .all()
+    )
+    return [row.name for row in rows]
+
+
+def write_user_cookware(db: Session, user_id: str, items: list[str]) -> list[str]:
+    """Writer operation: replace a user's inventory; returns the stored items."""
+    unique = _unique_names(items)
+    db.query(UserCookware).filter_by(user_id=user_id).delete(synchronize_session=False)
+    db.add_all(UserCookware(user_id=user_id, name=name) for name in unique)
+    db.flush()
+    return unique
+
+
+def write_cookware_addition(db: Session, user_id: str, name: str) -> list[str]:
+    """Writer operation: add one item unless already present; returns the inventory."""
+    items = _stored_cookware(db, user_id)
+    name = name.strip()
+    if name and name.lower() not in {item.lower() for item in items}:
+        db.add(UserCookware(user_id=user_id, name=name))
+        db.flush()
+        items.append(name)
+    return items
+
+
+def write_cookware_removal(db: Session, user_id: str, name: str) -> list[str] | None:
+    """
+    Writer operation: remove one item (case-insensitive).
+
+    Returns the remaining inventory, or None if the item was not present.
+    """
+    items = _stored_cookware(db, user_id)
+    matches = [item for item in items if item.lower() == name.strip().lower()]
+    if not matches:
+        return None
+    db.query(UserCookware).filter(
+        UserCookware.user_id == user_id, UserCookware.name.in_(matches)
+    ).delete(synchronize_session=False)
+    return [item for item in items if item not in matches]
+
+
+def set_user_cookware(user_id: str, items: list[str]) -> list[str]:
+    """Replace a user's inventory. An empty list reverts to the default inventory."""
+    unique = submit_write("set_user_cookware", user_id=user_id, items=list(items))
+    invalidate_user(user_id)
+    logger.info(f"Set cookware for user {user_id}: {unique}")
+    return unique
+
+
+def add_user_cookware(user_id: str, name: str) -> list[str]:
+    """Add one item to a user's inventory (no-op if already present)."""
+    items = submit_write("add_user_cookware", user_id=user_id, name=name)
+    invalidate_user(user_id)
+    return items
+
+
+def remove_user_cookware(user_id: str, name: str) -> bool:
+    """Remove one item (case-insensitive). Returns False if it was not present."""
+    if submit_write("remove_user_cookware", user_id=user_id, name=name) is None:
+        return False
+    invalidate_user(user_id)
+    return True
+
+
+def get_effective_cookware(user_id: str | None) -> list[str]:
+    """The inventory used for cookware checks: the user's, else the default."""
+    items = get_user_cookware(user_id) if user_id else []
+    return items or list(AVAILABLE_COOKWARE)
+
+
+def get_cookware_index(user_id: str | None) -> CookwareIndex:
+    """Return the cached cookware index for a user, building it on first use."""
+    if not user_id:
+        return default_cookware_index
+
+    items = _inventory_cache.get(user_id)
+    if items is None:
+        items = tuple(get_user_cookware(user_id))
+        _inventory_cache.set(user_id, items, COOKWARE_CACHE_TTL)
+    return _build_index(items)
+
+
+def get_thread_owner(thread_id: str) -> str | None:
+    """Return the user who owns a thread, cached after the first lookup."""
+    owner = _owner_cache.get(thread_id)
+    if owner is None:
+        with get_db() as db:
+            row = db.query(Conversation.user_id).filter_by(thread_id=thread_id).first()
+        owner = row.user_id if row and row.user_id else ""
+        _owner_cache.set(thread_id, owner, COOKWARE_CACHE_TTL)
+    return owner or None
+
+
+def get_thread_cookware_index(thread_id: str | None) -> CookwareIndex:
+    """Resolve the cookware index for the owner of a thread."""
+    if not thread_id:
+        return default_cookware_index
+    return get_cookware_index(get_thread_owner(thread_id))
+
+
+def remember_thread_owner(thread_id: str, user_id: str | None) -> None:
+    """Record a thread's owner (called when ownership is assigned)."""
+    _owner_cache.set(thread_id, user_id or "", COOKWARE_CACHE_TTL)
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop a user's cached inventory after it changes."""
+    _inventory_cache.delete(user_id)
+
+
+def invalidate_thread(thread_id: str) -> None:
+    """Drop a thread's cached owner (e.g. after the conversation is deleted)."""
+    _owner_cache.delete(thread_id)
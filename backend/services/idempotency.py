@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from pydantic import BaseModel
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database.connection import get_db
+from database.models import IdempotencyKey
+from database.writer import submit_write
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# How long a completed request's result is returned for retries with its key
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# A running request's key expires after this, so a crashed worker cannot
+# leave it pending forever
+IDEMPOTENCY_RUNNING_TTL = float(os.getenv("IDEMPOTENCY_RUNNING_TTL_SECONDS", "600"))
+
+# How long a duplicate waits for the in-flight original before a 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT_SECONDS", "120"))
+
+# How often a duplicate of a request running on another worker checks for its result
+IDEMPOTENCY_POLL_INTERVAL = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "0.25"))
+
+RUNNING = "running"
+COMPLETED = "completed"
+
+
+class IdempotencyConflictError(ValueError):
+    """Raised when an Idempotency-Key is reused with a different request body."""
+
+
+class IdempotencyPendingError(RuntimeError):
+    """Raised when the original request did not complete (in time) for a duplicate."""
+
+
+def request_fingerprint(payload: BaseModel) -> str:
+    """Hash of the fields the client actually sent (defaults such as a fresh thread_id excluded)."""
+    body = json.dumps(payload.model_dump(exclude_unset=True), sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _snapshot(record: IdempotencyKey) -> dict:
+    return {
+        "owner": record.owner,
+        "fingerprint": record.fingerprint,
+        "status": record.status,
+        "turn_id": record.turn_id,
+        "response": record.response,
+    }
+
+
+def claim_idempotency_key(
+    db: Session, key: str, fingerprint: str, owner: str, turn_id: str | None, ttl: float
+) -> dict:
+    """
+    Writer operation: start executing the request for `key` unless it is already taken.
+
+    Expired keys are reclaimed (and purged). Returns the key's record; its
+    owner is `owner` if the caller should execute the request.
+    """
+    now = datetime.utcnow()
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at < now, IdempotencyKey.key != key
+    ).delete(synchronize_session=False)
+    values = {
+        "key": key,
+        "fingerprint": fingerprint,
+        "owner": owner,
+        "status": RUNNING,
+        "turn_id": turn_id,
+        "response": None,
+        "expires_at": now + timedelta(seconds=ttl),
+    }
+    statement = insert(IdempotencyKey).values(values)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[IdempotencyKey.key],
+            set_={name: statement.excluded[name] for name in values if name != "key"},
+            where=IdempotencyKey.expires_at < now,
+        )
+    )
+    return _snapshot(db.get(IdempotencyKey, key, populate_existing=True))
+
+
+def complete_idempotency_key(db: Session, key: str, owner: str, response: dict, ttl: float) -> None:
+    """Writer operation: store the result for retries to return."""
+    db.query(IdempotencyKey).filter_by(key=key, owner=owner).update(
+        {
+            "status": COMPLETED,
+            "response": response,
+            "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+        },
+        synchronize_session=False,
+    )
+
+
+def release_idempotency_key(db: Session, key: str, owner: str) -> None:
+    """Writer operation: forget a key whose request failed, so a retry runs it again."""
+    db.query(IdempotencyKey).filter_by(key=key, owner=owner).delete(synchronize_session=False)
+
+
+def _load(key: str) -> dict | None:
+    with get_db() as db:
+        record = db.get(IdempotencyKey, key)
+        if record is None or record.expires_at < datetime.utcnow():
+            return None
+        return _snapshot(record)
+
+
+class IdempotentRequest:
+    """
+    One request carrying an Idempotency-Key.
+
+    Exactly one request per key is the owner: it executes and then calls
+    finish(). Any other request with the key gets the owner's result, either
+    at once (`result` is set) or by awaiting wait().
+    """
+
+    def __init__(self, keys: "IdempotencyKeys", key: str, owner: str, record: dict):
+        self.key = key
+        self.owner = owner
+        self.original_owner = record["owner"]  # Token of the run executing the request
+        self.is_owner = self.original_owner == owner
+        self.turn_id = record["turn_id"]
+        self.result: dict | None = record["response"] if record["status"] == COMPLETED else None
+        self._keys = keys
+        self._finished = False
+
+    async def finish(self, result: dict | None) -> None:
+        """
+        Store the owner's result, or release the key if the request failed
+        (result None) so that a retry runs it again. Idempotent.
+        """
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            if result is not None:
+                await asyncio.to_thread(
+                    submit_write,
+                    "complete_idempotency_key",
+                    key=self.key,
+                    owner=self.owner,
+                    response=result,
+                    ttl=IDEMPOTENCY_TTL,
+                )
+            else:
+                await asyncio.to_thread(
+                    submit_write, "release_idempotency_key", key=self.key, owner=self.owner
+                )
+        except Exception as e:
+            logger.warning(f"Could not update idempotency key {self.key}: {e}")
+        finally:
+            self._keys._settle(self.key, result)
+
+    async def wait(self, timeout: float = IDEMPOTENCY_WAIT_TIMEOUT) -> dict:
+        """
+        Wait for the in-flight original and return its result.
+
+        Raises:
+            IdempotencyPendingError: If it failed or did not finish within `timeout`
+        """
+        if self.result is not None:
+            return self.result
+        future = self._keys._inflight.get(self.key)
+        try:
+            if future is not None:
+                result = await asyncio.wait_for(asyncio.shield(future), timeout)
+            else:
+                result = await self._poll(timeout)
+        except TimeoutError as e:
+            raise IdempotencyPendingError(
+                f"The original request with key {self.key} is still running"
+            ) from e
+        if result is None:
+            raise IdempotencyPendingError(f"The original request with key {self.key} failed")
+        return result
+
+    async def _poll(self, timeout: float) -> dict | None:
+        """Wait for a request running on another worker to store its result."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+            record = await asyncio.to_thread(_load, self.key)
+            if record is None or record["owner"] != self.original_owner:
+                return None
+            if record["status"] == COMPLETED:
+                return record["response"]
+        raise TimeoutError
+
+
+class IdempotencyKeys:
+    """
+    Deduplicates requests by Idempotency-Key.
+
+    Keys live in the idempotency_keys table, claimed through the single DB
+    writer, so retries on any worker find the original. Completed results
+    are read back by primary key without running anything; duplicates of a
+    request still in flight wait on it (through a local future in the same
+    worker, by polling the table otherwise) instead of starting another run.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def begin(
+        self, key: str, fingerprint: str, turn_id: str | None = None
+    ) -> IdempotentRequest:
+        """
+        Claim `key` for this request or find the request that already has it.
+
+        Raises:
+            IdempotencyConflictError: If the key was used with a different request
+        """
+        owner = uuid.uuid4().hex
+        record = await asyncio.to_thread(_load, key)
+        if record is None or record["status"] != COMPLETED:
+            record = await asyncio.to_thread(
+                submit_write,
+                "claim_idempotency_key",
+                key=key,
+                fingerprint=fingerprint,
+                owner=owner,
+                turn_id=turn_id,
+                ttl=IDEMPOTENCY_RUNNING_TTL,
+            )
+        if record["fingerprint"] != fingerprint:
+            metrics.increment("idempotency.conflicts")
+            raise IdempotencyConflictError(
+                f"Idempotency-Key {key} was already used with a different request"
+            )
+
+        request = IdempotentRequest(self, key, owner, record)
+        if request.is_owner:
+            self._inflight[key] = asyncio.get_running_loop().create_future()
+            metrics.increment("idempotency.executed")
+        elif request.result is not None:
+            metrics.increment("idempotency.replayed")
+        else:
+            metrics.increment("idempotency.attached")
+        return request
+
+    def _settle(self, key: str, result: dict | None) -> None:
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+
+idempotency_keys = IdempotencyKeys()
@@ -0,0 +1,75 @@
+import logging
+import threading
+
+from services.metrics import metrics
+from services.resilience import LLM_TIMEOUT, TITLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Chat model settings per use; clients are created on first use and reused so
+# their HTTP connection pools stay warm across requests.
+CHAT_MODEL_CONFIGS = {
+    "classifier": {"model": "gpt-4o-mini", "temperature": 0, "timeout": LLM_TIMEOUT},
+    "response": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.5,
+        "max_tokens": 300,
+        "timeout": LLM_TIMEOUT,
+    },
+    "title": {
+        "model": "gpt-4o-mini",
+        "temperature": 0.5,
+        "max_tokens": 20,
+        "timeout": TITLE_TIMEOUT,
+    },
+}
+
+_clients: dict = {}
+_lock = threading.Lock()
+
+
+def get_chat_model(name: str):
+    """
+    Return the shared ChatOpenAI client for a configured use.
+
+    langchain_openai is imported here rather than at module import so the
+    API can start serving before the OpenAI stack has been loaded.
+
+    Args:
+        name: Key in CHAT_MODEL_CONFIGS ("classifier", "response" or "title")
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                from langchain_openai import ChatOpenAI
+
+                # Retries are handled by services.resilience, not the SDK
+                client = ChatOpenAI(max_retries=0, **CHAT_MODEL_CONFIGS[name])
+                _clients[name] = client
+                logger.info(f"Initialized chat model '{name}'")
+    return client
+
+
+def is_initialized() -> bool:
+    """True once every configured chat model has been created."""
+    return all(name in _clients for name in CHAT_MODEL_CONFIGS)
+
+
+def record_usage(name: str, message):
+    """
+    Count a chat completion's token usage under `llm.<name>.*` metrics.
+
+    cached_input_tokens is the part of the prompt the provider served from
+    its prefix cache; compare it with input_tokens for the cache hit rate.
+    Returns the message unchanged so it can sit inside a chain.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        metrics.increment(f"llm.{name}.calls")
+        metrics.increment(f"llm.{name}.input_tokens", usage.get("input_tokens", 0))
+        metrics.increment(f"llm.{name}.cached_input_tokens", cached)
+        metrics.increment(f"llm.{name}.output_tokens", usage.get("output_tokens", 0))
+    return message
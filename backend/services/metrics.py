@@ -0,0 +1,68 @@
+import threading
+from collections import defaultdict
+from collections.abc import Callable
+
+
+class Metrics:
+    """
+    Thread-safe in-process metrics registry.
+
+    Counters only go up, gauges hold the latest value, and observations keep
+    a count/sum/max summary. Collectors are callables polled at snapshot
+    time for values that are cheaper to read on demand than to push.
+    """
+
+    def __init__(self):
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._observations: dict[str, dict[str, float]] = {}
+        self._collectors: list[Callable[[], dict]] = []
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def add_gauge(self, name: str, delta: float) -> None:
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+
+    def register_collector(self, collector: Callable[[], dict]) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable copy of all metrics."""
+        with self._lock:
+            gauges = dict(self._gauges)
+            collectors = list(self._collectors)
+            snapshot = {
+                "counters": dict(self._counters),
+                "gauges": gauges,
+                "observations": {name: dict(s) for name, s in self._observations.items()},
+            }
+        for collector in collectors:
+            gauges.update(collector())
+        return snapshot
+
+    def reset(self) -> None:
+        """Clear recorded values (collectors stay registered)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._observations.clear()
+
+
+# Create singleton instance
+metrics = Metrics()
@@ -0,0 +1,429 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent import futures
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+import aiohttp
+import httpx
+import openai
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP status codes that will not succeed on retry
+NON_RETRYABLE_STATUS_CODES = {400, 401, 403, 404, 422}
+
+# Errors raised when the upstream could not be reached or did not answer in time
+TRANSPORT_ERRORS = (
+    OSError,  # Includes TimeoutError, ConnectionError and requests' errors
+    httpx.TransportError,
+    openai.APIConnectionError,
+    aiohttp.ClientConnectionError,
+)
+
+# The Tavily client reports HTTP errors only in the message ("Error 503: ...")
+_MESSAGE_STATUS = re.compile(r"^Error (\d{3})\b")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because its circuit breaker is open."""
+
+
+class UpstreamTimeoutError(TimeoutError):
+    """Raised when an upstream call misses its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker shared by every caller of one upstream.
+
+    CLOSED: calls flow normally. After `failure_threshold` consecutive failures
+    the breaker trips to OPEN and rejects calls for `recovery_timeout` seconds.
+    It then moves to HALF_OPEN and lets a single probe through; a successful
+    probe closes the breaker again, a failed one re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._recovery_elapsed():
+                return self.HALF_OPEN
+            return self._state
+
+    def _recovery_elapsed(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.recovery_timeout
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed right now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._recovery_elapsed():
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """End a call that says nothing about upstream health, so another may probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(
+                        f"Circuit '{self.name}' opened after {self._failures} failure(s)"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    """
+    Timeout and retry policy for one kind of upstream call.
+
+    Attributes:
+        timeout: Deadline in seconds for a single attempt
+        deadline: Overall deadline in seconds across all attempts and backoff
+        max_attempts: Total number of attempts (1 disables retries)
+        backoff_base: Base delay in seconds for exponential backoff
+        backoff_max: Upper bound on a single backoff delay
+        hedge_after: If set, start a second identical request when the first
+            has not finished after this many seconds and take whichever wins
+    """
+
+    timeout: float = 30.0
+    deadline: float | None = None
+    max_attempts: int = 3
+    backoff_base: float = 0.25
+    backoff_max: float = 4.0
+    hedge_after: float | None = None
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay before retry number `attempt`."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2**attempt)))
+
+
+def _status_code(exc: BaseException) -> int | None:
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    if status_code is None:
+        match = _MESSAGE_STATUS.match(str(exc))
+        status_code = int(match[1]) if match else None
+    return status_code
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return False for errors that a retry cannot fix (bad request, auth, ...)."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    return _status_code(exc) not in NON_RETRYABLE_STATUS_CODES
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """
+    Return True for errors that say the upstream is unhealthy: timeouts,
+    connection errors, 5xx and 429. Client errors (4xx) and errors raised on
+    our side, such as an unparseable answer, do not count.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, TRANSPORT_ERRORS):
+        return True
+    status_code = _status_code(exc)
+    return status_code is not None and (status_code >= 500 or status_code == 429)
+
+
+_executor: futures.ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> futures.ThreadPoolExecutor:
+    """Shared pool that runs sync upstream calls so they can be given a deadline."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = futures.ThreadPoolExecutor(
+                    max_workers=int(os.getenv("UPSTREAM_MAX_THREADS", "32")),
+                    thread_name_prefix="upstream",
+                )
+    return _executor
+
+
+class ResilientCaller:
+    """
+    Wraps upstream calls with per-attempt timeouts, jittered retries,
+    optional request hedging and a circuit breaker.
+
+    Use `call` from sync code and `acall` from async code. The breaker is
+    consulted once per call and told its outcome once, after any retries;
+    only upstream failures (see `is_upstream_failure`) count against it.
+    """
+
+    def __init__(self, name: str, policy: CallPolicy, breaker: CircuitBreaker | None = None):
+        self.name = name
+        self.policy = policy
+        self.breaker = breaker
+
+    def _check_breaker(self) -> None:
+        if self.breaker and not self.breaker.allow_request():
+            metrics.increment(f"circuit.{self.breaker.name}.rejected")
+            raise CircuitOpenError(f"Circuit '{self.breaker.name}' is open; skipping {self.name}")
+
+    def _record(self, error: BaseException | None) -> None:
+        """Report a call's outcome (None for success) to the breaker."""
+        if not self.breaker:
+            return
+        if error is None:
+            self.breaker.record_success()
+        elif is_upstream_failure(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release_probe()
+
+    def _attempt_timeout(self, started: float) -> float:
+        """Time available to the next attempt, bounded by the overall deadline."""
+        if self.policy.deadline is None:
+            return self.policy.timeout
+        remaining = self.policy.deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            raise UpstreamTimeoutError(f"{self.name} exceeded its {self.policy.deadline}s deadline")
+        return min(self.policy.timeout, remaining)
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a sync callable under this caller's policy."""
+        self._check_breaker()
+        try:
+            result = self._call_with_retries(fn, args, kwargs)
+        except BaseException as e:
+            self._record(e)
+            raise
+        self._record(None)
+        return result
+
+    def _call_with_retries(self, fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+        started = time.monotonic()
+        last_error: BaseException | None = None
+
+        for attempt in range(self.policy.max_attempts):
+            timeout = self._attempt_timeout(started)
+            try:
+                return self._run_attempt(fn, args, kwargs, timeout)
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e) or attempt == self.policy.max_attempts - 1:
+                    break
+                delay = self.policy.backoff(attempt)
+                logger.warning(
+                    f"{self.name} attempt {attempt + 1} failed ({e!r}); retrying in {delay:.2f}s"
+                )
+                time.sleep(delay)
+
+        raise last_error
+
+    def _run_attempt(self, fn: Callable[..., T], args: tuple, kwargs: dict, timeout: float) -> T:
+        executor = _get_executor()
+        primary = executor.submit(fn, *args, **kwargs)
+        pending = {primary}
+
+        hedge_after = self.policy.hedge_after
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = futures.wait(pending, timeout=hedge_after)
+            if not done:
+                logger.info(f"{self.name}: hedging slow request after {hedge_after}s")
+                pending.add(executor.submit(fn, *args, **kwargs))
+            timeout -= hedge_after
+
+        deadline = time.monotonic() + timeout
+        error: BaseException | None = None
+        while pending:
+            done, pending = futures.wait(
+                pending,
+                timeout=max(0.0, deadline - time.monotonic()),
+                return_when=futures.FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+        raise UpstreamTimeoutError(f"{self.name} timed out after {self.policy.timeout}s")
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Run an async callable under this caller's policy."""
+        self._check_breaker()
+        try:
+            result = await self._acall_with_retries(fn, args, kwargs)
+        except BaseException as e:  # Including cancellation, which frees a probe
+            self._record(e)
+            raise
+        self._record(None)
+        return result
+
+    async def _acall_with_retries(
+        self, fn: Callable[..., Awaitable[T]], args: tuple, kwargs: dict
+    ) -> T:
+        started = time.monotonic()
+        last_error: BaseException | None = None
+
+        for attempt in range(self.policy.max_attempts):
+            timeout = self._attempt_timeout(started)
+            try:
+                return await self._arun_attempt(fn, args, kwargs, timeout)
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e) or attempt == self.policy.max_attempts - 1:
+                    break
+                delay = self.policy.backoff(attempt)
+                logger.warning(
+                    f"{self.name} attempt {attempt + 1} failed ({e!r}); retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+        raise last_error
+
+    async def _arun_attempt(
+        self, fn: Callable[..., Awaitable[T]], args: tuple, kwargs: dict, timeout: float
+    ) -> T:
+        tasks = {asyncio.ensure_future(fn(*args, **kwargs))}
+        try:
+            hedge_after = self.policy.hedge_after
+            if hedge_after is not None and hedge_after < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    logger.info(f"{self.name}: hedging slow request after {hedge_after}s")
+                    tasks.add(asyncio.ensure_future(fn(*args, **kwargs)))
+                timeout -= hedge_after
+
+            deadline = time.monotonic() + timeout
+            error: BaseException | None = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+            if error is not None and not pending:
+                raise error
+            raise UpstreamTimeoutError(f"{self.name} timed out after {self.policy.timeout}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+def _env_float(name: str, default: float | None) -> float | None:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return float(value)
+
+
+# Upstream timeouts (seconds); also passed to the HTTP clients so abandoned
+# attempts release their worker thread instead of hanging indefinitely.
+LLM_TIMEOUT = _env_float("LLM_TIMEOUT_SECONDS", 20.0)
+SEARCH_TIMEOUT = _env_float("SEARCH_TIMEOUT_SECONDS", 8.0)
+TITLE_TIMEOUT = _env_float("TITLE_TIMEOUT_SECONDS", 5.0)
+
+# Breakers are shared per upstream so every node sees the same health signal
+openai_breaker = CircuitBreaker(
+    "openai",
+    failure_threshold=int(os.getenv("OPENAI_BREAKER_THRESHOLD", "5")),
+    recovery_timeout=_env_float("OPENAI_BREAKER_RECOVERY_SECONDS", 30.0),
+)
+tavily_breaker = CircuitBreaker(
+    "tavily",
+    failure_threshold=int(os.getenv("TAVILY_BREAKER_THRESHOLD", "3")),
+    recovery_timeout=_env_float("TAVILY_BREAKER_RECOVERY_SECONDS", 60.0),
+)
+
+llm_caller = ResilientCaller(
+    "llm",
+    CallPolicy(
+        timeout=LLM_TIMEOUT,
+        deadline=_env_float("LLM_DEADLINE_SECONDS", 45.0),
+        max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+        hedge_after=_env_float("LLM_HEDGE_AFTER_SECONDS", None),
+    ),
+    breaker=openai_breaker,
+)
+title_caller = ResilientCaller(
+    "title",
+    CallPolicy(timeout=TITLE_TIMEOUT, deadline=TITLE_TIMEOUT, max_attempts=1),
+    breaker=openai_breaker,
+)
+search_caller = ResilientCaller(
+    "search",
+    CallPolicy(
+        timeout=SEARCH_TIMEOUT,
+        deadline=_env_float("SEARCH_DEADLINE_SECONDS", 15.0),
+        max_attempts=int(os.getenv("SEARCH_MAX_ATTEMPTS", "2")),
+        hedge_after=_env_float("SEARCH_HEDGE_AFTER_SECONDS", None),
+    ),
+    breaker=tavily_breaker,
+)
+
+
+def _breaker_states() -> dict:
+    return {
+        f"circuit.{breaker.name}.open": int(breaker.state != CircuitBreaker.CLOSED)
+        for breaker in (openai_breaker, tavily_breaker)
+    }
+
+
+metrics.register_collector(_breaker_states)
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+from services.metrics import metrics
+from services.shared_state import SharedCache
+from services.single_flight import normalize_key
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+
+# How long a generated answer is reused; entries are also evicted LRU-first
+# with the rest of the shared cache tier (SHARED_CACHE_SIZE)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+# Query types whose answer is determined by the classification, search
+# context and cookware check; general questions depend on their exact wording
+CACHEABLE_QUERY_TYPES = ("recipe_request", "ingredient_query")
+
+_responses = SharedCache("response")
+
+
+def _sorted_names(names: list[str] | None) -> tuple[str, ...]:
+    return tuple(sorted(normalize_key(*(names or []))))
+
+
+def response_cache_key(state: dict) -> tuple | None:
+    """
+    Cache key for the response to this turn, or None if it must be generated.
+
+    Only first turns are cacheable: with earlier messages the answer may
+    refer back to them. The key is (query_type, dish, sorted ingredients,
+    sorted required and missing cookware, search context hash).
+    """
+    if not RESPONSE_CACHE_ENABLED or state.get("query_type") not in CACHEABLE_QUERY_TYPES:
+        return None
+    # The classifier has already appended the current query
+    if len(state.get("messages") or []) > 1:
+        return None
+
+    search_context = state.get("search_context") or ""
+    return (
+        state["query_type"],
+        normalize_key(state.get("dish") or "")[0],
+        _sorted_names(state.get("ingredients")),
+        _sorted_names(state.get("required_cookware")),
+        _sorted_names(state.get("missing_cookware")),
+        hashlib.sha1(search_context.encode()).hexdigest(),
+    )
+
+
+def get_cached_response(key: tuple | None) -> str | None:
+    """Return the stored response for a key from response_cache_key, if any."""
+    if key is None:
+        return None
+    try:
+        response = _responses.get(key)
+    except Exception as e:
+        logger.warning(f"Response cache unavailable: {e}")
+        return None
+    metrics.increment("response_cache.hits" if response is not None else "response_cache.misses")
+    return response
+
+
+def cache_response(key: tuple | None, response: str) -> None:
+    """Store a generated response under a key from response_cache_key."""
+    if key is None or not response:
+        return
+    try:
+        _responses.set(key, response, ttl=RESPONSE_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Could not cache response: {e}")
+
+
+async def aget_cached_response(key: tuple | None) -> str | None:
+    """
+    Async get_cached_response. In multi-worker mode the lookup is a blocking
+    call to the shared state server, so it runs off the event loop.
+    """
+    if key is None:
+        return None
+    return await asyncio.to_thread(get_cached_response, key)
+
+
+async def acache_response(key: tuple | None, response: str) -> None:
+    """Async cache_response; the store runs off the event loop."""
+    if key is None or not response:
+        return
+    await asyncio.to_thread(cache_response, key, response)
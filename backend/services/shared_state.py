@@ -0,0 +1,166 @@
+import logging
+import multiprocessing
+import os
+import secrets
+import tempfile
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Any
+
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_SIZE = int(os.getenv("SHARED_CACHE_SIZE", "100000"))
+
+ADDRESS_ENV = "SHARED_STATE_ADDRESS"
+AUTHKEY_ENV = "SHARED_STATE_AUTHKEY"
+
+
+class SharedStateManager(BaseManager):
+    """
+    Manager exposing the cache store and DB writer over a local Unix socket.
+
+    Single-process mode (the default) keeps both in-process. In multi-worker
+    mode the gunicorn master starts one server process owning the cache and
+    the DbWriter (see gunicorn.conf.py); workers find it through
+    SHARED_STATE_ADDRESS and SHARED_STATE_AUTHKEY in their environment.
+    """
+
+
+_server_cache: LRUCache | None = None
+_server_writer = None
+
+
+def _get_server_cache() -> LRUCache:
+    return _server_cache
+
+
+def _get_server_writer():
+    return _server_writer
+
+
+SharedStateManager.register("get_cache", callable=_get_server_cache)
+SharedStateManager.register("get_writer", callable=_get_server_writer)
+
+
+def _serve(address: str, authkey: bytes) -> None:
+    """Entry point of the shared state server process."""
+    global _server_cache, _server_writer
+    from database.writer import DbWriter
+
+    logging.basicConfig(level=logging.INFO)
+    _server_cache = LRUCache("shared", maxsize=SHARED_CACHE_SIZE)
+    _server_writer = DbWriter()
+
+    manager = SharedStateManager(address=address, authkey=authkey)
+    server = manager.get_server()
+    logger.info(f"Shared state server listening on {address}")
+    server.serve_forever()
+
+
+_server_process: multiprocessing.Process | None = None
+
+
+def start_server() -> None:
+    """
+    Start the shared state server and export its address to child workers.
+
+    Called from the gunicorn master before workers are forked.
+    """
+    global _server_process
+    address = os.getenv(ADDRESS_ENV) or os.path.join(
+        tempfile.gettempdir(), f"recipe-agent-{os.getpid()}.sock"
+    )
+    authkey = os.getenv(AUTHKEY_ENV) or secrets.token_hex(16)
+    if os.path.exists(address):
+        os.unlink(address)
+
+    # spawn: the server must not inherit the master's sockets and threads
+    context = multiprocessing.get_context("spawn")
+    _server_process = context.Process(
+        target=_serve, args=(address, authkey.encode()), name="shared-state", daemon=True
+    )
+    _server_process.start()
+
+    deadline = time.monotonic() + 10
+    while not os.path.exists(address):
+        if time.monotonic() > deadline or not _server_process.is_alive():
+            raise RuntimeError("Shared state server failed to start")
+        time.sleep(0.05)
+
+    os.environ[ADDRESS_ENV] = address
+    os.environ[AUTHKEY_ENV] = authkey
+
+
+def stop_server() -> None:
+    if _server_process is not None and _server_process.is_alive():
+        _server_process.terminate()
+        _server_process.join(timeout=5)
+
+
+_cache = None
+_writer = None
+_lock = threading.Lock()
+
+
+def _connect() -> None:
+    """Bind this process to the shared server if configured, else to local state."""
+    global _cache, _writer
+    address = os.getenv(ADDRESS_ENV)
+    if address:
+        manager = SharedStateManager(address=address, authkey=os.environ[AUTHKEY_ENV].encode())
+        manager.connect()
+        _cache = manager.get_cache()
+        _writer = manager.get_writer()
+        logger.info(f"Worker {os.getpid()} connected to shared state at {address}")
+    else:
+        from database.writer import DbWriter
+
+        _cache = LRUCache("shared", maxsize=SHARED_CACHE_SIZE)
+        _writer = DbWriter()
+
+
+def _ensure_connected() -> None:
+    if _writer is None:
+        with _lock:
+            if _writer is None:
+                _connect()
+
+
+def get_cache_store():
+    """The cache store for this deployment (local LRUCache or a proxy to it)."""
+    _ensure_connected()
+    return _cache
+
+
+def get_db_writer():
+    """The DbWriter for this deployment (local instance or a proxy to it)."""
+    _ensure_connected()
+    return _writer
+
+
+def is_multi_worker() -> bool:
+    return bool(os.getenv(ADDRESS_ENV))
+
+
+class SharedCache:
+    """
+    Namespaced view of the shared cache tier.
+
+    Values must be picklable in multi-worker mode; None means "not cached",
+    so store a sentinel value such as "" to cache a negative result.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def get(self, key: Any) -> Any:
+        return get_cache_store().get((self.namespace, key))
+
+    def set(self, key: Any, value: Any, ttl: float | None = None) -> None:
+        get_cache_store().set((self.namespace, key), value, ttl)
+
+    def delete(self, key: Any) -> None:
+        get_cache_store().delete((self.namespace, key))
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import re
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent import futures
+from typing import Any, TypeVar
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_key(*parts: Any) -> tuple:
+    """Build a coalescing key that ignores case and whitespace differences."""
+    return tuple(
+        _WHITESPACE.sub(" ", part).strip().lower() if isinstance(part, str) else part
+        for part in parts
+    )
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into a single upstream request.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait on the same future and receive the same
+    result or exception. Sync callers and async callers share the in-flight
+    table, so a request started from a worker thread also serves coroutines
+    and vice versa. Results are shared objects and must be treated as
+    read-only by callers.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def _join_or_lead(self, key: Hashable) -> tuple[futures.Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                metrics.increment(f"single_flight.{self.name}.coalesced")
+                return future, False
+            future = futures.Future()
+            self._calls[key] = future
+            metrics.increment(f"single_flight.{self.name}.leaders")
+            metrics.add_gauge(f"single_flight.{self.name}.in_flight", 1)
+            return future, True
+
+    def _finish(self, key: Hashable) -> None:
+        # Called before the leader's future is resolved: a waiter woken by it
+        # must not find the finished call still registered
+        with self._lock:
+            self._calls.pop(key, None)
+            metrics.add_gauge(f"single_flight.{self.name}.in_flight", -1)
+
+    def do(self, key: Hashable, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `fn` for `key` from sync code, sharing any identical in-flight call."""
+        while True:
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                try:
+                    return future.result()
+                except futures.CancelledError:
+                    # The leader was cancelled; try again, possibly as the new leader
+                    continue
+
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                self._finish(key)
+                future.set_exception(e)
+                raise
+            self._finish(key)
+            future.set_result(result)
+            return result
+
+    async def ado(
+        self, key: Hashable, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run coroutine function `fn` for `key`, sharing any identical in-flight call."""
+        while True:
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                try:
+                    # shield() so a waiter being cancelled doesn't cancel the leader
+                    return await asyncio.shield(asyncio.wrap_future(future))
+                except asyncio.CancelledError:
+                    if not future.cancelled():
+                        raise
+                    continue
+
+            try:
+                result = await fn(*args, **kwargs)
+            except asyncio.CancelledError:
+                # Waiters did not ask to be cancelled; let one of them retry
+                # (with the key already gone, so a retry leads instead of spinning)
+                self._finish(key)
+                future.cancel()
+                raise
+            except BaseException as e:
+                self._finish(key)
+                future.set_exception(e)
+                raise
+            self._finish(key)
+            future.set_result(result)
+            return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# Shared coalescing groups for the graph's upstream calls
+search_flight = SingleFlight("search")
+classifier_flight = SingleFlight("classifier")
@@ -0,0 +1,365 @@
+import asyncio
+import contextlib
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database.connection import get_db
+from database.models import ThreadLease
+from database.writer import submit_write
+from services.metrics import metrics
+from services.shared_state import is_multi_worker
+
+logger = logging.getLogger(__name__)
+
+# How long a turn waits for the previous turn on its thread before a 409
+TURN_WAIT_TIMEOUT = float(os.getenv("TURN_WAIT_TIMEOUT_SECONDS", "30"))
+
+# Cancel the running turn when a newer one arrives on the same thread
+# (e.g. a double submit) instead of queueing behind it
+TURN_CANCEL_PREVIOUS = os.getenv("TURN_CANCEL_PREVIOUS", "false").lower() == "true"
+
+# Cross-worker leases expire unless renewed, so a crashed worker cannot hold
+# a thread forever; holders renew every third of the TTL
+LEASE_TTL = float(os.getenv("TURN_LEASE_TTL_SECONDS", "60"))
+
+# How often lease waiters retry
+LEASE_POLL_INTERVAL = float(os.getenv("TURN_LEASE_POLL_SECONDS", "0.25"))
+
+# With TURN_CANCEL_PREVIOUS, holders also check for cancel requests every this
+# many poll intervals; otherwise the flag only arrives with each renewal
+LEASE_CANCEL_POLL_MULTIPLE = int(os.getenv("TURN_LEASE_CANCEL_POLL_MULTIPLE", "4"))
+
+
+class TurnBusyError(RuntimeError):
+    """Raised when a turn cannot start because another turn holds its thread."""
+
+
+def claim_thread_lease(
+    db: Session, thread_id: str, owner: str, ttl: float, cancel_previous: bool = False
+) -> bool:
+    """
+    Writer operation: take the thread's lease if it is free or expired.
+
+    When the lease is held by someone else and `cancel_previous` is set, the
+    holder is asked to cancel. Returns True if `owner` now holds the lease.
+    """
+    now = datetime.utcnow()
+    values = {
+        "thread_id": thread_id,
+        "owner": owner,
+        "expires_at": now + timedelta(seconds=ttl),
+        "cancel_requested": False,
+    }
+    statement = insert(ThreadLease).values(values)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[ThreadLease.thread_id],
+            set_={
+                key: statement.excluded[key] for key in ("owner", "expires_at", "cancel_requested")
+            },
+            where=ThreadLease.expires_at < now,
+        )
+    )
+    lease = db.get(ThreadLease, thread_id, populate_existing=True)
+    if lease.owner == owner:
+        return True
+    if cancel_previous:
+        lease.cancel_requested = True
+    return False
+
+
+def renew_thread_lease(db: Session, thread_id: str, owner: str, ttl: float) -> str:
+    """
+    Writer operation: extend a held lease.
+
+    Returns "held", "cancel" if a newer turn asked the holder to cancel, or
+    "lost" if `owner` no longer holds the lease.
+    """
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    held = db.query(ThreadLease).filter_by(thread_id=thread_id, owner=owner)
+    if not held.update({"expires_at": expires_at}, synchronize_session=False):
+        return "lost"
+    return "cancel" if held.with_entities(ThreadLease.cancel_requested).scalar() else "held"
+
+
+def release_thread_lease(db: Session, thread_id: str, owner: str) -> None:
+    """Writer operation: drop a lease if `owner` still holds it."""
+    db.query(ThreadLease).filter_by(thread_id=thread_id, owner=owner).delete(
+        synchronize_session=False
+    )
+
+
+def _cancel_requested(thread_id: str, owner: str) -> bool:
+    with get_db() as db:
+        lease = db.get(ThreadLease, thread_id)
+        return lease is not None and lease.owner == owner and lease.cancel_requested
+
+
+def _resolve(waiter: asyncio.Future, error: Exception | None = None) -> None:
+    if waiter.done():
+        return
+    if error is None:
+        waiter.set_result(None)
+    else:
+        waiter.set_exception(error)
+
+
+def _call_on_loop(loop: asyncio.AbstractEventLoop, callback, *args) -> None:
+    with contextlib.suppress(RuntimeError):  # Its event loop has closed
+        loop.call_soon_threadsafe(callback, *args)
+
+
+class _Turn:
+    """In-process state for one busy thread: the running task and turns queued behind it."""
+
+    def __init__(self, task: asyncio.Task | None):
+        self.task = task
+        self.waiters: deque[asyncio.Future] = deque()
+        self.granted: asyncio.Future | None = None  # Waiter handed the turn, until it resumes
+
+
+class TurnLease:
+    """The right to run one turn on a thread; release it when the turn is over."""
+
+    def __init__(
+        self, locks: "ThreadTurnLocks", thread_id: str, owner: str, task: asyncio.Task | None
+    ):
+        self.thread_id = thread_id
+        self.owner = owner
+        self.task = task  # Cancelled when a newer turn supersedes this one
+        self._locks = locks
+        self._heartbeat: asyncio.Task | None = None
+        self._released = False
+
+    def bind(self, task: asyncio.Task) -> None:
+        """
+        Make `task` the one cancelled on behalf of a newer turn.
+
+        The lease starts bound to the task that acquired it; a turn that then
+        runs in another task (e.g. a streamed turn) binds that task instead.
+        """
+        self.task = task
+        if not self._released:
+            self._locks._bind(self.thread_id, task)
+
+    async def release(self) -> None:
+        """Release the lease (idempotent)."""
+        if self._released:
+            return
+        self._released = True
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await asyncio.to_thread(
+                    submit_write, "release_thread_lease", thread_id=self.thread_id, owner=self.owner
+                )
+            except Exception as e:
+                logger.warning(f"Could not release lease on thread {self.thread_id}: {e}")
+        self._locks._release_local(self.thread_id)
+
+
+class ThreadTurnLocks:
+    """
+    Serializes turns per thread_id so two runs never fork a thread's history.
+
+    Within a worker, turns on the same thread queue in arrival order. In
+    multi-worker mode the holder also takes a lease row in thread_leases,
+    claimed and renewed through the single DB writer, so turns on different
+    workers serialize too.
+
+    With cancel_previous a new turn cancels the running one (its task is
+    cancelled locally, or asked to cancel through the lease row) and
+    supersedes any turns queued in between, so only the latest turn
+    consumes upstream capacity.
+    """
+
+    def __init__(self):
+        self._turns: dict[str, _Turn] = {}
+        self._lock = threading.Lock()
+
+    def is_busy(self, thread_id: str) -> bool:
+        with self._lock:
+            return thread_id in self._turns
+
+    async def acquire(
+        self,
+        thread_id: str,
+        cancel_previous: bool | None = None,
+        timeout: float | None = None,
+    ) -> TurnLease:
+        """
+        Wait until no other turn is running on `thread_id`.
+
+        `cancel_previous` and `timeout` default to TURN_CANCEL_PREVIOUS and
+        TURN_WAIT_TIMEOUT.
+
+        Raises:
+            TurnBusyError: If the wait timed out or a newer turn superseded this one
+        """
+        if cancel_previous is None:
+            cancel_previous = TURN_CANCEL_PREVIOUS
+        if timeout is None:
+            timeout = TURN_WAIT_TIMEOUT
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        await self._acquire_local(thread_id, cancel_previous, timeout)
+        lease = TurnLease(self, thread_id, uuid.uuid4().hex, asyncio.current_task())
+        if is_multi_worker():
+            try:
+                await self._acquire_shared(lease, cancel_previous, deadline)
+            except BaseException:
+                self._release_local(thread_id)
+                raise
+        metrics.observe("turn_lock.wait_ms", (time.perf_counter() - started) * 1000)
+        return lease
+
+    async def _acquire_local(self, thread_id: str, cancel_previous: bool, timeout: float) -> None:
+        task = asyncio.current_task()
+        with self._lock:
+            turn = self._turns.get(thread_id)
+            if turn is None:
+                self._turns[thread_id] = _Turn(task)
+                return
+            metrics.increment("turn_lock.contended")
+            if cancel_previous:
+                self._cancel_turn(thread_id, turn)
+            waiter = asyncio.get_running_loop().create_future()
+            turn.waiters.append(waiter)
+
+        try:
+            await asyncio.wait([waiter], timeout=timeout)
+        except asyncio.CancelledError:
+            if self._abandon(thread_id, waiter) == "granted":
+                self._release_local(thread_id)
+            raise
+        if not waiter.done() and self._abandon(thread_id, waiter) == "queued":
+            metrics.increment("turn_lock.timeouts")
+            raise TurnBusyError(f"Another turn is still running on thread {thread_id}")
+        await waiter  # Raises TurnBusyError if superseded
+        with self._lock:
+            turn = self._turns[thread_id]
+            turn.task, turn.granted = task, None
+
+    def _cancel_turn(self, thread_id: str, turn: _Turn) -> None:
+        """Cancel the running turn and supersede queued ones (call with the lock held)."""
+        superseded = TurnBusyError(f"Superseded by a newer turn on thread {thread_id}")
+        while turn.waiters:
+            waiter = turn.waiters.popleft()
+            _call_on_loop(waiter.get_loop(), _resolve, waiter, superseded)
+        if turn.task is not None and not turn.task.done():
+            _call_on_loop(turn.task.get_loop(), turn.task.cancel)
+            metrics.increment("turn_lock.cancelled_previous")
+            logger.info(f"Cancelling the running turn on thread {thread_id}")
+
+    def _abandon(self, thread_id: str, waiter: asyncio.Future) -> str:
+        """
+        Take a waiter out of the queue.
+
+        Returns "queued" if it was removed, "granted" if it had already been
+        handed the turn (which the caller must then pass on), else "superseded".
+        """
+        with self._lock:
+            turn = self._turns.get(thread_id)
+            if turn is not None and waiter in turn.waiters:
+                turn.waiters.remove(waiter)
+                return "queued"
+            if turn is not None and turn.granted is waiter:
+                return "granted"
+            return "superseded"
+
+    def _bind(self, thread_id: str, task: asyncio.Task) -> None:
+        with self._lock:
+            turn = self._turns.get(thread_id)
+            if turn is not None:
+                turn.task = task
+
+    def _release_local(self, thread_id: str) -> None:
+        with self._lock:
+            turn = self._turns.get(thread_id)
+            if turn is None:
+                return
+            turn.task = turn.granted = None
+            while turn.waiters:
+                waiter = turn.waiters.popleft()
+                if not waiter.done() and not waiter.get_loop().is_closed():
+                    turn.granted = waiter
+                    _call_on_loop(waiter.get_loop(), _resolve, waiter)
+                    return
+            del self._turns[thread_id]
+
+    async def _acquire_shared(
+        self, lease: TurnLease, cancel_previous: bool, deadline: float
+    ) -> None:
+        """Claim the cross-worker lease row, polling until it is free or `deadline`."""
+        while True:
+            claimed = await asyncio.to_thread(
+                submit_write,
+                "claim_thread_lease",
+                thread_id=lease.thread_id,
+                owner=lease.owner,
+                ttl=LEASE_TTL,
+                cancel_previous=cancel_previous,
+            )
+            if claimed:
+                break
+            if cancel_previous:
+                metrics.increment("turn_lock.cancelled_previous")
+                cancel_previous = False  # Asked once; now wait for the holder to stop
+            if time.monotonic() >= deadline:
+                metrics.increment("turn_lock.timeouts")
+                raise TurnBusyError(f"Another worker is running a turn on thread {lease.thread_id}")
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+        lease._heartbeat = asyncio.create_task(self._heartbeat(lease))
+
+    async def _heartbeat(self, lease: TurnLease) -> None:
+        """
+        Renew the lease while the turn runs and cancel it if a newer turn asks.
+
+        Each renewal (every third of the TTL) reports a pending cancel request.
+        Only with TURN_CANCEL_PREVIOUS, where a newer turn waits on the
+        cancellation, is the lease also polled for it in between.
+        """
+        renewed_at = time.monotonic()
+        while True:
+            polling = TURN_CANCEL_PREVIOUS
+            if polling:
+                await asyncio.sleep(
+                    min(LEASE_POLL_INTERVAL * LEASE_CANCEL_POLL_MULTIPLE, LEASE_TTL / 3)
+                )
+            else:
+                await asyncio.sleep(LEASE_TTL / 3)
+            try:
+                if not polling or time.monotonic() - renewed_at >= LEASE_TTL / 3:
+                    status = await asyncio.to_thread(
+                        submit_write,
+                        "renew_thread_lease",
+                        thread_id=lease.thread_id,
+                        owner=lease.owner,
+                        ttl=LEASE_TTL,
+                    )
+                    renewed_at = time.monotonic()
+                elif await asyncio.to_thread(_cancel_requested, lease.thread_id, lease.owner):
+                    status = "cancel"
+                else:
+                    continue
+                if status == "lost":
+                    logger.warning(f"Lost the lease on thread {lease.thread_id}")
+                    return
+                if status == "cancel":
+                    logger.info(f"Turn on thread {lease.thread_id} cancelled by a newer turn")
+                    if lease.task is not None:
+                        lease.task.cancel()
+                    return
+            except Exception as e:
+                logger.warning(f"Lease heartbeat failed for thread {lease.thread_id}: {e}")
+
+
+turn_locks = ThreadTurnLocks()
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import deque
+from collections.abc import Coroutine
+
+from services.cache import LRUCache
+from services.shared_state import SharedCache, is_multi_worker
+
+logger = logging.getLogger(__name__)
+
+# Events kept per turn for replay; older ones are dropped first. A turn emits
+# one event per graph node plus its result, so this rarely drops anything
+STREAM_BUFFER_EVENTS = int(os.getenv("STREAM_BUFFER_EVENTS", "64"))
+
+# How long a finished turn's events stay available to reconnecting clients
+STREAM_RETENTION_SECONDS = float(os.getenv("STREAM_RETENTION_SECONDS", "300"))
+
+# Turns tracked per worker (running and retained); the least recent go first
+STREAM_MAX_TURNS = int(os.getenv("STREAM_MAX_TURNS", "1000"))
+
+
+def format_event_id(turn_id: str, seq: int) -> str:
+    return f"{turn_id}:{seq}"
+
+
+def parse_event_id(event_id: str) -> tuple[str, int] | None:
+    """Split a "turn_id:seq" SSE event ID; None if it is malformed."""
+    turn_id, _, seq = event_id.strip().rpartition(":")
+    if not turn_id or not seq.isdigit():
+        return None
+    return turn_id, int(seq)
+
+
+class TurnStream:
+    """
+    The events of one streamed turn, numbered and kept in a bounded ring buffer.
+
+    The turn runs as its own task and publishes into the stream; any number of
+    clients follow it, each from the last event it saw, so a client that
+    reconnects gets only the events it missed. Used from one event loop.
+    """
+
+    def __init__(
+        self, thread_id: str, turn_id: str | None = None, maxlen: int = STREAM_BUFFER_EVENTS
+    ):
+        self.turn_id = turn_id or uuid.uuid4().hex
+        self.thread_id = thread_id
+        self.task: asyncio.Task | None = None
+        self.done = False
+        self.followers = 0
+        self._events: deque[tuple[int, dict]] = deque(maxlen=maxlen)
+        self._next_seq = 1
+        self._waiters: list[asyncio.Future] = []
+
+    def start(self, turn: Coroutine) -> asyncio.Task:
+        """Run the turn as a task; it should publish its events and then close()."""
+        self.task = asyncio.create_task(turn)
+        return self.task
+
+    def publish(self, event: dict) -> int:
+        """Append an event and wake followers; returns its sequence number."""
+        seq = self._next_seq
+        self._next_seq += 1
+        self._events.append((seq, event))
+        self._wake()
+        return seq
+
+    def close(self) -> None:
+        """Mark the turn finished; followers drain the buffer and stop."""
+        self.done = True
+        self._wake()
+
+    def _wake(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def events_after(self, seq: int) -> list[tuple[int, dict]]:
+        """Buffered events newer than `seq` (from the oldest kept, if some were dropped)."""
+        return [(s, event) for s, event in self._events if s > seq]
+
+    async def wait_events(self, after: int) -> list[tuple[int, dict]]:
+        """
+        Wait for events newer than `after`.
+
+        Returns an empty list once the turn is closed and nothing is left.
+        """
+        while True:
+            events = self.events_after(after)
+            if events or self.done:
+                return events
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+
+class TurnStreams:
+    """
+    Registry of this worker's turn streams by turn_id.
+
+    Running turns stay registered until they close; finished ones are kept
+    for STREAM_RETENTION_SECONDS so a client that dropped during the turn can
+    still fetch the result without running it again.
+
+    With several workers, the worker holding each turn is also recorded in
+    shared state (for the same retention), so a resume that reaches another
+    worker can be told so instead of "unknown turn".
+    """
+
+    def __init__(
+        self, maxsize: int = STREAM_MAX_TURNS, retention: float = STREAM_RETENTION_SECONDS
+    ):
+        self.retention = retention
+        self._streams = LRUCache("turn_streams", maxsize=maxsize)
+        self._owners = SharedCache("turn_owner")
+
+    def create(self, thread_id: str, turn_id: str | None = None) -> TurnStream:
+        stream = TurnStream(thread_id, turn_id)
+        self._streams.set(stream.turn_id, stream)
+        self._record_owner(stream)
+        return stream
+
+    def get(self, turn_id: str) -> TurnStream | None:
+        return self._streams.get(turn_id)
+
+    def finish(self, stream: TurnStream) -> None:
+        """Close a turn's stream and start its retention countdown."""
+        stream.close()
+        self._streams.set(stream.turn_id, stream, ttl=self.retention)
+        self._record_owner(stream)
+
+    def discard(self, stream: TurnStream) -> None:
+        stream.close()
+        self._streams.delete(stream.turn_id)
+
+    async def aowner(self, turn_id: str) -> tuple[int, str] | None:
+        """(pid, thread_id) of the worker holding a turn, or None if no worker does."""
+        if not is_multi_worker():
+            return None
+        return await asyncio.to_thread(self._owners.get, turn_id)
+
+    def _record_owner(self, stream: TurnStream) -> None:
+        # Shared state is blocking IPC: record in the background, off the event loop
+        if is_multi_worker():
+            owner = (os.getpid(), stream.thread_id)
+            asyncio.get_running_loop().run_in_executor(None, self._set_owner, stream.turn_id, owner)
+
+    def _set_owner(self, turn_id: str, owner: tuple[int, str]) -> None:
+        try:
+            self._owners.set(turn_id, owner, ttl=self.retention)
+        except Exception as e:
+            logger.warning(f"Could not record the worker of turn {turn_id}: {e}")
+
+
+turn_streams = TurnStreams()
@@ -0,0 +1,27 @@
+"""
+Shared test configuration.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Modules construct API clients at import time; tests never reach the real APIs
+os.environ.setdefault("OPENAI_API_KEY", "test-openai-key")
+os.environ.setdefault("TAVILY_API_KEY", "test-tavily-key")
+
+# Point the app at a throwaway SQLite database before database.connection is imported
+_test_db_dir = tempfile.mkdtemp(prefix="recipe-agent-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_test_db_dir}/test.db")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create all tables once for the test session."""
+    from database.init import create_tables
+
+    create_tables()
+    yield
+    shutil.rmtree(_test_db_dir, ignore_errors=True)
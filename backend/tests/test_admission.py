@@ -0,0 +1,87 @@
+"""
+Tests for admission control in front of the streaming endpoint.
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import cooking
+from main import app
+from services.admission import AdmissionController, AdmissionRejectedError
+
+
+def _controller(**overrides):
+    options = {"max_active": 1, "max_queued": 1, "queue_timeout": 1.0, "retry_after": 3}
+    options.update(overrides)
+    return AdmissionController("test", **options)
+
+
+def test_queue_is_bounded_and_rejections_carry_retry_after():
+    async def scenario():
+        controller = _controller()
+        slot = await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+
+        with pytest.raises(AdmissionRejectedError) as rejected:
+            await controller.acquire()
+        assert rejected.value.retry_after == 3
+
+        slot.release()
+        slot.release()  # Idempotent
+        second = await waiting
+        assert (controller.active, controller.queued) == (1, 0)
+        second.release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_slots_are_handed_to_waiters_in_order():
+    async def scenario():
+        controller = _controller(max_queued=3)
+        slot = await controller.acquire()
+        order = []
+
+        async def wait(name):
+            granted = await controller.acquire()
+            order.append(name)
+            granted.release()
+
+        tasks = [asyncio.create_task(wait(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        slot.release()
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiters_time_out_or_leave_without_leaking_slots():
+    async def scenario():
+        controller = _controller(max_queued=2, queue_timeout=0.05)
+        slot = await controller.acquire()
+        with pytest.raises(AdmissionRejectedError):
+            await controller.acquire()
+
+        cancelled = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert controller.queued == 0
+
+        slot.release()
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_endpoint_answers_429_when_full(monkeypatch):
+    monkeypatch.setattr(cooking, "stream_admission", _controller(max_active=0, max_queued=0))
+    response = TestClient(app).post("/api/cooking/stream", json={"query": "pasta?"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
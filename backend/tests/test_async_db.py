@@ -0,0 +1,54 @@
+"""
+Tests that request handlers do not block the event loop on database calls.
+"""
+
+import asyncio
+import time
+import uuid
+
+import httpx
+from sqlalchemy import text
+
+from main import app
+from services import conversation_service
+
+# About half a second of work inside SQLite
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 1500000) "
+    "SELECT count(*) FROM n"
+)
+
+
+def test_slow_query_does_not_delay_other_requests(monkeypatch):
+    thread_id = str(uuid.uuid4())
+    conversation_service.save_message(thread_id, "assistant", "Tablet or fudge?")
+    rank_candidates = conversation_service._rank_candidates
+
+    def slow_rank_candidates(db, *args):
+        db.execute(SLOW_QUERY)
+        return rank_candidates(db, *args)
+
+    monkeypatch.setattr(conversation_service, "_rank_candidates", slow_rank_candidates)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+
+            async def finished(path, delay=0.0):
+                await asyncio.sleep(delay)
+                response = await client.get(path)
+                assert response.status_code == 200
+                return time.perf_counter() - started
+
+            # The fetch is sent once the search is waiting on the database
+            return await asyncio.gather(
+                finished(f"/api/conversations/{thread_id}", delay=0.1),
+                finished("/api/conversations/search?q=tablet"),
+            )
+
+    fetch, search = asyncio.run(scenario())
+
+    # The unrelated request did not wait for the slow query to finish
+    assert search > 0.4
+    assert fetch < search / 2
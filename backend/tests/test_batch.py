@@ -0,0 +1,90 @@
+"""
+Tests for running many cooking queries through the batch endpoint.
+"""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models import FakeListChatModel
+
+from graphs import nodes
+from main import app
+from services import llm, response_cache
+
+CLASSIFICATION = {
+    "relevant": True,
+    "query_type": "recipe_request",
+    "dish": None,
+    "ingredients": None,
+    "required_cookware": None,
+    "reason": None,
+}
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    models = {
+        # Distinct dishes, so searches are not coalesced across queries
+        "classifier": FakeListChatModel(
+            responses=[json.dumps({**CLASSIFICATION, "dish": f"Stovies {i}"}) for i in range(20)]
+        ),
+        "response": FakeListChatModel(responses=[f"Answer {i}" for i in range(20)]),
+        "title": FakeListChatModel(responses=["Stovies"] * 20),
+    }
+    for name, model in models.items():
+        monkeypatch.setitem(llm._clients, name, model)
+
+    class CountingSearch:
+        in_flight = 0
+        peak = 0
+
+        async def asearch_recipes(self, query):
+            CountingSearch.in_flight += 1
+            CountingSearch.peak = max(CountingSearch.peak, CountingSearch.in_flight)
+            await asyncio.sleep(0.05)
+            CountingSearch.in_flight -= 1
+            return []
+
+    monkeypatch.setattr(nodes, "get_tavily_search_tool", CountingSearch)
+    monkeypatch.setattr(nodes, "KNOWLEDGE_BASE_ENABLED", False)
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", False)
+    models["search"] = CountingSearch
+    return models
+
+
+def _batch(client, queries, **options):
+    response = client.post("/api/cooking/batch", json={"queries": queries, **options})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def test_batch_runs_each_unique_query_once(fake_models):
+    thread_id = str(uuid.uuid4())
+    queries = [
+        {"query": "How do I make stovies?"},
+        {"query": "how do I make  STOVIES?"},  # Same query on a fresh thread
+        {"query": "How do I make stovies?", "thread_id": thread_id},  # A turn of this thread
+        {"query": "What goes in stovies?"},
+    ]
+    lines = _batch(TestClient(app), queries)
+
+    by_index = {line["index"]: line for line in lines}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert by_index[0]["response"] == by_index[1]["response"]
+    assert by_index[0]["thread_id"] == by_index[1]["thread_id"]
+    assert by_index[2]["thread_id"] == thread_id
+    assert len({line["response"] for line in lines}) == 3
+    assert fake_models["response"].i == 3
+
+
+def test_batch_concurrency_is_bounded(fake_models):
+    queries = [{"query": f"Stovies variation {i}?"} for i in range(6)]
+    lines = _batch(TestClient(app), queries, max_concurrency=2)
+
+    assert len(lines) == 6
+    assert not any("error" in line for line in lines)
+    assert fake_models["search"].peak == 2
@@ -0,0 +1,65 @@
+"""
+Tests for the upstream record/replay proxy and the replay regression check.
+"""
+
+import json
+import time
+
+import openai
+import pytest
+from langchain_openai import ChatOpenAI
+from langchain_tavily import TavilySearch
+
+from benchmarks.bench_replay import regressions
+from benchmarks.cassettes import CassetteProxy
+from benchmarks.fake_upstreams import FakeUpstreams
+
+
+def _clients(proxy: CassetteProxy):
+    chat = ChatOpenAI(
+        model="gpt-4o-mini", api_key="secret-key", base_url=f"{proxy.url}/v1", max_retries=0
+    )
+    search = TavilySearch(max_results=2, tavily_api_key="secret-key", api_base_url=proxy.url)
+    return chat, search
+
+
+def test_recorded_calls_replay_without_the_upstream(tmp_path):
+    cassette = str(tmp_path / "cassette.json")
+    upstreams = FakeUpstreams(latency=0.1)
+    recorder = CassetteProxy(
+        cassette, "record", openai_upstream=upstreams.url, tavily_upstream=upstreams.url
+    )
+    chat, search = _clients(recorder)
+    recorded_answer = chat.invoke("How do I make carbonara?").content
+    recorded_results = search.invoke("carbonara recipe")
+    recorder.close()
+    upstreams.close()
+
+    with open(cassette) as f:
+        saved = f.read()
+    assert "secret-key" not in saved
+    assert [i["latency"] >= 0.1 for i in json.loads(saved)["interactions"]] == [True, True]
+
+    player = CassetteProxy(cassette, "replay", latency_scale=0.5)
+    chat, search = _clients(player)
+    started = time.perf_counter()
+    assert chat.invoke("How do I make carbonara?").content == recorded_answer
+    assert 0.05 <= time.perf_counter() - started < 0.1  # Half the recorded latency
+    assert search.invoke("carbonara recipe")["results"] == recorded_results["results"]
+    assert player.misses == 0
+
+    with pytest.raises(openai.APIStatusError):
+        chat.invoke("Something never recorded")
+    assert player.misses == 1
+    player.close()
+
+
+def test_regressions_flag_cpu_beyond_tolerance_and_any_extra_queries():
+    baseline = {"cpu_seconds": 1.0, "statements": 300, "upstream_requests": 40}
+
+    assert regressions({**baseline, "cpu_seconds": 1.15}, baseline, cpu_tolerance=0.2) == []
+    found = regressions(
+        {"cpu_seconds": 1.3, "statements": 301, "upstream_requests": 40}, baseline, 0.2
+    )
+    assert len(found) == 2
+    assert found[1] == "statements grew from 300 to 301"
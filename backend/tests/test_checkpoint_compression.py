@@ -0,0 +1,103 @@
+"""
+Tests for compressed checkpoint storage.
+"""
+
+import base64
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from checkpointer import compression, sqlite_checkpointer
+from checkpointer.compression import RAW, ZSTD, CheckpointCodec
+from checkpointer.sqlite_checkpointer import SQLiteCheckpointSaver
+from database.connection import get_db
+from database.models import Checkpoint as CheckpointModel
+from database.writer import submit_write
+
+
+def _checkpoint(dish: str) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {
+        "messages": [
+            HumanMessage(content=f"How do I make {dish}?"),
+            AIMessage(content=f"To make {dish}, start by heating a pan with olive oil."),
+        ],
+        "dish": dish,
+        "search_results": [{"url": f"https://example.com/{dish}", "content": f"{dish} recipe"}],
+    }
+    return checkpoint
+
+
+def _put(saver: SQLiteCheckpointSaver, dish: str) -> dict:
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    saver.put(config, _checkpoint(dish), {"step": 1}, {})
+    return config
+
+
+def _stored(config: dict) -> CheckpointModel:
+    with get_db() as db:
+        return (
+            db.query(CheckpointModel).filter_by(thread_id=config["configurable"]["thread_id"]).one()
+        )
+
+
+def _use_codec(monkeypatch, codec: CheckpointCodec) -> SQLiteCheckpointSaver:
+    monkeypatch.setattr(sqlite_checkpointer, "checkpoint_codec", codec)
+    return SQLiteCheckpointSaver()
+
+
+def test_checkpoints_round_trip_compressed_with_and_without_dictionary(monkeypatch):
+    monkeypatch.setattr(compression, "CHECKPOINT_DICT_MIN_SAMPLES", 100)
+    monkeypatch.setattr(compression, "CHECKPOINT_DICT_SIZE", 4096)
+    saver = _use_codec(monkeypatch, CheckpointCodec(ZSTD))
+
+    before = _put(saver, "pad thai")
+    for i in range(150):
+        _put(saver, f"dish {i}")
+    dictionary_id = sqlite_checkpointer.checkpoint_codec.train_dictionary()
+    assert dictionary_id is not None
+    after = _put(saver, "pad thai")
+
+    old_record, new_record = _stored(before), _stored(after)
+    assert (old_record.codec, old_record.dictionary_id) == (ZSTD, None)
+    assert (new_record.codec, new_record.dictionary_id) == (ZSTD, dictionary_id)
+    assert len(new_record.payload) < len(old_record.payload)
+
+    # A fresh codec (another worker) reads both with dictionaries loaded from the database
+    saver = _use_codec(monkeypatch, CheckpointCodec(ZSTD))
+    for config in (before, after):
+        values = saver.get_tuple(config).checkpoint["channel_values"]
+        assert values["dish"] == "pad thai"
+        assert values["messages"][1].content.startswith("To make pad thai")
+
+
+def test_raw_codec_stores_serialized_bytes(monkeypatch):
+    saver = _use_codec(monkeypatch, CheckpointCodec("none"))
+    config = _put(saver, "shakshuka")
+
+    record = _stored(config)
+    assert record.codec == RAW
+    assert saver.serde.loads_typed(("msgpack", record.payload))["channel_values"]["dish"] == (
+        "shakshuka"
+    )
+    assert saver.get_tuple(config).checkpoint["channel_values"]["dish"] == "shakshuka"
+
+
+def test_legacy_base64_checkpoints_stay_readable():
+    saver = SQLiteCheckpointSaver()
+    thread_id = str(uuid.uuid4())
+    type_str, data = saver.serde.dumps_typed(_checkpoint("paella"))
+    # As written before checkpoints had a payload column
+    submit_write(
+        "put_checkpoint",
+        thread_id=thread_id,
+        checkpoint_data={
+            "checkpoint": {"type": type_str, "data": base64.b64encode(data).decode()},
+            "metadata": {"step": 3},
+        },
+    )
+
+    checkpoint_tuple = saver.get_tuple({"configurable": {"thread_id": thread_id}})
+    assert checkpoint_tuple.checkpoint["channel_values"]["dish"] == "paella"
+    assert checkpoint_tuple.metadata == {"step": 3}
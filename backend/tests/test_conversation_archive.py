@@ -0,0 +1,165 @@
+"""
+Tests for archiving idle conversations and restoring them on access.
+"""
+
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from sqlalchemy import text
+
+from checkpointer.sqlite_checkpointer import SQLiteCheckpointSaver
+from database.connection import get_db
+from database.writer import submit_write
+from main import app
+from services import conversation_archive, conversation_service
+from services.metrics import metrics
+
+IDLE_SINCE = datetime(1990, 1, 1)
+CUTOFF = datetime(1991, 1, 1)
+
+
+@pytest.fixture
+def idle_thread():
+    """Factory for conversations idle since 1990; deleted after the test."""
+    created = []
+
+    def create(content: str) -> str:
+        created.append(_idle_thread(content))
+        return created[-1]
+
+    yield create
+    for thread_id in created:
+        conversation_service.delete_conversation(thread_id)
+
+
+def _idle_thread(content: str) -> str:
+    thread_id = str(uuid.uuid4())
+    conversation_service.save_message(thread_id, "assistant", content, metadata={"n": 1})
+    conversation_service.save_message(thread_id, "assistant", f"{content} answered")
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": [AIMessage(content=content)], "dish": content}
+    SQLiteCheckpointSaver().put({"configurable": {"thread_id": thread_id}}, checkpoint, {}, {})
+    with get_db() as db:
+        db.execute(
+            text("UPDATE conversations SET updated_at = :at WHERE thread_id = :thread_id"),
+            {"at": IDLE_SINCE, "thread_id": thread_id},
+        )
+        db.commit()
+    return thread_id
+
+
+def _rows(table: str, thread_id: str) -> int:
+    with get_db() as db:
+        return db.execute(
+            text(f"SELECT count(*) FROM {table} WHERE thread_id = :thread_id"),
+            {"thread_id": thread_id},
+        ).scalar()
+
+
+def test_archived_conversation_is_restored_when_opened(idle_thread):
+    thread_id = idle_thread("Cock-a-leekie soup")
+
+    assert conversation_archive.archive_idle_conversations(CUTOFF) >= 1
+    assert (_rows("messages", thread_id), _rows("checkpoints", thread_id)) == (0, 0)
+    assert _rows("conversation_archives", thread_id) == 1
+    assert metrics.snapshot()["gauges"]["conversations.archived"] >= 1
+
+    # Listing reads the last message from the archive without restoring it
+    listed = conversation_service.get_conversation_messages(thread_id, rehydrate=False)
+    assert [m.content for m in listed][-1] == "Cock-a-leekie soup answered"
+    assert _rows("conversation_archives", thread_id) == 1
+
+    response = TestClient(app).get(f"/api/conversations/{thread_id}")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [m["content"] for m in body["messages"]] == [
+        "Cock-a-leekie soup",
+        "Cock-a-leekie soup answered",
+    ]
+    assert body["messages"][0]["metadata"] == {"n": 1}
+    assert body["conversation"]["updated_at"].startswith("1990-01-01")
+    assert (_rows("messages", thread_id), _rows("checkpoints", thread_id)) == (2, 1)
+    assert _rows("conversation_archives", thread_id) == 0
+    assert metrics.snapshot()["observations"]["archive.rehydration_seconds"]["count"] >= 1
+
+
+def test_checkpointer_and_new_messages_restore_archived_threads(idle_thread):
+    checkpointed = idle_thread("Stovies")
+    continued = idle_thread("Skirlie")
+    conversation_archive.archive_idle_conversations(CUTOFF)
+
+    checkpoint = SQLiteCheckpointSaver().get_tuple({"configurable": {"thread_id": checkpointed}})
+    assert checkpoint.checkpoint["channel_values"]["dish"] == "Stovies"
+    assert _rows("messages", checkpointed) == 2
+
+    conversation_service.save_message(continued, "assistant", "Skirlie again")
+    assert [m.content for m in conversation_service.get_conversation_messages(continued)] == [
+        "Skirlie",
+        "Skirlie answered",
+        "Skirlie again",
+    ]
+    assert _rows("checkpoints", continued) == 1
+    assert conversation_service.get_conversation_by_thread(continued).archived_at is None
+
+
+def test_conversation_updated_while_archiving_stays_hot(idle_thread):
+    thread_id = idle_thread("Rumbledethumps")
+    with get_db() as db:
+        conversation = conversation_service.get_conversation_by_thread(thread_id)
+        archive = conversation_archive._read_thread(db, conversation)
+    conversation_service.save_message(thread_id, "assistant", "One more thing")
+
+    assert submit_write("archive_conversations", archives=[archive], idle_before=CUTOFF) == []
+    assert _rows("messages", thread_id) == 3
+    assert _rows("conversation_archives", thread_id) == 0
+
+
+def test_archived_conversations_are_exported_and_deleted(idle_thread):
+    thread_id = idle_thread("Tattie scones")
+    conversation_archive.archive_idle_conversations(CUTOFF)
+    client = TestClient(app)
+
+    exported = [json.loads(line) for line in client.get("/api/conversations/export").iter_lines()]
+    contents = [
+        r["content"] for r in exported if r.get("thread_id") == thread_id and "content" in r
+    ]
+    assert contents == ["Tattie scones", "Tattie scones answered"]
+
+    assert client.delete(f"/api/conversations/{thread_id}").status_code == 200
+    assert _rows("conversation_archives", thread_id) == 0
+
+
+def test_listing_previews_archived_threads_without_decompressing(idle_thread, monkeypatch):
+    thread_id = idle_thread("Skirlie")
+    conversation_archive.archive_idle_conversations(CUTOFF)
+
+    def unpack(archive):
+        raise AssertionError("archive decompressed for a preview")
+
+    monkeypatch.setattr(conversation_archive, "_unpack", unpack)
+
+    last_message = conversation_service.get_last_message(thread_id)
+
+    assert last_message.content == "Skirlie answered"
+    assert _rows("conversation_archives", thread_id) == 1
+
+
+def test_reimporting_an_archived_thread_leaves_its_messages_archived(idle_thread):
+    thread_id = idle_thread("Stovies")
+    conversation_archive.archive_idle_conversations(CUTOFF)
+    client = TestClient(app)
+    exported = [json.loads(line) for line in client.get("/api/conversations/export").iter_lines()]
+    records = [r for r in exported if r.get("thread_id") == thread_id]
+    body = "".join(json.dumps(record) + "\n" for record in records)
+
+    response = client.post("/api/conversations/import", content=body.encode())
+
+    assert response.json()["skipped"] == len(records)
+    assert _rows("messages", thread_id) == 0
+    assert _rows("conversation_archives", thread_id) == 1
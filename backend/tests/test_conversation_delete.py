@@ -0,0 +1,73 @@
+"""
+Tests for deleting conversations with their messages and checkpoints.
+"""
+
+import uuid
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from database.connection import get_db
+from database.writer import submit_write
+from main import app
+from services import conversation_service
+
+
+def _thread(content: str, updated_at: datetime | None = None) -> str:
+    thread_id = str(uuid.uuid4())
+    conversation_service.save_message(thread_id, "assistant", content)
+    conversation_service.save_message(thread_id, "assistant", f"{content} answered")
+    submit_write("put_checkpoint", thread_id=thread_id, checkpoint_data={"checkpoint": {}})
+    if updated_at is not None:
+        with get_db() as db:
+            db.execute(
+                text("UPDATE conversations SET updated_at = :at WHERE thread_id = :thread_id"),
+                {"at": updated_at, "thread_id": thread_id},
+            )
+            db.commit()
+    return thread_id
+
+
+def _rows(table: str, thread_id: str) -> int:
+    with get_db() as db:
+        return db.execute(
+            text(f"SELECT count(*) FROM {table} WHERE thread_id = :thread_id"),
+            {"thread_id": thread_id},
+        ).scalar()
+
+
+def test_delete_removes_messages_checkpoints_and_search_entries():
+    client = TestClient(app)
+    thread_id = _thread("Cullen skink")
+
+    assert client.delete(f"/api/conversations/{thread_id}").status_code == 200
+
+    assert conversation_service.get_conversation_by_thread(thread_id) is None
+    assert _rows("messages", thread_id) == 0
+    assert _rows("checkpoints", thread_id) == 0
+    assert conversation_service.search_conversations("cullen skink")["results"] == []
+    assert client.delete(f"/api/conversations/{thread_id}").status_code == 404
+
+
+def test_bulk_delete_removes_old_conversations_in_batches(monkeypatch):
+    monkeypatch.setattr(conversation_service, "BULK_DELETE_BATCH", 2)
+    writes = []
+
+    def counting_submit_write(op, **kwargs):
+        writes.append(op)
+        return submit_write(op, **kwargs)
+
+    monkeypatch.setattr(conversation_service, "submit_write", counting_submit_write)
+    old = [_thread(f"Old recipe {i}", updated_at=datetime(1999, 1, 1)) for i in range(3)]
+    recent = _thread("Recent recipe")
+
+    response = TestClient(app).delete(
+        "/api/conversations", params={"older_than": "2000-01-01T00:00:00+00:00"}
+    )
+
+    assert response.json() == {"status": "deleted", "count": 3}
+    assert writes.count("delete_conversations") == 2
+    assert all(_rows("messages", thread_id) == 0 for thread_id in old)
+    assert all(_rows("checkpoints", thread_id) == 0 for thread_id in old)
+    assert _rows("messages", recent) == 2
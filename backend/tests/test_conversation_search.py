@@ -0,0 +1,95 @@
+"""
+Tests for full-text search over conversations.
+"""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services import conversation_service
+
+
+@pytest.fixture(scope="module")
+def threads():
+    """Two conversations with distinctive content, owned by different users."""
+    soup, bread = str(uuid.uuid4()), str(uuid.uuid4())
+    conversation_service.create_conversation(soup)
+    conversation_service.update_conversation_title(soup, "Zucchini soup ideas")
+    conversation_service.save_message(soup, "assistant", "Simmer the zucchini with leeks.")
+    conversation_service.save_message(
+        bread, "assistant", "Knead the sourdough and let it prove overnight.", user_id="bob"
+    )
+    return {"soup": soup, "bread": bread}
+
+
+@pytest.mark.parametrize(
+    ("query", "expected"),
+    [
+        ("", None),
+        ("  ?! ", None),
+        ("zucchini soup", '"zucchini" "soup"*'),
+        ("knead a", '"knead" "a"'),
+        ('say "hi" OR x', '"say" "hi" "or" "x"'),
+    ],
+)
+def test_build_match_query(query, expected):
+    assert conversation_service.build_match_query(query) == expected
+
+
+def test_search_finds_messages_and_titles(threads):
+    results = conversation_service.search_conversations("zucchini")["results"]
+
+    kinds = {(r["thread_id"], r["message_id"] is None) for r in results}
+    assert kinds == {(threads["soup"], True), (threads["soup"], False)}
+    # The title match is weighted above the body match
+    assert results[0]["message_id"] is None
+    assert all("<mark>" in r["snippet"] for r in results)
+
+
+def test_search_stems_and_prefixes(threads):
+    assert (
+        conversation_service.search_conversations("proving sourd")["results"][0]["thread_id"]
+        == (threads["bread"])
+    )
+
+
+def test_search_index_follows_updates_and_deletes(threads):
+    thread_id = str(uuid.uuid4())
+    conversation_service.save_message(thread_id, "assistant", "Quinoa salad")
+    assert conversation_service.search_conversations("quinoa")["results"]
+
+    conversation_service.delete_conversation(thread_id)
+    assert conversation_service.search_conversations("quinoa")["results"] == []
+
+
+def test_search_reports_matches_older_than_the_rank_window(monkeypatch):
+    thread_id = str(uuid.uuid4())
+    for _ in range(2):
+        conversation_service.save_message(thread_id, "assistant", "Toast the pumpernickel.")
+
+    found = conversation_service.search_conversations("pumpernickel")
+    assert len(found["results"]) == 2 and not found["truncated"]
+
+    monkeypatch.setattr(conversation_service, "SEARCH_RANK_WINDOW", 1)
+    found = conversation_service.search_conversations("pumpernickel")
+    assert len(found["results"]) == 1 and found["truncated"]
+    conversation_service.delete_conversation(thread_id)
+
+
+def test_search_endpoint_paginates_and_filters(threads):
+    client = TestClient(app)
+
+    first = client.get("/api/conversations/search", params={"q": "zucchini", "limit": 1}).json()
+    second = client.get(
+        "/api/conversations/search", params={"q": "zucchini", "limit": 1, "skip": 1}
+    ).json()
+    assert first["has_more"] and not second["has_more"]
+    assert not first["truncated"]
+    assert first["results"][0] != second["results"][0]
+
+    owned = client.get("/api/conversations/search", params={"q": "sourdough", "user_id": "bob"})
+    assert [r["thread_id"] for r in owned.json()["results"]] == [threads["bread"]]
+    other = client.get("/api/conversations/search", params={"q": "sourdough", "user_id": "amy"})
+    assert other.json()["results"] == []
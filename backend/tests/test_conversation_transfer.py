@@ -0,0 +1,141 @@
+"""
+Tests for the NDJSON conversation export and import.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services import conversation_service, conversation_transfer
+
+
+def _export(client):
+    response = client.get("/api/conversations/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.iter_lines() if line]
+
+
+def _import(client, records):
+    body = "".join(json.dumps(record) + "\n" for record in records)
+    return client.post("/api/conversations/import", content=body.encode())
+
+
+def test_export_streams_conversations_then_messages():
+    thread_id = str(uuid.uuid4())
+    conversation_service.save_message(
+        thread_id, "assistant", "Fold the clootie dumpling.", metadata={"sources": 1}
+    )
+
+    records = _export(TestClient(app))
+
+    kinds = [record["type"] for record in records]
+    assert kinds == sorted(kinds)  # Every conversation before any message
+    message = next(r for r in records if r["type"] == "message" and r["thread_id"] == thread_id)
+    assert message["content"] == "Fold the clootie dumpling."
+    assert message["metadata"] == {"sources": 1}
+    assert any(r["type"] == "conversation" and r["thread_id"] == thread_id for r in records)
+
+
+def test_import_inserts_new_rows_and_skips_existing_ones():
+    client = TestClient(app)
+    thread_id = str(uuid.uuid4())
+    conversation_id = str(uuid.uuid4())
+    records = [
+        {
+            "type": "conversation",
+            "id": conversation_id,
+            "thread_id": thread_id,
+            "title": "Imported haggis",
+            "created_at": "2026-01-02T03:04:05+01:00",
+            "updated_at": "2026-01-02 02:04:05.000000",
+            "message_count": 1,
+            "user_id": None,
+        },
+        {
+            "type": "message",
+            "id": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "thread_id": thread_id,
+            "role": "assistant",
+            "content": "Serve the haggis with neeps and tatties.",
+            "timestamp": "2026-01-02T02:04:05",
+            "metadata": None,
+        },
+    ]
+
+    first = _import(client, records)
+    assert first.status_code == 200
+    assert first.json() == {"status": "imported", "conversations": 1, "messages": 1, "skipped": 0}
+
+    conversation = conversation_service.get_conversation_by_thread(thread_id)
+    assert conversation.title == "Imported haggis"
+    assert conversation.created_at.isoformat() == "2026-01-02T02:04:05"
+    # The search index covers imported rows
+    results = conversation_service.search_conversations("neeps tatties")["results"]
+    assert [r["thread_id"] for r in results] == [thread_id]
+
+    again = _import(client, records)
+    assert again.json()["skipped"] == 2
+
+
+def test_export_round_trips_into_the_same_database():
+    client = TestClient(app)
+    conversation_service.save_message(str(uuid.uuid4()), "assistant", "Cranachan?")
+    records = _export(client)
+
+    response = _import(client, records)
+
+    assert response.json() == {
+        "status": "imported",
+        "conversations": 0,
+        "messages": 0,
+        "skipped": len(records),
+    }
+
+
+def test_malformed_line_is_rejected():
+    client = TestClient(app)
+    response = client.post(
+        "/api/conversations/import",
+        content=b'{"type": "message", "id": "x"}\n',
+    )
+    assert response.status_code == 400
+    assert "Line 1" in response.json()["detail"]
+
+
+def test_next_batch_is_not_written_after_a_failed_write(monkeypatch):
+    submitted = []
+
+    def failing_write(op, **kwargs):
+        submitted.append(kwargs)
+        time.sleep(0.05)  # Long enough for a premature next write to be submitted
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(conversation_transfer, "IMPORT_BATCH_ROWS", 1)
+    monkeypatch.setattr(conversation_transfer, "submit_write", failing_write)
+    conversation = {
+        "type": "conversation",
+        "title": "Batch",
+        "created_at": "2026-01-02T03:04:05",
+        "updated_at": "2026-01-02T03:04:05",
+        "message_count": 0,
+        "user_id": None,
+    }
+    lines = [
+        json.dumps({**conversation, "id": str(uuid.uuid4()), "thread_id": str(uuid.uuid4())})
+        for _ in range(3)
+    ]
+
+    async def chunks():
+        for line in lines:
+            yield (line + "\n").encode()
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        asyncio.run(conversation_transfer.import_ndjson(chunks()))
+    assert len(submitted) == 1
@@ -1,3 +1,130 @@
 """
 Tests for cookware validation logic.
 """
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from constants.constants import AVAILABLE_COOKWARE
+from graphs.nodes import cookware_verification_node
+from services import conversation_service, cookware_service
+from services.cookware_index import CookwareIndex, default_cookware_index, normalize
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("Frying Pan", "frying pan"),
+        ("Knives", "knife"),
+        ("Chef's Knife", "chefs knife"),
+        ("  Sauté-Pans ", "saute pan"),
+        ("Wooden Spoons", "wooden spoon"),
+        ("Whisks", "whisk"),
+        ("Glass", "glass"),
+    ],
+)
+def test_normalize(name, expected):
+    assert normalize(name) == expected
+
+
+@pytest.mark.parametrize(
+    "required",
+    ["Pan", "frying pan", "Skillet", "pot", "Little Pot", "saucepans", "stove", "chef's knife"],
+)
+def test_synonyms_and_plurals_match_available_cookware(required):
+    assert default_cookware_index.has(required)
+
+
+@pytest.mark.parametrize("required", ["Spatual", "Fryingpan", "Stove-top", "Wisk"])
+def test_typos_match_fuzzily(required):
+    assert default_cookware_index.has(required)
+
+
+@pytest.mark.parametrize("required", ["Oven", "Baking Sheet", "Dutch Oven", "Blender", "Wok"])
+def test_unavailable_cookware_is_missing(required):
+    assert not default_cookware_index.has(required)
+
+
+@pytest.mark.parametrize("required", ["Cast Iron Skillet", "Wooden Spatula", "Slotted Spoon"])
+def test_modifiers_fall_back_to_the_head_noun(required):
+    assert default_cookware_index.has(required)
+
+
+@pytest.mark.parametrize(
+    "required",
+    ["Range Hood", "Stove Top Oven", "Pot Holder", "Pan Lid", "Roasting Pan", "Measuring Spoons"],
+)
+def test_shared_words_do_not_match(required):
+    assert not default_cookware_index.has(required)
+
+
+def test_custom_inventory():
+    index = CookwareIndex(["Oven", "Sheet Pan"])
+
+    assert index.find_missing(["baking tray", "oven", "Knife"]) == ["Knife"]
+
+
+def test_verification_node_reports_only_truly_missing_items():
+    state = {"required_cookware": ["Skillet", "Pot", "Spatula", "Oven"]}
+
+    assert cookware_verification_node(state) == {"can_cook": False, "missing_cookware": ["Oven"]}
+
+
+def test_verification_node_without_requirements():
+    assert cookware_verification_node({"required_cookware": []}) == {
+        "can_cook": True,
+        "missing_cookware": [],
+    }
+
+
+def test_default_index_covers_every_available_item():
+    assert default_cookware_index.find_missing(AVAILABLE_COOKWARE) == []
+
+
+def test_user_inventory_is_cached_and_invalidated_on_update():
+    user_id = str(uuid.uuid4())
+    cookware_service.set_user_cookware(user_id, ["Wok", "Chef's Knife", "wok"])
+
+    index = cookware_service.get_cookware_index(user_id)
+    assert index.items == ["Wok", "Chef's Knife"]
+    assert cookware_service.get_cookware_index(user_id) is index
+
+    cookware_service.add_user_cookware(user_id, "Oven")
+    updated = cookware_service.get_cookware_index(user_id)
+    assert updated is not index
+    assert updated.has("oven")
+
+    cookware_service.set_user_cookware(user_id, [])
+    assert cookware_service.get_cookware_index(user_id) is default_cookware_index
+
+
+def test_concurrent_updates_do_not_lose_items():
+    user_id = str(uuid.uuid4())
+    names = [f"Pan {i}" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda name: cookware_service.add_user_cookware(user_id, name), names))
+    assert sorted(cookware_service.get_user_cookware(user_id)) == sorted(names)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        removed = list(
+            pool.map(lambda _: cookware_service.remove_user_cookware(user_id, "pan 3"), range(4))
+        )
+    assert removed.count(True) == 1
+    assert len(cookware_service.get_user_cookware(user_id)) == 15
+    cookware_service.set_user_cookware(user_id, [])
+
+
+def test_verification_node_uses_thread_owner_inventory():
+    user_id, thread_id = str(uuid.uuid4()), str(uuid.uuid4())
+    cookware_service.set_user_cookware(user_id, ["Oven", "Baking Sheet"])
+    conversation_service.save_message(thread_id, "user", "Bake cookies", user_id=user_id)
+
+    config = {"configurable": {"thread_id": thread_id}}
+    state = {"required_cookware": ["oven", "cookie sheet", "Frying Pan"]}
+
+    assert cookware_verification_node(state, config) == {
+        "can_cook": False,
+        "missing_cookware": ["Frying Pan"],
+    }
@@ -0,0 +1,127 @@
+"""
+Tests for deduplicating cooking requests by Idempotency-Key.
+"""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models import FakeListChatModel
+
+from api import cooking
+from graphs import nodes
+from main import app
+from schemas import QueryInput
+from services import conversation_service, llm, response_cache
+from services.idempotency import IdempotencyPendingError, idempotency_keys, request_fingerprint
+
+CLASSIFICATION = {
+    "relevant": True,
+    "query_type": "recipe_request",
+    "dish": "Cock-a-leekie",
+    "ingredients": None,
+    "required_cookware": None,
+    "reason": None,
+}
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    models = {
+        "classifier": FakeListChatModel(responses=[json.dumps(CLASSIFICATION)] * 2),
+        # A second run would answer differently
+        "response": FakeListChatModel(responses=["Simmer chicken with leeks.", "Something else."]),
+        "title": FakeListChatModel(responses=["Cock-a-leekie"]),
+    }
+    for name, model in models.items():
+        monkeypatch.setitem(llm._clients, name, model)
+
+    class SlowSearch:
+        def search_recipes(self, query):
+            return []
+
+        async def asearch_recipes(self, query):
+            await asyncio.sleep(0.1)
+            return []
+
+    monkeypatch.setattr(nodes, "get_tavily_search_tool", SlowSearch)
+    monkeypatch.setattr(nodes, "KNOWLEDGE_BASE_ENABLED", False)
+    # Every run generates, so a second run would show up in the response model's count
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", False)
+    return models
+
+
+def test_retry_returns_the_stored_result(fake_models):
+    client = TestClient(app)
+    key = uuid.uuid4().hex
+    payload = {"query": "How do I make cock-a-leekie?"}
+
+    first = client.post("/api/cooking", json=payload, headers={"Idempotency-Key": key})
+    retry = client.post("/api/cooking", json=payload, headers={"Idempotency-Key": key})
+
+    assert first.status_code == retry.status_code == 200
+    # Same answer and thread (no thread_id was sent), from a single run
+    assert retry.json() == first.json()
+    assert fake_models["response"].i == 1
+    messages = conversation_service.get_conversation_messages(first.json()["thread_id"])
+    assert [m.role for m in messages] == ["user", "assistant"]
+
+
+def test_key_reused_with_another_request_is_rejected(fake_models):
+    client = TestClient(app)
+    key = uuid.uuid4().hex
+    client.post("/api/cooking", json={"query": "Cock-a-leekie?"}, headers={"Idempotency-Key": key})
+
+    response = client.post(
+        "/api/cooking", json={"query": "Scotch broth?"}, headers={"Idempotency-Key": key}
+    )
+    assert response.status_code == 422
+
+
+def test_concurrent_duplicate_streams_share_one_turn(fake_models):
+    async def scenario():
+        key = uuid.uuid4().hex
+        payload = QueryInput(query="How do I make cock-a-leekie?", thread_id=str(uuid.uuid4()))
+
+        async def stream():
+            response = await cooking.cooking_stream_endpoint(
+                payload, FakeRequest(), idempotency_key=key
+            )
+            return [chunk async for chunk in response.body_iterator], response.headers
+
+        (first, first_headers), (second, second_headers) = await asyncio.gather(stream(), stream())
+
+        # The duplicate followed the original turn instead of starting its own
+        assert first_headers["x-turn-id"] == second_headers["x-turn-id"]
+        assert first == second
+        assert '"complete"' in first[-1]
+        assert fake_models["response"].i == 1
+        messages = conversation_service.get_conversation_messages(payload.thread_id)
+        assert [m.role for m in messages] == ["user", "assistant"]
+
+    asyncio.run(scenario())
+
+
+def test_failed_request_releases_its_key():
+    async def scenario():
+        key = uuid.uuid4().hex
+        fingerprint = request_fingerprint(QueryInput(query="Cullen skink?"))
+
+        original = await idempotency_keys.begin(key, fingerprint)
+        duplicate = await idempotency_keys.begin(key, fingerprint)
+        assert original.is_owner and not duplicate.is_owner
+
+        await original.finish(None)
+        with pytest.raises(IdempotencyPendingError):
+            await duplicate.wait()
+        retry = await idempotency_keys.begin(key, fingerprint)
+        assert retry.is_owner
+
+    asyncio.run(scenario())
@@ -0,0 +1,100 @@
+"""
+Tests for the ingredient-to-recipe inverted index.
+"""
+
+import pytest
+
+from graphs import nodes
+from tools.ingredient_index import IngredientIndex, normalize_ingredient
+from tools.knowledge_base import RecipeKnowledgeBase
+
+RECIPES = {
+    "omelette": ["eggs", "butter", "cheddar", "chives"],
+    "carbonara": ["spaghetti", "eggs", "pecorino", "guanciale", "black pepper"],
+    "garlic bread": ["baguette", "butter", "garlic", "parsley"],
+    "shakshuka": ["eggs", "tomatoes", "onion", "cumin", "paprika", "feta"],
+}
+
+
+@pytest.fixture
+def index():
+    index = IngredientIndex()
+    for recipe_id, ingredients in RECIPES.items():
+        assert index.add(recipe_id, ingredients)
+    return index
+
+
+def test_normalize_and_extract_known_ingredients():
+    assert normalize_ingredient("Cherry Tomatoes") == "cherry tomato"
+    text = "Whisk the eggs with grated cheddar, then fold in chopped red onion and black pepper."
+    assert IngredientIndex().extract(text) == ["egg", "cheddar", "red onion", "black pepper"]
+
+
+def test_resolve_reduces_descriptive_names_to_index_keys(index):
+    assert index.resolve(["Aged white cheddar", "EGGS", "dragonfruit"]) == {
+        "cheddar",
+        "egg",
+        "dragonfruit",
+    }
+
+
+def test_match_ranks_by_fewest_missing_then_most_used(index):
+    results = index.match(["eggs", "butter", "cheddar", "garlic"])
+    assert [r["id"] for r in results] == ["omelette", "garlic bread"]
+    assert results[0]["missing"] == ["chive"]
+    assert results[1]["used"] == ["butter", "garlic"]
+    assert results[1]["missing"] == ["baguette", "parsley"]
+
+
+def test_match_excludes_recipes_missing_too_much_or_barely_overlapping(index):
+    # Carbonara misses three and shakshuka five; one shared ingredient is not enough
+    assert index.match(["eggs", "flour"]) == []
+    assert index.match(["eggs", "flour"], max_missing=4) == []
+    assert index.add("scrambled eggs", ["eggs", "butter", "chives"])
+    assert [r["id"] for r in index.match(["eggs"])] == ["scrambled eggs"]
+
+
+def test_pantry_staples_are_neither_matched_nor_missing(index):
+    assert not index.add("boiled eggs", ["eggs", "salt", "water"])
+    assert index.add("fried eggs", ["eggs", "butter", "chives", "salt", "olive oil"])
+
+    results = index.match(["eggs", "butter", "salt", "black pepper"])
+
+    assert results[0] == {"id": "fried eggs", "used": ["egg", "butter"], "missing": ["chive"]}
+    # Sharing only staples is not a match
+    assert index.match(["salt", "oil", "water"]) == []
+
+
+def test_search_node_answers_ingredient_queries_locally(monkeypatch):
+    kb = RecipeKnowledgeBase()
+    kb.ingest(
+        [
+            {
+                "title": "Cheesy Omelette",
+                "url": "https://example.com/omelette",
+                "content": "Beat eggs, melt butter, add cheddar and snipped chives.",
+            },
+            {
+                "title": "Tomato Soup",
+                "url": "https://example.com/soup",
+                "content": "Simmer tomatoes, onion, garlic and stock, then blend.",
+            },
+        ],
+        source="import",
+    )
+    monkeypatch.setattr(nodes, "knowledge_base", kb)
+
+    def no_web():
+        raise AssertionError("web search should not be called")
+
+    monkeypatch.setattr(nodes, "get_tavily_search_tool", no_web)
+    state = {
+        "query": "what can I make with eggs, cheddar and butter?",
+        "query_type": "ingredient_query",
+        "ingredients": ["eggs", "cheddar", "butter"],
+    }
+    result = nodes.search_node(state)
+    response = result["search_results"][0]["results"]
+    assert response["source"] == "ingredient_index"
+    assert [r["url"] for r in response["results"]] == ["https://example.com/omelette"]
+    assert "Also needs: chive" in response["results"][0]["content"]
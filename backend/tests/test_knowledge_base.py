@@ -0,0 +1,128 @@
+"""
+Tests for the local recipe knowledge base and its embeddings.
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from graphs import nodes
+from tools.embeddings import VectorIndex, embed_text, tokenize
+from tools.knowledge_base import RecipeKnowledgeBase, names_dish
+
+TAVILY_RESPONSE = [
+    {
+        "results": {
+            "query": "recipe for kedgeree",
+            "results": [
+                {
+                    "title": "Classic Kedgeree",
+                    "url": "https://example.com/kedgeree",
+                    "content": "Kedgeree with smoked haddock, rice, curry powder and eggs.",
+                    "score": 0.9,
+                },
+                {
+                    "title": "Quick Kedgeree",
+                    "url": "https://example.com/quick-kedgeree",
+                    "content": "A weeknight kedgeree: haddock, basmati rice and boiled eggs.",
+                    "score": 0.8,
+                },
+            ],
+        }
+    }
+]
+
+
+@pytest.fixture
+def kb():
+    return RecipeKnowledgeBase()
+
+
+def test_tokenize_drops_query_scaffolding_and_plurals():
+    assert tokenize("How do I make Crêpes with bananas?") == ["crepe", "banana"]
+
+
+def test_embedding_is_deterministic_and_typo_tolerant():
+    query = embed_text("recipe for kedgeree")
+    assert np.array_equal(query, embed_text("recipe for kedgeree"))
+    assert float(query @ embed_text("kedgere recipe")) > 0.45
+    assert float(query @ embed_text("chocolate brownies")) < 0.2
+
+
+def test_vector_index_returns_most_similar_first():
+    index = VectorIndex(dim=8)
+    vectors = np.eye(8, dtype=np.float32)
+    for i in range(8):  # One at a time to exercise capacity growth
+        index.add([f"doc{i}"], vectors[i : i + 1])
+
+    query = (vectors[3] * 0.8 + vectors[5] * 0.6).astype(np.float32)
+    assert [doc_id for doc_id, _ in index.search(query, 2)] == ["doc3", "doc5"]
+    assert len(index) == 8
+
+
+def test_vector_index_search_sees_consistent_snapshots_during_adds():
+    index = VectorIndex(dim=64)
+    vectors = np.eye(64, dtype=np.float32)
+
+    def writer():
+        for i in range(2000):
+            index.add([f"doc{i % 64}"], vectors[i % 64 : i % 64 + 1])
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while thread.is_alive():
+        for doc_id, score in index.search(vectors[7], 3):
+            # Every id returned belongs to the row that was scored
+            assert (doc_id == "doc7") == (score > 0.5)
+    thread.join()
+    assert len(index) == len(index.ids) == 2000
+
+
+def test_ingest_is_idempotent_and_answers_close_queries(kb):
+    assert kb.ingest_search_results(TAVILY_RESPONSE, query="recipe for kedgeree") == 2
+    assert kb.ingest_search_results(TAVILY_RESPONSE) == 0
+
+    hit = kb.lookup("recipe for kedgeree")
+    assert hit is not None
+    results = hit[0]["results"]["results"]
+    assert {r["url"] for r in results} >= {"https://example.com/kedgeree"}
+    assert kb.lookup("how to make beef wellington") is None
+
+
+def test_names_dish_tolerates_typos_but_not_other_dishes():
+    assert names_dish("The Best Beef Stroganoff", "beef stroganoff")
+    assert names_dish("Classic Tiramisu", "tiramsiu")
+    assert not names_dish("The Best Beef Stroganoff", "beef stew")
+    assert not names_dish("Easy Banana Bread", "banana pancakes")
+
+
+def test_lookup_rejects_near_miss_dishes(kb):
+    kb.ingest(
+        [
+            {
+                "title": "Banana Bread",
+                "url": "https://example.com/banana-bread",
+                "content": "Moist banana bread with ripe bananas.",
+            }
+        ],
+        source="test",
+    )
+
+    # Similar enough to pass MIN_SIMILARITY, but a different dish
+    assert kb.lookup("recipe for banana pancakes") is not None
+    assert kb.lookup("recipe for banana pancakes", dish="banana pancakes") is None
+    assert kb.lookup("recipe for banana bread", dish="banana bread") is not None
+
+
+def test_search_node_skips_web_on_knowledge_base_hit(kb, monkeypatch):
+    kb.ingest_search_results(TAVILY_RESPONSE)
+    monkeypatch.setattr(nodes, "knowledge_base", kb)
+
+    def no_web():
+        raise AssertionError("web search should not be called")
+
+    monkeypatch.setattr(nodes, "get_tavily_search_tool", no_web)
+    state = {"query": "kedgeree?", "query_type": "recipe_request", "dish": "kedgeree"}
+    result = nodes.search_node(state)
+    assert result["search_results"][0]["results"]["source"] == "knowledge_base"
@@ -1,3 +1,81 @@
 """
 Tests for LangGraph nodes.
 """
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from graphs.nodes import context_budget_node, decide_search_node
+from graphs.prompts import CLASSIFIER_PROMPT, format_history
+from services.llm import record_usage
+from services.metrics import metrics
+
+
+def test_format_history_keeps_last_three_exchanges():
+    messages = [
+        (HumanMessage if i % 2 == 0 else AIMessage)(content=f"message {i}") for i in range(8)
+    ]
+    history = format_history(messages, "Conversation History")
+    assert history.startswith("Conversation History:\nUser: message 2\n")
+    assert history.endswith("Assistant: message 7\n")
+    assert format_history([], "Conversation History") == ""
+
+
+def test_classifier_prompt_has_format_instructions_built_in():
+    prompt = CLASSIFIER_PROMPT.format(query="pasta?", conversation_context="")
+    assert set(CLASSIFIER_PROMPT.input_variables) == {"query", "conversation_context"}
+    assert '"required_cookware"' in prompt
+
+
+def test_prompts_start_with_a_static_prefix():
+    first = CLASSIFIER_PROMPT.format_messages(query="pasta?", conversation_context="")
+    second = CLASSIFIER_PROMPT.format_messages(
+        query="and gluten-free?", conversation_context="Recent Conversation:\nUser: pasta?\n"
+    )
+    assert first[0].content == second[0].content
+    assert "and gluten-free?" in second[-1].content
+    assert "and gluten-free?" not in second[0].content
+
+
+def test_decide_search_clears_the_previous_turns_search_context():
+    state = {"query_type": "cooking_technique", "search_context": "Last turn's carbonara."}
+    assert decide_search_node(state) == {
+        "needs_search": False,
+        "search_context": None,
+        "search_offset": 0,
+    }
+
+
+def test_context_budget_uses_only_this_turns_results():
+    def payload(title):
+        result = {"title": title, "url": f"https://a.com/{title}", "content": f"{title} recipe"}
+        return [{"results": {"query": "q", "results": [result]}}]
+
+    state = {
+        "query_type": "recipe_request",
+        "dish": "carbonara",
+        "search_results": payload("Lasagna"),
+    }
+    state.update(decide_search_node(state))
+    state["search_results"] = state["search_results"] + payload("Carbonara")
+
+    context = context_budget_node(state)["search_context"]
+
+    assert "Carbonara" in context
+    assert "Lasagna" not in context
+
+
+def test_record_usage_counts_cached_prompt_tokens():
+    metrics.reset()
+    message = AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": 1200,
+            "output_tokens": 40,
+            "total_tokens": 1240,
+            "input_token_details": {"cache_read": 1024},
+        },
+    )
+    assert record_usage("response", message) is message
+    counters = metrics.snapshot()["counters"]
+    assert counters["llm.response.input_tokens"] == 1200
+    assert counters["llm.response.cached_input_tokens"] == 1024
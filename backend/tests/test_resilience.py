@@ -0,0 +1,184 @@
+"""
+Tests for the resilient upstream call layer, run against a local fake server.
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from langchain_core.exceptions import OutputParserException
+
+from services.resilience import (
+    CallPolicy,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientCaller,
+    UpstreamTimeoutError,
+    is_upstream_failure,
+)
+
+
+class FakeUpstream:
+    """Local HTTP server that replays a scripted list of (delay, status) responses."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.hits = 0
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with upstream._lock:
+                    index = min(upstream.hits, len(upstream.script) - 1)
+                    upstream.hits += 1
+                delay, status = upstream.script[index]
+                time.sleep(delay)
+                self.send_response(status)
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream_factory():
+    servers = []
+
+    def make(script):
+        server = FakeUpstream(script)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def fetch(url: str) -> str:
+    response = httpx.get(url, timeout=5)
+    response.raise_for_status()
+    return response.text
+
+
+def test_retries_transient_errors(upstream_factory):
+    upstream = upstream_factory([(0, 503), (0, 503), (0, 200)])
+    caller = ResilientCaller("test", CallPolicy(timeout=2, max_attempts=3, backoff_base=0.01))
+
+    assert caller.call(fetch, upstream.url) == "ok"
+    assert upstream.hits == 3
+
+
+def test_does_not_retry_client_errors(upstream_factory):
+    upstream = upstream_factory([(0, 404)])
+    caller = ResilientCaller("test", CallPolicy(timeout=2, max_attempts=3, backoff_base=0.01))
+
+    with pytest.raises(httpx.HTTPStatusError):
+        caller.call(fetch, upstream.url)
+    assert upstream.hits == 1
+
+
+def test_attempt_timeout(upstream_factory):
+    upstream = upstream_factory([(1.0, 200)])
+    caller = ResilientCaller("test", CallPolicy(timeout=0.2, max_attempts=1))
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamTimeoutError):
+        caller.call(fetch, upstream.url)
+    assert time.monotonic() - started < 0.8
+
+
+def test_hedged_request_beats_slow_primary(upstream_factory):
+    upstream = upstream_factory([(1.0, 200), (0, 200)])
+    caller = ResilientCaller("test", CallPolicy(timeout=2, max_attempts=1, hedge_after=0.1))
+
+    started = time.monotonic()
+    assert caller.call(fetch, upstream.url) == "ok"
+    assert time.monotonic() - started < 0.8
+    assert upstream.hits == 2
+
+
+def test_circuit_breaker_opens_and_recovers(upstream_factory):
+    upstream = upstream_factory([(0, 500), (0, 500), (0, 200)])
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=0.2)
+    caller = ResilientCaller("test", CallPolicy(timeout=2, max_attempts=1), breaker=breaker)
+
+    for _ in range(2):
+        with pytest.raises(httpx.HTTPStatusError):
+            caller.call(fetch, upstream.url)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        caller.call(fetch, upstream.url)
+    assert upstream.hits == 2
+
+    time.sleep(0.25)
+    assert caller.call(fetch, upstream.url) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_async_call_timeout_and_retry(upstream_factory):
+    upstream = upstream_factory([(1.0, 200), (0, 200)])
+    caller = ResilientCaller("test", CallPolicy(timeout=0.2, max_attempts=2, backoff_base=0.01))
+
+    async def afetch(url):
+        async with httpx.AsyncClient(timeout=5) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            return response.text
+
+    assert asyncio.run(caller.acall(afetch, upstream.url)) == "ok"
+    assert upstream.hits == 2
+
+
+def test_breaker_counts_a_retried_call_once(upstream_factory):
+    upstream = upstream_factory([(0, 503)])
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=10)
+    caller = ResilientCaller(
+        "test", CallPolicy(timeout=2, max_attempts=3, backoff_base=0.01), breaker=breaker
+    )
+
+    with pytest.raises(httpx.HTTPStatusError):
+        caller.call(fetch, upstream.url)
+    assert upstream.hits == 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    with pytest.raises(httpx.HTTPStatusError):
+        caller.call(fetch, upstream.url)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_client_side_errors_do_not_trip_the_breaker(upstream_factory):
+    upstream = upstream_factory([(0, 404)])
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=10)
+    caller = ResilientCaller("test", CallPolicy(timeout=2, max_attempts=1), breaker=breaker)
+
+    def unparseable():
+        raise OutputParserException("Invalid json output")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        caller.call(fetch, upstream.url)
+    with pytest.raises(OutputParserException):
+        caller.call(unparseable)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_upstream_failures():
+    assert is_upstream_failure(UpstreamTimeoutError("slow"))
+    assert is_upstream_failure(httpx.ConnectError("refused"))
+    assert is_upstream_failure(Exception("Error 429: Too Many Requests"))
+    assert is_upstream_failure(ValueError("Error 502: Bad Gateway"))
+    assert not is_upstream_failure(ValueError("Error 401: Unauthorized"))
+    assert not is_upstream_failure(OutputParserException("Invalid json output"))
@@ -0,0 +1,125 @@
+"""
+Tests for reusing generated responses across equivalent first turns.
+"""
+
+import asyncio
+import json
+import threading
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from graphs import nodes
+from main import app
+from services import llm, response_cache
+from services.response_cache import response_cache_key
+
+CLASSIFICATION = {
+    "relevant": True,
+    "query_type": "recipe_request",
+    "dish": "Cullen Skink",
+    "ingredients": None,
+    "required_cookware": ["Little Pot", "Knife"],
+    "reason": None,
+}
+
+
+def _state(**overrides):
+    state = {
+        "query": "how do I make cullen skink?",
+        "query_type": "recipe_request",
+        "dish": "cullen skink",
+        "ingredients": ["haddock", "Potato"],
+        "required_cookware": ["Knife", "Little Pot"],
+        "missing_cookware": [],
+        "search_context": "Smoked haddock soup with potatoes and milk.",
+        "messages": [HumanMessage(content="how do I make cullen skink?")],
+    }
+    state.update(overrides)
+    return state
+
+
+def test_key_ignores_wording_and_order_but_not_outcome():
+    key = response_cache_key(_state())
+    assert key == response_cache_key(
+        _state(
+            query="cullen skink recipe please",
+            dish="Cullen  Skink",
+            ingredients=["potato", "haddock"],
+            required_cookware=["little pot", "knife"],
+        )
+    )
+    assert key != response_cache_key(_state(missing_cookware=["Little Pot"]))
+    assert key != response_cache_key(_state(search_context="A different recipe."))
+
+
+def test_key_skips_follow_ups_and_open_questions():
+    history = [HumanMessage(content="hi"), AIMessage(content="Hello!"), HumanMessage(content="q")]
+    assert response_cache_key(_state(messages=history)) is None
+    assert response_cache_key(_state(query_type="general_cooking")) is None
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    models = {
+        "classifier": FakeListChatModel(responses=[json.dumps(CLASSIFICATION)]),
+        # A second generation would answer differently
+        "response": FakeListChatModel(responses=["Simmer haddock in milk.", "Something else."]),
+        "title": FakeListChatModel(responses=["Cullen skink"]),
+    }
+    for name, model in models.items():
+        monkeypatch.setitem(llm._clients, name, model)
+
+    class FakeSearch:
+        def search_recipes(self, query):
+            return [{"results": {"query": query, "results": []}}]
+
+    monkeypatch.setattr(nodes, "get_tavily_search_tool", FakeSearch)
+    monkeypatch.setattr(nodes, "KNOWLEDGE_BASE_ENABLED", False)
+    return models
+
+
+def _stream(client, query):
+    payload = {"query": query, "thread_id": str(uuid.uuid4())}
+    with client.stream("POST", "/api/cooking/stream", json=payload) as response:
+        lines = [line for line in response.iter_lines() if line.startswith("data: ")]
+    return [json.loads(line[len("data: ") :]) for line in lines]
+
+
+def test_async_cache_calls_stay_off_the_event_loop(monkeypatch):
+    calls = []
+
+    class BlockingCache:
+        """Stands in for the shared state proxy, whose calls block on IPC."""
+
+        def get(self, key):
+            calls.append(threading.current_thread())
+            return None
+
+        def set(self, key, value, ttl=None):
+            calls.append(threading.current_thread())
+
+    monkeypatch.setattr(response_cache, "_responses", BlockingCache())
+    key = response_cache_key(_state())
+
+    async def scenario():
+        assert await response_cache.aget_cached_response(key) is None
+        await response_cache.acache_response(key, "Simmer the haddock in milk.")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(scenario())
+    assert len(calls) == 2 and loop_thread not in calls
+
+
+def test_equivalent_first_turns_stream_the_cached_response(fake_models):
+    client = TestClient(app)
+    first = _stream(client, "How do I make cullen skink?")
+    second = _stream(client, "cullen skink recipe")
+
+    # The second turn streams the same events without another response LLM call
+    assert [e["type"] for e in second] == [e["type"] for e in first]
+    assert second[-1]["response"] == first[-1]["response"] == "Simmer haddock in milk."
+    assert fake_models["response"].i == 1
@@ -0,0 +1,88 @@
+"""
+Tests for search result trimming and token budgeting.
+"""
+
+from tools.search_context import (
+    build_search_context,
+    count_tokens,
+    deduplicate,
+    extract_results,
+    rank_results,
+)
+
+
+def tavily_payload(results):
+    """Shape of `search_recipes` output for a TavilySearch response."""
+    return [{"results": {"query": "q", "results": results, "response_time": 1.2}}]
+
+
+def make_result(title, url, content, score=0.5):
+    return {
+        "title": title,
+        "url": url,
+        "content": content,
+        "raw_content": content * 50,
+        "score": score,
+    }
+
+
+def test_extract_results_flattens_tavily_payload():
+    payload = tavily_payload(
+        [make_result("Carbonara", "https://a.com/carbonara", "Eggs and  pecorino.")]
+    )
+
+    assert extract_results(payload) == [
+        {
+            "title": "Carbonara",
+            "url": "https://a.com/carbonara",
+            "snippet": "Eggs and pecorino.",
+            "score": 0.5,
+        }
+    ]
+
+
+def test_deduplicate_drops_repeated_urls_and_overlapping_snippets():
+    text = "whisk the eggs with grated pecorino and black pepper then toss with hot pasta"
+    results = extract_results(
+        tavily_payload(
+            [
+                make_result("A", "https://www.a.com/carbonara/", text, score=0.9),
+                make_result("A copy", "https://a.com/carbonara", "different text entirely", 0.8),
+                make_result("B", "https://b.com/x", text + " off the heat", score=0.7),
+                make_result("C", "https://c.com/y", "boil salted water for the spaghetti", 0.6),
+            ]
+        )
+    )
+
+    assert [r["title"] for r in deduplicate(results)] == ["A", "C"]
+
+
+def test_rank_prefers_results_matching_dish():
+    results = extract_results(
+        tavily_payload(
+            [
+                make_result("Banana bread", "https://a.com/1", "Bake the loaf.", score=0.6),
+                make_result("Pad Thai", "https://b.com/2", "Stir fry rice noodles.", score=0.5),
+            ]
+        )
+    )
+
+    assert rank_results(results, "pad thai", None)[0]["title"] == "Pad Thai"
+
+
+def test_build_search_context_respects_token_budget():
+    long_text = " ".join(f"step {i} stir the sauce gently" for i in range(400))
+    payload = tavily_payload(
+        [make_result(f"Recipe {i}", f"https://site{i}.com/r", long_text + str(i)) for i in range(5)]
+    )
+
+    raw_tokens = count_tokens(str(payload[0]["results"]))
+    context = build_search_context(payload, dish="sauce", token_budget=300)
+
+    assert 0 < count_tokens(context) <= 300
+    assert count_tokens(context) < raw_tokens / 10
+    assert context.startswith("- Recipe")
+
+
+def test_build_search_context_handles_empty_results():
+    assert build_search_context([]) == ""
@@ -0,0 +1,140 @@
+"""
+Tests for single-flight request coalescing.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.metrics import metrics
+from services.single_flight import SingleFlight, normalize_key
+
+
+def test_normalize_key_ignores_case_and_whitespace():
+    assert normalize_key("Recipe for  Pad Thai ") == normalize_key("recipe for pad thai")
+
+
+def test_concurrent_sync_calls_share_one_upstream_call():
+    flight = SingleFlight("test_sync")
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def upstream(query):
+        calls.append(query)
+        time.sleep(0.2)
+        return {"query": query}
+
+    def worker():
+        barrier.wait()
+        return flight.do(normalize_key("pad thai"), upstream, "pad thai")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: worker(), range(8)))
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert metrics.snapshot()["counters"]["single_flight.test_sync.coalesced"] == 7
+    assert flight.in_flight() == 0
+
+
+def test_errors_propagate_to_all_waiters():
+    flight = SingleFlight("test_errors")
+    barrier = threading.Barrier(4)
+
+    def upstream():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    def worker():
+        barrier.wait()
+        with pytest.raises(RuntimeError, match="upstream down"):
+            flight.do("key", upstream)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert flight.in_flight() == 0
+
+
+def test_async_calls_coalesce_with_sync_leader():
+    flight = SingleFlight("test_mixed")
+    calls = []
+    started = threading.Event()
+
+    def upstream():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "result"
+
+    async def aupstream():
+        calls.append(1)
+        return "other"
+
+    async def main():
+        leader = asyncio.create_task(asyncio.to_thread(flight.do, "key", upstream))
+        await asyncio.to_thread(started.wait)
+        waiters = [flight.ado("key", aupstream) for _ in range(5)]
+        return await asyncio.gather(leader, *waiters)
+
+    assert asyncio.run(main()) == ["result"] * 6
+    assert len(calls) == 1
+
+
+def test_cancelled_async_leader_hands_over_to_waiter():
+    flight = SingleFlight("test_cancel")
+    calls = []
+
+    async def aupstream():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", aupstream))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flight.ado("key", aupstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == "done"
+    assert len(calls) == 2
+
+
+def test_sync_waiter_of_cancelled_leader_does_not_spin():
+    class SlowFinish(SingleFlight):
+        def _finish(self, key):
+            time.sleep(0.05)  # Widen the window between the outcome and cleanup
+            super()._finish(key)
+
+    flight = SlowFinish("test_spin")
+    joins = []
+    join_or_lead = flight._join_or_lead
+
+    def counting_join_or_lead(key):
+        if threading.current_thread() is not threading.main_thread():
+            joins.append(key)
+        return join_or_lead(key)
+
+    flight._join_or_lead = counting_join_or_lead
+
+    async def aupstream():
+        await asyncio.sleep(1)
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("key", aupstream))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(asyncio.to_thread(flight.do, "key", lambda: "done"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter
+
+    assert asyncio.run(main()) == "done"
+    # Joined the cancelled call once, then led the retry
+    assert len(joins) == 2
@@ -0,0 +1,266 @@
+"""
+Tests for streamed turns whose client disconnected: cancelling, finishing in
+the background, and resuming with Last-Event-ID.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from langchain_core.language_models import FakeListChatModel
+
+from api import cooking
+from graphs import nodes
+from schemas import QueryInput
+from services import conversation_service, llm, turn_lock, turn_stream
+from services.metrics import metrics
+from services.turn_lock import turn_locks
+from services.turn_stream import TurnStream, parse_event_id, turn_streams
+
+CLASSIFICATION = {
+    "relevant": True,
+    "query_type": "recipe_request",
+    "dish": "Bouillabaisse",
+    "ingredients": None,
+    "required_cookware": None,
+    "reason": None,
+}
+
+
+class FakeRequest:
+    """Reports a disconnect once `gone` is set."""
+
+    def __init__(self):
+        self.gone = asyncio.Event()
+
+    async def is_disconnected(self):
+        return self.gone.is_set()
+
+
+@pytest.fixture
+def slow_search(monkeypatch):
+    models = {
+        "classifier": FakeListChatModel(responses=[json.dumps(CLASSIFICATION)]),
+        "response": FakeListChatModel(responses=["Simmer the fish in saffron broth."]),
+        "title": FakeListChatModel(responses=["Bouillabaisse"]),
+    }
+    for name, model in models.items():
+        monkeypatch.setitem(llm._clients, name, model)
+    monkeypatch.setattr(nodes, "KNOWLEDGE_BASE_ENABLED", False)
+    monkeypatch.setattr(cooking, "DISCONNECT_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(cooking, "STREAM_RESUME_GRACE", 0)
+
+    class SlowSearch:
+        started: asyncio.Event
+        cancelled = False
+        delay = 5.0
+
+        async def asearch_recipes(self, query):
+            SlowSearch.started.set()
+            try:
+                await asyncio.sleep(SlowSearch.delay)
+            except asyncio.CancelledError:
+                SlowSearch.cancelled = True
+                raise
+            return []
+
+    monkeypatch.setattr(nodes, "get_tavily_search_tool", SlowSearch)
+    return SlowSearch
+
+
+async def _stream_until_search(thread_id: str, search) -> tuple[FakeRequest, list[str]]:
+    search.started = asyncio.Event()
+    request = FakeRequest()
+    payload = QueryInput(query="How do I make bouillabaisse?", thread_id=thread_id)
+    response = await cooking.cooking_stream_endpoint(payload, request)
+
+    chunks = []
+    async for chunk in response.body_iterator:
+        chunks.append(chunk)
+        if not request.gone.is_set():
+            await search.started.wait()
+            request.gone.set()
+    return request, chunks
+
+
+def test_disconnect_cancels_the_turn_and_its_search(slow_search):
+    async def scenario():
+        metrics.reset()
+        thread_id = str(uuid.uuid4())
+        _, chunks = await _stream_until_search(thread_id, slow_search)
+
+        assert not any('"complete"' in chunk for chunk in chunks)
+        for _ in range(100):
+            if not turn_locks.is_busy(thread_id):
+                break
+            await asyncio.sleep(0.01)
+        assert slow_search.cancelled
+        assert not turn_locks.is_busy(thread_id)
+        assert metrics.snapshot()["counters"]["turns.cancelled"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_finish_policy_persists_the_answer_after_disconnect(slow_search, monkeypatch):
+    monkeypatch.setattr(cooking, "STREAM_DISCONNECT_POLICY", "finish")
+    slow_search.delay = 0.05
+
+    async def scenario():
+        thread_id = str(uuid.uuid4())
+        await _stream_until_search(thread_id, slow_search)
+
+        for _ in range(200):
+            if not turn_locks.is_busy(thread_id):
+                break
+            await asyncio.sleep(0.01)
+        messages = conversation_service.get_conversation_messages(thread_id)
+        assert [m.role for m in messages] == ["user", "assistant"]
+
+    asyncio.run(scenario())
+
+
+def test_newer_stream_cancels_the_running_streamed_turn(slow_search, monkeypatch):
+    monkeypatch.setattr(turn_lock, "TURN_CANCEL_PREVIOUS", True)
+    monkeypatch.setattr(turn_lock, "TURN_WAIT_TIMEOUT", 2)
+
+    async def follow(response) -> list[dict]:
+        return [json.loads(chunk.split("data: ")[1]) async for chunk in response.body_iterator]
+
+    async def scenario():
+        slow_search.started = asyncio.Event()
+        thread_id = str(uuid.uuid4())
+        first = await cooking.cooking_stream_endpoint(
+            QueryInput(query="How do I make bouillabaisse?", thread_id=thread_id), FakeRequest()
+        )
+        first_events = asyncio.create_task(follow(first))
+        await slow_search.started.wait()
+
+        # A double submit on the same thread while the first turn is searching
+        slow_search.delay = 0
+        second = await cooking.cooking_stream_endpoint(
+            QueryInput(query="How do I make it for two?", thread_id=thread_id), FakeRequest()
+        )
+        second_events = await asyncio.wait_for(follow(second), 5)
+
+        assert slow_search.cancelled
+        assert (await first_events)[-1] == {"type": "error", "message": "The turn was cancelled."}
+        assert second_events[-1]["type"] == "complete"
+        assert not turn_locks.is_busy(thread_id)
+
+    asyncio.run(scenario())
+
+
+def _parse(chunks: list[str]) -> list[tuple[str, dict]]:
+    events = []
+    for chunk in chunks:
+        event_id, data = chunk.strip().split("\n")
+        events.append((event_id.removeprefix("id: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_reconnect_resumes_the_running_turn(slow_search, monkeypatch):
+    monkeypatch.setattr(cooking, "STREAM_RESUME_GRACE", 5)
+    slow_search.delay = 0.2
+
+    async def scenario():
+        metrics.reset()
+        thread_id = str(uuid.uuid4())
+        _, chunks = await _stream_until_search(thread_id, slow_search)
+        seen = _parse(chunks)
+        last_event_id = seen[-1][0]
+
+        payload = QueryInput(query="How do I make bouillabaisse?", thread_id=thread_id)
+        response = await cooking.cooking_stream_endpoint(payload, FakeRequest(), last_event_id)
+        resumed = _parse([chunk async for chunk in response.body_iterator])
+
+        # Only the missed events, continuing the same numbering
+        turn_id, last_seq = parse_event_id(last_event_id)
+        assert [parse_event_id(event_id) for event_id, _ in resumed] == [
+            (turn_id, seq) for seq in range(last_seq + 1, last_seq + 1 + len(resumed))
+        ]
+        assert resumed[-1][1]["type"] == "complete"
+        assert not slow_search.cancelled
+        assert "turns.cancelled" not in metrics.snapshot()["counters"]
+
+        # The query ran once
+        messages = conversation_service.get_conversation_messages(thread_id)
+        assert [m.role for m in messages] == ["user", "assistant"]
+
+    asyncio.run(scenario())
+
+
+def test_reconnect_replays_a_finished_turn(slow_search):
+    slow_search.delay = 0
+
+    async def scenario():
+        thread_id = str(uuid.uuid4())
+        payload = QueryInput(query="How do I make bouillabaisse?", thread_id=thread_id)
+        response = await cooking.cooking_stream_endpoint(payload, FakeRequest())
+        events = _parse([chunk async for chunk in response.body_iterator])
+        assert events[-1][1]["type"] == "complete"
+
+        response = await cooking.cooking_stream_endpoint(payload, FakeRequest(), events[1][0])
+        replayed = _parse([chunk async for chunk in response.body_iterator])
+        assert replayed == events[2:]
+
+    asyncio.run(scenario())
+
+
+def test_reconnect_to_unknown_turn_is_404(slow_search):
+    async def scenario():
+        payload = QueryInput(query="How do I make bouillabaisse?", thread_id=str(uuid.uuid4()))
+        for last_event_id in ("not-an-id", "0123456789abcdef:3"):
+            with pytest.raises(HTTPException) as raised:
+                await cooking.cooking_stream_endpoint(payload, FakeRequest(), last_event_id)
+            assert raised.value.status_code == 404
+
+    asyncio.run(scenario())
+
+
+def test_reconnect_to_a_turn_on_another_worker_is_421(slow_search, monkeypatch):
+    monkeypatch.setattr(turn_stream, "is_multi_worker", lambda: True)
+    thread_id = str(uuid.uuid4())
+    turn_id = uuid.uuid4().hex
+    turn_streams._owners.set(turn_id, (os.getpid() + 1, thread_id))
+
+    async def resume(thread_id):
+        payload = QueryInput(query="How do I make bouillabaisse?", thread_id=thread_id)
+        with pytest.raises(HTTPException) as raised:
+            await cooking.cooking_stream_endpoint(payload, FakeRequest(), f"{turn_id}:3")
+        return raised.value
+
+    misdirected = asyncio.run(resume(thread_id))
+    assert misdirected.status_code == 421
+    assert "another worker" in misdirected.detail
+    # Another thread's turn is still unknown here
+    assert asyncio.run(resume(str(uuid.uuid4()))).status_code == 404
+
+
+def test_turns_record_their_worker_in_multi_worker_mode(monkeypatch):
+    monkeypatch.setattr(turn_stream, "is_multi_worker", lambda: True)
+    thread_id = str(uuid.uuid4())
+
+    async def scenario():
+        stream = turn_streams.create(thread_id)
+        turn_streams.discard(stream)
+        for _ in range(100):  # Recorded in the background
+            owner = await turn_streams.aowner(stream.turn_id)
+            if owner is not None:
+                break
+            await asyncio.sleep(0.01)
+        return stream.turn_id, owner
+
+    turn_id, owner = asyncio.run(scenario())
+    assert owner == (os.getpid(), thread_id)
+    turn_streams._owners.delete(turn_id)
+
+
+def test_turn_stream_buffer_is_bounded():
+    stream = TurnStream("thread", maxlen=3)
+    for i in range(5):
+        stream.publish({"n": i})
+    assert [seq for seq, _ in stream.events_after(0)] == [3, 4, 5]
+    assert [event["n"] for _, event in stream.events_after(4)] == [4]
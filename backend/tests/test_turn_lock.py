@@ -0,0 +1,147 @@
+"""
+Tests for per-thread turn serialization.
+"""
+
+import asyncio
+
+import pytest
+
+from database.connection import get_db
+from database.models import ThreadLease
+from database.writer import submit_write
+from services import turn_lock
+from services.turn_lock import ThreadTurnLocks, TurnBusyError
+
+
+def test_turns_on_one_thread_run_one_at_a_time():
+    async def scenario():
+        locks = ThreadTurnLocks()
+        order = []
+
+        async def turn(name, thread_id="t1"):
+            lease = await locks.acquire(thread_id)
+            order.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} end")
+            await lease.release()
+
+        await asyncio.gather(turn("a"), turn("b"), turn("other", thread_id="t2"))
+        assert order.index("a end") < order.index("b start")
+        assert not locks.is_busy("t1")
+
+    asyncio.run(scenario())
+
+
+def test_waiting_turn_times_out():
+    async def scenario():
+        locks = ThreadTurnLocks()
+        lease = await locks.acquire("t1")
+        with pytest.raises(TurnBusyError):
+            await locks.acquire("t1", timeout=0.01)
+        await lease.release()
+        assert not locks.is_busy("t1")
+
+    asyncio.run(scenario())
+
+
+def test_cancel_previous_cancels_running_turn_and_supersedes_queued_ones():
+    async def scenario():
+        locks = ThreadTurnLocks()
+        started = asyncio.Event()
+
+        async def running():
+            lease = await locks.acquire("t1")
+            try:
+                started.set()
+                await asyncio.sleep(10)
+            finally:
+                await lease.release()
+
+        first = asyncio.create_task(running())
+        await started.wait()
+        queued = asyncio.create_task(locks.acquire("t1"))
+        await asyncio.sleep(0)
+
+        latest = await asyncio.wait_for(locks.acquire("t1", cancel_previous=True), 1)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        with pytest.raises(TurnBusyError):
+            await queued
+        await latest.release()
+        assert not locks.is_busy("t1")
+
+    asyncio.run(scenario())
+
+
+def test_leases_serialize_turns_across_workers(monkeypatch):
+    monkeypatch.setattr(turn_lock, "is_multi_worker", lambda: True)
+    monkeypatch.setattr(turn_lock, "LEASE_POLL_INTERVAL", 0.01)
+
+    async def scenario():
+        # Another worker holds the lease; it is not in this process's lock table
+        assert submit_write("claim_thread_lease", thread_id="t9", owner="other", ttl=60)
+        locks = ThreadTurnLocks()
+        with pytest.raises(TurnBusyError):
+            await locks.acquire("t9", timeout=0.05)
+
+        submit_write("release_thread_lease", thread_id="t9", owner="other")
+        lease = await locks.acquire("t9", timeout=1)
+        with get_db() as db:
+            assert db.get(ThreadLease, "t9").owner == lease.owner
+        await lease.release()
+        with get_db() as db:
+            assert db.get(ThreadLease, "t9") is None
+
+    asyncio.run(scenario())
+
+
+def test_expired_lease_can_be_taken_over():
+    assert submit_write("claim_thread_lease", thread_id="t8", owner="crashed", ttl=-1)
+    assert submit_write("claim_thread_lease", thread_id="t8", owner="new", ttl=60)
+    assert submit_write("renew_thread_lease", thread_id="t8", owner="crashed", ttl=60) == "lost"
+    submit_write("release_thread_lease", thread_id="t8", owner="new")
+
+
+@pytest.mark.parametrize("cancel_previous", [True, False])
+def test_lease_holder_is_cancelled_when_another_worker_asks(monkeypatch, cancel_previous):
+    monkeypatch.setattr(turn_lock, "is_multi_worker", lambda: True)
+    monkeypatch.setattr(turn_lock, "LEASE_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(turn_lock, "TURN_CANCEL_PREVIOUS", cancel_previous)
+    if not cancel_previous:
+        # The request arrives with the next renewal; the lease is not polled
+        monkeypatch.setattr(turn_lock, "LEASE_TTL", 0.3)
+
+        def no_polling(thread_id, owner):
+            raise AssertionError("lease polled for cancel requests")
+
+        monkeypatch.setattr(turn_lock, "_cancel_requested", no_polling)
+
+    async def scenario():
+        locks = ThreadTurnLocks()
+        started = asyncio.Event()
+
+        async def running():
+            lease = await locks.acquire("t7")
+            try:
+                started.set()
+                await asyncio.sleep(10)
+            finally:
+                await lease.release()
+
+        holder = asyncio.create_task(running())
+        await started.wait()
+        claimed = await asyncio.to_thread(
+            submit_write,
+            "claim_thread_lease",
+            thread_id="t7",
+            owner="other-worker",
+            ttl=60,
+            cancel_previous=True,
+        )
+        assert not claimed
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(holder, 1)
+        assert submit_write("claim_thread_lease", thread_id="t7", owner="other-worker", ttl=60)
+        submit_write("release_thread_lease", thread_id="t7", owner="other-worker")
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+"""
+Tests for the single DB writer and the writes routed through it.
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from database.writer import DbWriter
+from main import app
+from services import conversation_service
+from services.cookware_service import get_thread_owner
+
+
+def test_concurrent_messages_are_all_committed():
+    thread_id = str(uuid.uuid4())
+    conversation_service.create_conversation(thread_id)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(
+            pool.map(
+                lambda i: conversation_service.save_message(thread_id, "assistant", f"m{i}"),
+                range(50),
+            )
+        )
+
+    conversation = conversation_service.get_conversation_by_thread(thread_id)
+    assert conversation.message_count == 50
+    assert len(conversation_service.get_conversation_messages(thread_id)) == 50
+
+
+def test_first_user_message_records_owner():
+    thread_id = str(uuid.uuid4())
+    conversation_service.save_message(thread_id, "assistant", "hello", user_id="alice")
+
+    assert get_thread_owner(thread_id) == "alice"
+
+
+def test_conversation_create_and_rename_go_through_the_writer(monkeypatch):
+    ops = []
+    submit = conversation_service.submit_write
+
+    def recording_submit(op, **kwargs):
+        ops.append(op)
+        return submit(op, **kwargs)
+
+    monkeypatch.setattr(conversation_service, "submit_write", recording_submit)
+    thread_id = str(uuid.uuid4())
+
+    created = conversation_service.create_conversation(thread_id)
+    assert (created.title, created.message_count) == ("New Conversation", 0)
+    assert created.created_at is not None
+
+    renamed = conversation_service.update_conversation_title(thread_id, "Cullen skink")
+    assert renamed.title == "Cullen skink"
+    assert conversation_service.get_conversation_by_thread(thread_id).title == "Cullen skink"
+    assert conversation_service.update_conversation_title(str(uuid.uuid4()), "x") is None
+    assert ops == ["create_conversation", "update_conversation_title", "update_conversation_title"]
+    conversation_service.delete_conversation(thread_id)
+
+
+def test_conversation_endpoints_write_through_the_writer(monkeypatch):
+    ops = []
+    submit = conversation_service.submit_write
+    monkeypatch.setattr(
+        conversation_service,
+        "submit_write",
+        lambda op, **kwargs: ops.append(op) or submit(op, **kwargs),
+    )
+    client = TestClient(app)
+
+    created = client.post("/api/conversations").json()
+    renamed = client.patch(f"/api/conversations/{created['thread_id']}", json={"title": "Stovies"})
+    assert renamed.json()["title"] == "Stovies"
+    missing = client.patch(f"/api/conversations/{uuid.uuid4()}", json={"title": "x"})
+    assert missing.status_code == 404
+    assert ops == ["create_conversation", "update_conversation_title", "update_conversation_title"]
+    conversation_service.delete_conversation(created["thread_id"])
+
+
+def test_failed_write_does_not_sink_its_batch(monkeypatch):
+    writer = DbWriter()
+    monkeypatch.setattr(writer, "_resolve", lambda op: _operations[op])
+
+    def ok(db, value):
+        return value
+
+    def boom(db, value):
+        raise ValueError(value)
+
+    _operations = {"ok": ok, "boom": boom}
+
+    # Queue writes while the writer is busy so they land in one batch
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = [pool.submit(writer.execute, "ok", {"value": i}) for i in range(6)]
+        failure = pool.submit(writer.execute, "boom", {"value": "bad"})
+
+        assert [future.result() for future in results] == list(range(6))
+        with pytest.raises(ValueError, match="bad"):
+            failure.result()
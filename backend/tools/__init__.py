@@ -1,3 +1,3 @@
-from .tavily_search import tavily_search_tool
+from .tavily_search import get_tavily_search_tool
 
-__all__ = ["tavily_search_tool"]
+__all__ = ["get_tavily_search_tool"]
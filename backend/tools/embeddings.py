@@ -0,0 +1,114 @@
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from services.cookware_index import singularize
+
+# Width of the hashed embedding space; changing it requires re-ingesting
+EMBEDDING_DIM = int(os.getenv("KNOWLEDGE_BASE_DIM", "512"))
+
+# Feature weights: bigrams reward phrase matches and character trigrams give
+# partial credit for typos and compound words (tuned with bench_knowledge_base)
+WORD_WEIGHT = 1.0
+BIGRAM_WEIGHT = 0.5
+TRIGRAM_WEIGHT = 0.5
+
+# Query scaffolding that says nothing about which recipe is wanted
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "best", "by", "can", "do", "easy", "for", "from",
+    "get", "good", "how", "i", "in", "is", "it", "make", "me", "my", "of", "on", "or", "recipe",
+    "recipes", "some", "that", "the", "this", "to", "using", "what", "whats", "with", "you",
+    "your",
+])  # fmt: skip
+
+_WORD = re.compile(r"[a-z0-9]+")
+_ACCENTS = str.maketrans("àáâäãçèéêëìíîïñòóôöõùúûü", "aaaaaceeeeiiiinooooouuuu")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, unaccented, singularized content words of `text`."""
+    words = _WORD.findall(text.lower().translate(_ACCENTS))
+    return [singularize(word) for word in words if word not in STOPWORDS]
+
+
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    # crc32 rather than hash(): buckets must agree across processes and restarts
+    h = zlib.crc32(feature.encode())
+    return h % dim, 1.0 if h & 0x80000000 else -1.0
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Embed text as an L2-normalized hashed bag of words, bigrams and trigrams.
+
+    Deterministic and local: no model download or API call, so queries are
+    embedded in microseconds and identical text always maps to the same vector.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    terms = tokenize(text)
+    for term in terms:
+        index, sign = _bucket(term, dim)
+        vector[index] += sign * WORD_WEIGHT
+        padded = f"#{term}#"
+        for i in range(len(padded) - 2):
+            index, sign = _bucket(padded[i : i + 3], dim)
+            vector[index] += sign * TRIGRAM_WEIGHT
+    for first, second in zip(terms, terms[1:], strict=False):
+        index, sign = _bucket(f"{first} {second}", dim)
+        vector[index] += sign * BIGRAM_WEIGHT
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over a dense float32 matrix.
+
+    Vectors are normalized, so similarity is one matrix-vector product. At
+    100k x 512 that takes about 15ms with perfect recall, so an approximate
+    index is not worth its build cost and recall loss at this scale.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        # (matrix, ids, size), replaced in one assignment so searches read a
+        # consistent snapshot without locking. Rows and ids below a published
+        # size never change; `add` only writes past it before publishing
+        self._view: tuple[np.ndarray, list[str], int] = (np.zeros((0, dim), np.float32), [], 0)
+        self._lock = threading.Lock()  # Serializes writers
+
+    def __len__(self) -> int:
+        return self._view[2]
+
+    @property
+    def ids(self) -> list[str]:
+        _, ids, size = self._view
+        return ids[:size]
+
+    def add(self, ids: list[str], vectors: np.ndarray) -> None:
+        """Append vectors (amortized O(1) per row: capacity grows geometrically)."""
+        with self._lock:
+            matrix, all_ids, size = self._view
+            needed = size + len(ids)
+            if needed > len(matrix):
+                grown = np.zeros((max(needed, 2 * len(matrix), 1024), self.dim), np.float32)
+                grown[:size] = matrix[:size]
+                matrix = grown
+            matrix[size:needed] = vectors
+            all_ids.extend(ids)
+            self._view = (matrix, all_ids, needed)
+
+    def search(self, vector: np.ndarray, k: int) -> list[tuple[str, float]]:
+        """Return up to k (id, cosine similarity) pairs, most similar first."""
+        matrix, ids, size = self._view
+        if not size or k <= 0:
+            return []
+        scores = matrix[:size] @ vector
+        k = min(k, size)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(ids[i], float(scores[i])) for i in top]
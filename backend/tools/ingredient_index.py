@@ -0,0 +1,144 @@
+import threading
+from array import array
+from collections.abc import Iterable
+
+import numpy as np
+
+from constants.constants import COMMON_INGREDIENTS, PANTRY_STAPLES
+from tools.embeddings import tokenize
+
+# A recipe may need at most this many ingredients the user did not list
+MAX_MISSING_INGREDIENTS = 2
+
+# Documents naming fewer ingredients than this are not treated as recipes
+MIN_RECIPE_INGREDIENTS = 3
+
+# Longest ingredient name, in words, tried when scanning text
+_MAX_PHRASE_WORDS = 3
+
+
+def normalize_ingredient(name: str) -> str:
+    """Canonical form used as the index key ("Cherry Tomatoes" -> "cherry tomato")."""
+    return " ".join(tokenize(name))
+
+
+class IngredientIndex:
+    """
+    Inverted index from normalized ingredient to the recipes that use it.
+
+    Postings are int32 arrays of recipe positions, so scoring a query is one
+    np.bincount over the postings of the user's ingredients: the count per
+    recipe of ingredients the user has. Subtracting that from each recipe's
+    ingredient count gives what is missing, for every recipe at once.
+
+    Pantry staples (salt, oil, water...) are left out of both recipes and
+    queries. Ingredients extracted from a search snippet are only those the
+    snippet mentions, so such a recipe's missing count is a lower bound.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Iterable[str] = COMMON_INGREDIENTS,
+        staples: Iterable[str] = PANTRY_STAPLES,
+    ):
+        self.ids: list[str] = []
+        self.ingredients: list[tuple[str, ...]] = []
+        self._postings: dict[str, array] = {}
+        self._sizes = array("i")
+        self._vocabulary = {normalize_ingredient(name) for name in vocabulary}
+        self._staples = {normalize_ingredient(name) for name in staples}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def extract(self, text: str) -> list[str]:
+        """Known ingredient names mentioned in text, longest match first."""
+        words = tokenize(text)
+        found: dict[str, None] = {}  # Ordered set
+        i = 0
+        while i < len(words):
+            for size in range(min(_MAX_PHRASE_WORDS, len(words) - i), 0, -1):
+                phrase = " ".join(words[i : i + size])
+                if phrase in self._vocabulary:
+                    found[phrase] = None
+                    i += size
+                    break
+            else:
+                i += 1
+        return list(found)
+
+    def resolve(self, ingredients: Iterable[str]) -> set[str]:
+        """Map user-supplied ingredient names onto index keys, leaving out staples."""
+        keys = set()
+        for name in ingredients:
+            normalized = normalize_ingredient(name)
+            if normalized in self._vocabulary:
+                keys.add(normalized)
+            else:
+                # "aged white cheddar" -> "cheddar"; unknown names stay as-is
+                keys.update(self.extract(name) or [normalized])
+        return keys - self._staples
+
+    def add(self, recipe_id: str, ingredients: Iterable[str]) -> bool:
+        """
+        Index a recipe's ingredients, except staples.
+
+        Returns False if it names too few (besides staples) to be useful.
+        """
+        normalized = (normalize_ingredient(name) for name in ingredients if name)
+        keys = tuple(key for key in dict.fromkeys(normalized) if key not in self._staples)
+        if len(keys) < MIN_RECIPE_INGREDIENTS:
+            return False
+        with self._lock:
+            position = len(self.ids)
+            for key in keys:
+                self._postings.setdefault(key, array("i")).append(position)
+                self._vocabulary.add(key)
+            self.ingredients.append(keys)
+            self._sizes.append(len(keys))
+            self.ids.append(recipe_id)
+        return True
+
+    def match(
+        self,
+        ingredients: Iterable[str],
+        max_missing: int = MAX_MISSING_INGREDIENTS,
+        k: int = 3,
+    ) -> list[dict]:
+        """
+        Recipes the user can make with what they have, missing at most `max_missing`.
+
+        Ranked by fewest missing ingredients, then most ingredients used.
+
+        Returns:
+            Dicts with id, used (the user's ingredients the recipe uses) and missing
+        """
+        keys = self.resolve(ingredients)
+        # Held while numpy views the postings: arrays cannot grow while exported
+        with self._lock:
+            count = len(self.ids)
+            postings = [self._postings[key] for key in keys if key in self._postings]
+            if not count or not postings:
+                return []
+
+            hits = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in postings])
+            have = np.bincount(hits, minlength=count)
+            missing = np.frombuffer(self._sizes, dtype=np.int32) - have
+
+        # With several ingredients listed, one incidental overlap is not a match
+        min_used = min(2, len(keys))
+        candidates = np.flatnonzero((have >= min_used) & (missing <= max_missing))
+        order = np.lexsort((-have[candidates], missing[candidates]))[:k]
+
+        results = []
+        for position in candidates[order]:
+            recipe = self.ingredients[position]
+            results.append(
+                {
+                    "id": self.ids[position],
+                    "used": [name for name in recipe if name in keys],
+                    "missing": [name for name in recipe if name not in keys],
+                }
+            )
+        return results
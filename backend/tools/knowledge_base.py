@@ -0,0 +1,330 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from difflib import SequenceMatcher
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database.connection import get_db
+from database.models import RecipeDocument
+from database.writer import submit_write
+from services.metrics import metrics
+from tools.embeddings import EMBEDDING_DIM, VectorIndex, embed_text, tokenize
+from tools.ingredient_index import IngredientIndex, normalize_ingredient
+from tools.search_context import extract_results
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_BASE_ENABLED = os.getenv("KNOWLEDGE_BASE_ENABLED", "true").lower() == "true"
+
+# Top-hit cosine similarity needed to answer from the knowledge base instead of
+# the web (see benchmarks/bench_knowledge_base.py for the hit-rate trade-off)
+MIN_SIMILARITY = float(os.getenv("KNOWLEDGE_BASE_MIN_SIMILARITY", "0.5"))
+
+# Similarity at which a title word counts as a dish word despite a typo
+DISH_WORD_SIMILARITY = 0.8
+
+# Documents returned per query, matching the web search's max_results
+KNOWLEDGE_BASE_RESULTS = int(os.getenv("KNOWLEDGE_BASE_RESULTS", "3"))
+
+# How often a worker picks up documents ingested by other workers
+REFRESH_INTERVAL = float(os.getenv("KNOWLEDGE_BASE_REFRESH_SECONDS", "5"))
+
+# Result sources served locally; their documents are already stored
+LOCAL_SOURCES = ("knowledge_base", "ingredient_index")
+
+
+def document_id(url: str | None, content: str) -> str:
+    """Stable id: the same page (or text) ingested twice maps to one row."""
+    key = url.strip().lower() if url else content
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def names_dish(title: str, dish: str) -> bool:
+    """
+    Whether every word of `dish` appears in `title`, allowing for typos.
+
+    Near-miss dishes embed close together ("beef stew" scores 0.45 against
+    beef stroganoff, above some exact matches), so similarity alone cannot
+    tell them apart.
+    """
+    words = tokenize(title)
+    return all(
+        word in words
+        or any(
+            SequenceMatcher(None, word, other).ratio() >= DISH_WORD_SIMILARITY for other in words
+        )
+        for word in tokenize(dish)
+    )
+
+
+def write_recipe_documents(db: Session, documents: list[dict]) -> int:
+    """Writer operation for RecipeKnowledgeBase.ingest; skips known documents."""
+    if not documents:
+        return 0
+    result = db.execute(insert(RecipeDocument).values(documents).on_conflict_do_nothing())
+    return result.rowcount
+
+
+class RecipeKnowledgeBase:
+    """
+    Local recipe retrieval over stored documents and their embeddings.
+
+    Documents live in the recipe_documents table; their vectors and
+    ingredient lists are kept in an in-memory VectorIndex and IngredientIndex
+    that are loaded on first use and then extended incrementally from new
+    rows, so every worker converges on the same corpus without reloading it.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self._index = VectorIndex(dim)
+        self.ingredient_index = IngredientIndex()
+        self._last_rowid = 0
+        self._refreshed_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def refresh(self, force: bool = False) -> None:
+        """Load documents added since the last refresh (at most every REFRESH_INTERVAL)."""
+        if not force and time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        with self._lock:
+            with get_db() as db:
+                rows = db.execute(
+                    text(
+                        "SELECT rowid, id, embedding, ingredients FROM recipe_documents "
+                        "WHERE rowid > :last ORDER BY rowid"
+                    ),
+                    {"last": self._last_rowid},
+                ).all()
+            self._refreshed_at = time.monotonic()
+            if not rows:
+                return
+
+            rows_ok = [row for row in rows if len(row.embedding) == self.dim * 4]
+            if len(rows_ok) < len(rows):
+                logger.warning(
+                    f"Skipping {len(rows) - len(rows_ok)} documents embedded with another "
+                    f"dimension; re-ingest them with KNOWLEDGE_BASE_DIM={self.dim}"
+                )
+            if rows_ok:
+                vectors = np.frombuffer(b"".join(row.embedding for row in rows_ok), np.float32)
+                self._index.add([row.id for row in rows_ok], vectors.reshape(-1, self.dim))
+            for row in rows:
+                if row.ingredients:
+                    self.ingredient_index.add(row.id, json.loads(row.ingredients))
+            self._last_rowid = rows[-1].rowid
+            logger.info(f"Knowledge base loaded {len(rows_ok)} documents ({len(self)} total)")
+
+    def search(self, query: str, k: int = KNOWLEDGE_BASE_RESULTS) -> list[dict]:
+        """
+        Return the k most similar documents, most similar first.
+
+        Each result has title, url, content and score (cosine similarity), the
+        same fields as a Tavily result.
+        """
+        self.refresh()
+        started = time.perf_counter()
+        hits = self._index.search(embed_text(query, self.dim), k)
+        metrics.observe("knowledge_base.search_ms", (time.perf_counter() - started) * 1000)
+        if not hits:
+            return []
+
+        documents = self._fetch([doc_id for doc_id, _ in hits])
+        return [
+            {
+                "title": documents[doc_id].title,
+                "url": documents[doc_id].url,
+                "content": documents[doc_id].content,
+                "score": score,
+            }
+            for doc_id, score in hits
+            if doc_id in documents
+        ]
+
+    def _fetch(self, doc_ids: list[str]) -> dict[str, RecipeDocument]:
+        with get_db() as db:
+            query = db.query(RecipeDocument).filter(RecipeDocument.id.in_(doc_ids))
+            return {document.id: document for document in query}
+
+    def lookup(
+        self, query: str, k: int = KNOWLEDGE_BASE_RESULTS, dish: str | None = None
+    ) -> list[dict] | None:
+        """
+        Answer a search from the knowledge base, or None on a low-similarity miss.
+
+        With a `dish`, only documents whose title names it are returned.
+        Hits are wrapped in the same shape as a Tavily response so downstream
+        nodes cannot tell the two sources apart.
+        """
+        results = self.search(query, k)
+        if dish:
+            results = [r for r in results if names_dish(r["title"] or r["content"], dish)]
+        if not results or results[0]["score"] < MIN_SIMILARITY:
+            metrics.increment("knowledge_base.misses")
+            return None
+        metrics.increment("knowledge_base.hits")
+        return [{"results": {"query": query, "results": results, "source": "knowledge_base"}}]
+
+    def match_ingredients(
+        self, ingredients: list[str], k: int = KNOWLEDGE_BASE_RESULTS
+    ) -> list[dict] | None:
+        """
+        Recipes makeable from the given ingredients (missing at most two), or None.
+
+        Results are in the same shape as `lookup`; each recipe's content is
+        prefixed with what it uses and what is still needed.
+        """
+        self.refresh()
+        started = time.perf_counter()
+        matches = self.ingredient_index.match(ingredients, k=k)
+        metrics.observe("ingredient_index.match_ms", (time.perf_counter() - started) * 1000)
+        if not matches:
+            metrics.increment("ingredient_index.misses")
+            return None
+
+        documents = self._fetch([match["id"] for match in matches])
+        results = []
+        for match in matches:
+            document = documents.get(match["id"])
+            if document is None:
+                continue
+            needs = f" Also needs: {', '.join(match['missing'])}." if match["missing"] else ""
+            results.append(
+                {
+                    "title": document.title,
+                    "url": document.url,
+                    "content": f"Uses your {', '.join(match['used'])}.{needs} {document.content}",
+                    # Full coverage first, like the index's own ranking
+                    "score": 1 / (1 + len(match["missing"])),
+                }
+            )
+        if not results:
+            return None
+        metrics.increment("ingredient_index.hits")
+        query = ", ".join(ingredients)
+        return [{"results": {"query": query, "results": results, "source": "ingredient_index"}}]
+
+    def ingest(self, documents: list[dict], source: str, query: str | None = None) -> int:
+        """
+        Embed and store documents with title/url/content fields.
+
+        An optional "ingredients" list is stored as given; otherwise known
+        ingredient names are extracted from the text.
+
+        Returns:
+            Number of documents that were new
+        """
+        rows = {}
+        for document in documents:
+            content = " ".join((document.get("content") or "").split())
+            if not content:
+                continue
+            title, url = document.get("title") or None, document.get("url") or None
+            doc_id = document_id(url, content)
+            if document.get("ingredients"):
+                ingredients = [normalize_ingredient(name) for name in document["ingredients"]]
+            else:
+                ingredients = self.ingredient_index.extract(f"{title or ''} {content}")
+            rows[doc_id] = {
+                "id": doc_id,
+                "title": title,
+                "url": url,
+                "content": content,
+                "source": source,
+                "query": query,
+                "ingredients": ingredients,
+                "embedding": embed_text(
+                    f"{title or ''} {title or ''} {content}", self.dim
+                ).tobytes(),
+            }
+        if not rows:
+            return 0
+
+        added = submit_write("ingest_recipe_documents", documents=list(rows.values()))
+        metrics.increment("knowledge_base.ingested", added)
+        self.refresh(force=True)
+        return added
+
+    def ingest_search_results(
+        self, search_results: list, query: str | None = None, source: str = "tavily"
+    ) -> int:
+        """Store the documents in raw search tool output (e.g. a Tavily response)."""
+        documents = [
+            {"title": result["title"], "url": result["url"], "content": result["snippet"]}
+            for result in extract_results(search_results)
+        ]
+        return self.ingest(documents, source=source, query=query)
+
+    def backfill_from_checkpoints(self) -> int:
+        """Ingest the web results stored in every thread's latest checkpoint."""
+        from checkpointer.sqlite_checkpointer import SQLiteCheckpointSaver
+        from database.models import Checkpoint
+
+        saver = SQLiteCheckpointSaver()
+        with get_db() as db:
+            thread_ids = [row.thread_id for row in db.query(Checkpoint.thread_id).distinct()]
+
+        added = 0
+        for thread_id in thread_ids:
+            checkpoint = saver.get_tuple({"configurable": {"thread_id": thread_id}})
+            if checkpoint is None:
+                continue
+            search_results = checkpoint.checkpoint["channel_values"].get("search_results") or []
+            # Results that were served locally are already stored
+            web_results = [r for r in search_results if not _is_knowledge_base_result(r)]
+            added += self.ingest_search_results(web_results, source="checkpoint")
+        return added
+
+
+def _is_knowledge_base_result(result) -> bool:
+    inner = result.get("results") if isinstance(result, dict) else None
+    return isinstance(inner, dict) and inner.get("source") in LOCAL_SOURCES
+
+
+knowledge_base = RecipeKnowledgeBase()
+
+
+def _documents_gauge() -> dict:
+    return {
+        "knowledge_base.documents": len(knowledge_base),
+        "ingredient_index.recipes": len(knowledge_base.ingredient_index),
+    }
+
+
+metrics.register_collector(_documents_gauge)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest documents into the recipe knowledge base")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="ingest a JSONL file of title/url/content")
+    ingest_parser.add_argument("path")
+    ingest_parser.add_argument("--source", default="import")
+    commands.add_parser("backfill", help="ingest past web results from conversation checkpoints")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from database.init import create_tables
+
+    create_tables()
+    if args.command == "ingest":
+        with open(args.path) as f:
+            documents = [json.loads(line) for line in f if line.strip()]
+        added = sum(
+            knowledge_base.ingest(documents[i : i + 500], source=args.source)
+            for i in range(0, len(documents), 500)
+        )
+    else:
+        added = knowledge_base.backfill_from_checkpoints()
+    print(f"Ingested {added} new documents ({len(knowledge_base)} total)")
@@ -0,0 +1,217 @@
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Maximum tokens of search material passed to the response prompt
+SEARCH_CONTEXT_TOKEN_BUDGET = int(os.getenv("SEARCH_CONTEXT_TOKEN_BUDGET", "600"))
+
+# Maximum tokens kept from any single result's snippet
+MAX_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKEN_LIMIT", "200"))
+
+# Snippets sharing this fraction of word shingles are treated as duplicates
+DUPLICATE_SIMILARITY = 0.6
+
+# gpt-4o / gpt-4o-mini. tiktoken downloads it on first use unless it is
+# already in TIKTOKEN_CACHE_DIR (the Docker image pre-fetches it there)
+TOKENIZER_ENCODING = "o200k_base"
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+_TERM = re.compile(r"[a-z0-9]+")
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tiktoken encoding once; None if it is unavailable offline."""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, using approximate token counts: {e}")
+        return None
+
+
+def _approx_tokens(piece: str) -> int:
+    # BPE vocabularies average roughly four characters per token for English
+    return max(1, math.ceil(len(piece) / 4))
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the model's local tokenizer (approximate fallback)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(_approx_tokens(piece) for piece in _WORD.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to at most `max_tokens` tokens, marking the cut with an ellipsis."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens]).rstrip() + "..."
+
+    used = 0
+    for match in _WORD.finditer(text):
+        used += _approx_tokens(match.group())
+        if used > max_tokens:
+            return text[: match.start()].rstrip() + "..."
+    return text
+
+
+def extract_results(search_results: list) -> list[dict]:
+    """
+    Flatten raw search tool output into title/url/snippet/score records.
+
+    Handles the shapes `search_recipes` can produce: a Tavily response dict
+    wrapped as {"results": {...}}, bare result dicts, and plain strings.
+    """
+    extracted = []
+
+    def visit(item):
+        if isinstance(item, list):
+            for child in item:
+                visit(child)
+        elif isinstance(item, dict):
+            if "url" in item or "content" in item:
+                extracted.append(
+                    {
+                        "title": (item.get("title") or "").strip(),
+                        "url": (item.get("url") or "").strip(),
+                        # Prefer Tavily's extracted snippet over raw page content
+                        "snippet": " ".join(
+                            (item.get("content") or item.get("raw_content") or "").split()
+                        ),
+                        "score": float(item.get("score") or 0.0),
+                    }
+                )
+            elif "results" in item:
+                visit(item["results"])
+        elif isinstance(item, str) and item.strip():
+            extracted.append(
+                {"title": "", "url": "", "snippet": " ".join(item.split()), "score": 0.0}
+            )
+
+    visit(search_results)
+    return extracted
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.lower())
+    host = parts.netloc.removeprefix("www.")
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def _shingles(text: str, size: int = 3) -> set[tuple[str, ...]]:
+    terms = _TERM.findall(text.lower())
+    if len(terms) < size:
+        return {tuple(terms)} if terms else set()
+    return {tuple(terms[i : i + size]) for i in range(len(terms) - size + 1)}
+
+
+def deduplicate(results: list[dict]) -> list[dict]:
+    """Drop results with a repeated URL or a near-duplicate snippet."""
+    unique = []
+    seen_urls = set()
+    seen_shingles: list[set] = []
+
+    # Visit higher-scored results first so the best copy of a duplicate survives
+    for result in sorted(results, key=lambda r: r["score"], reverse=True):
+        url = _normalize_url(result["url"]) if result["url"] else None
+        if url and url in seen_urls:
+            continue
+
+        shingles = _shingles(result["snippet"])
+        is_duplicate = any(
+            shingles
+            and other
+            and len(shingles & other) / min(len(shingles), len(other)) >= DUPLICATE_SIMILARITY
+            for other in seen_shingles
+        )
+        if is_duplicate:
+            continue
+
+        if url:
+            seen_urls.add(url)
+        seen_shingles.append(shingles)
+        unique.append(result)
+    return unique
+
+
+def rank_results(
+    results: list[dict], dish: str | None, ingredients: list[str] | None
+) -> list[dict]:
+    """Order results by overlap with the dish/ingredient terms, then by search score."""
+    query_terms = set(_TERM.findall((dish or "").lower()))
+    for ingredient in ingredients or []:
+        query_terms.update(_TERM.findall(ingredient.lower()))
+
+    def relevance(result: dict) -> float:
+        if not query_terms:
+            return result["score"]
+        title_terms = set(_TERM.findall(result["title"].lower()))
+        snippet_terms = set(_TERM.findall(result["snippet"].lower()))
+        # Title matches are a stronger signal than passing mentions in the body
+        overlap = 2 * len(query_terms & title_terms) + len(query_terms & snippet_terms)
+        return overlap / (3 * len(query_terms)) + result["score"]
+
+    return sorted(results, key=relevance, reverse=True)
+
+
+def format_result(result: dict) -> str:
+    header = result["title"] or "Result"
+    if result["url"]:
+        header += f" ({result['url']})"
+    return f"- {header}: {result['snippet']}"
+
+
+def build_search_context(
+    search_results: list,
+    dish: str | None = None,
+    ingredients: list[str] | None = None,
+    token_budget: int = SEARCH_CONTEXT_TOKEN_BUDGET,
+) -> str:
+    """
+    Turn raw search output into a compact, ranked context block.
+
+    Args:
+        search_results: Raw output accumulated from the search tool
+        dish: Dish extracted by the classifier, used for ranking
+        ingredients: Ingredients extracted by the classifier, used for ranking
+        token_budget: Maximum tokens for the returned block
+
+    Returns:
+        Newline-separated result lines, or "" if there is nothing usable
+    """
+    results = rank_results(deduplicate(extract_results(search_results)), dish, ingredients)
+
+    lines = []
+    remaining = token_budget
+    for result in results:
+        result = {**result, "snippet": truncate_to_tokens(result["snippet"], MAX_SNIPPET_TOKENS)}
+        line = format_result(result)
+        # +1 for the joining newline
+        cost = count_tokens(line) + 1
+        if cost > remaining:
+            header_cost = count_tokens(format_result({**result, "snippet": ""})) + 1
+            snippet_budget = remaining - header_cost - 2  # room for the "..." marker
+            if snippet_budget >= 20:
+                # Partially include the result rather than leaving budget unused
+                result["snippet"] = truncate_to_tokens(result["snippet"], snippet_budget)
+                lines.append(format_result(result))
+            break
+        lines.append(line)
+        remaining -= cost
+
+    return "\n".join(lines)
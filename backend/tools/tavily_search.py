@@ -1,8 +1,8 @@
 import logging
 import os
+import threading
 
 from dotenv import load_dotenv
-from langchain_tavily import TavilySearch
 
 load_dotenv()
 
@@ -26,39 +26,93 @@ class TavilySearchTool:
                 "Please add it to your .env file."
             )
 
-        self.search = TavilySearch(max_results=max_results, tavily_api_key=api_key)
+        # Imported here so importing this module stays cheap at startup
+        from langchain_tavily import TavilySearch
+
+        self.search = TavilySearch(
+            max_results=max_results,
+            tavily_api_key=api_key,
+            api_base_url=os.getenv("TAVILY_API_BASE_URL") or None,
+        )
         self.max_results = max_results
 
     def search_recipes(self, query: str) -> list[dict]:
         """
         Search the web for cooking/recipe information using Tavily.
 
+        Failures are raised rather than returned so the caller's retry and
+        circuit-breaker policy can act on them.
+
         Args:
             query: Search query string
 
         Returns:
-            List of search results
+            List of search results (empty if Tavily found nothing)
+
+        Raises:
+            RuntimeError: If the Tavily request failed
         """
-        try:
-            logger.info(f"Tavily search for: {query}")
+        from langchain_core.tools import ToolException
+
+        logger.info(f"Tavily search for: {query}")
 
-            # Perform search
+        try:
             results = self.search.invoke(query)
+        except ToolException as e:
+            # Raised by TavilySearch when the query returned no results
+            logger.info(f"No Tavily results: {e}")
+            return []
+
+        return self._wrap_results(results)
+
+    async def asearch_recipes(self, query: str) -> list[dict]:
+        """Async search_recipes; cancelling the caller cancels the HTTP request."""
+        from langchain_core.tools import ToolException
+
+        logger.info(f"Tavily search for: {query}")
+
+        try:
+            results = await self.search.ainvoke(query)
+        except ToolException as e:
+            logger.info(f"No Tavily results: {e}")
+            return []
+
+        return self._wrap_results(results)
+
+    def _wrap_results(self, results) -> list[dict]:
+        # TavilySearch reports request errors in-band instead of raising
+        if isinstance(results, dict) and "error" in results:
+            raise RuntimeError(f"Tavily search failed: {results['error']}")
+
+        # TavilySearch returns a string or dict, wrap in list for consistency
+        if isinstance(results, list):
+            search_results = results
+        else:
+            search_results = [{"results": results}]
+
+        logger.info(f"Found {len(search_results)} results")
+
+        return search_results
+
 
-            # TavilySearch returns a string or dict, wrap in list for consistency
-            if isinstance(results, list):
-                search_results = results
-            else:
-                search_results = [{"results": results}]
+_tavily_search_tool: TavilySearchTool | None = None
+_lock = threading.Lock()
 
-            logger.info(f"Found {len(search_results)} results")
 
-            return search_results
+def get_tavily_search_tool() -> TavilySearchTool:
+    """
+    Return the shared search tool, creating it on first use.
 
-        except Exception as e:
-            logger.error(f"Tavily search failed: {str(e)}")
-            return [{"query": query, "results": f"Search failed: {str(e)}"}]
+    Raises:
+        ValueError: If TAVILY_API_KEY is not configured
+    """
+    global _tavily_search_tool
+    if _tavily_search_tool is None:
+        with _lock:
+            if _tavily_search_tool is None:
+                _tavily_search_tool = TavilySearchTool(max_results=3)
+    return _tavily_search_tool
 
 
-# Create singleton instance
-tavily_search_tool = TavilySearchTool(max_results=3)
+def is_initialized() -> bool:
+    return _tavily_search_tool is not None